@@ -0,0 +1,422 @@
+"""Benchmark suite of pyfitit-gui with a history of results and a regression check
+
+    python benchmarks/bench.py run [--filter render] [--repeat 5]
+    python benchmarks/bench.py compare [--baseline <commit>] [--threshold 0.2]
+    python benchmarks/bench.py list
+
+`run` times every case and appends one JSON line to the history file, with
+the commit, the machine and the best and median time of every case. Each case
+is called in a loop long enough to be timed reliably, and the loop is
+repeated. The cold GUI cases start a fresh interpreter for every repetition,
+so they include the imports, under the offscreen Qt platform: one until the
+MainWindow is constructed, one until its first paint has finished.
+
+`compare` sets the latest entry of the history against an earlier one of the
+same machine, by default the previous one, and fails when the best time of a
+case grew by more than the threshold. Timings of different machines are
+never compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.molecule import clear_molecule_cache, load_molecule
+from pyfitit_gui.project_model import ProjectModel
+from pyfitit_gui.rendering import (
+    expand_deformations,
+    expand_geometry_param_ranges,
+    render_project,
+)
+from pyfitit_gui.spectrum import load_spectrum
+
+DEFAULT_HISTORY = Path(__file__).parent / "history.jsonl"
+"""File the results are appended to, one JSON object per run"""
+
+DEFORMATION_COUNTS = (10, 100, 1000, 10000)
+ATOM_COUNTS = (1000, 10000, 100000, 1000000)
+SPECTRUM_SIZES = (1000, 10000, 100000, 1000000)
+
+MIN_LOOP_TIME = 0.05
+"""Shortest time in seconds a timed loop of a case must take"""
+
+DEFAULT_THRESHOLD = 0.2
+"""Relative slowdown of the best time flagged as a regression"""
+
+COLD_WINDOW_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from pyfitit_gui.main_window import MainWindow
+window = MainWindow()
+print(time.perf_counter() - start)
+"""
+
+COLD_FIRST_PAINT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from pyfitit_gui.main_window import MainWindow
+window = MainWindow()
+class FirstPaint(QObject):
+    def eventFilter(self, receiver, event):
+        if event.type() == QEvent.Paint:
+            app.removeEventFilter(self)
+            QTimer.singleShot(0, done)
+        return False
+def done():
+    print(time.perf_counter() - start)
+    app.quit()
+first_paint = FirstPaint()
+app.installEventFilter(first_paint)
+window.show()
+app.exec()
+"""
+
+COLD_CASES = {
+    "gui/main_window_cold": COLD_WINDOW_SCRIPT,
+    "gui/first_paint_cold": COLD_FIRST_PAINT_SCRIPT,
+}
+"""Cases run in a fresh interpreter, by their script printing the time"""
+
+PROJECT_SETTINGS = {
+    "project_name": "benchmark",
+    "project_folder": "/tmp",
+    "molecule_file": "molecule.xyz",
+    "spectrum_file": "exp.txt",
+    "parts": "0-9,10-19",
+    "left_interval": 8980,
+    "right_interval": 9100,
+    "energy_range": "-15 0.5 50",
+    "Green": True,
+    "Radius": 6,
+    "GH": 1.5,
+    "Ecent": 30,
+    "Elarg": 30,
+    "Gmax": 15,
+    "Efermi": 0,
+    "shift": 0,
+    "norm": 1,
+}
+
+
+def make_deformations(count: int) -> list[Deformation]:
+    """Alternating shifts and rotations of two parts"""
+    return [
+        Deformation(
+            name=f"d{idx}",
+            part=idx % 2,
+            atom_1=idx % 10,
+            atom_2=10 + idx % 10,
+            def_type="shift" if idx % 2 else "rotation",
+            range_left=-0.2,
+            range_right=0.2,
+        )
+        for idx in range(count)
+    ]
+
+
+def make_project(count: int) -> ProjectModel:
+    """Project with the benchmark settings and a number of deformations"""
+    model = ProjectModel()
+    for key, value in PROJECT_SETTINGS.items():
+        model.set_setting(key, value)
+    model.add_deformations(make_deformations(count))
+    return model
+
+
+def write_xyz(path: Path, count: int):
+    """Write a molecule of random carbon atoms"""
+    coordinates = np.random.default_rng(0).normal(scale=10, size=(count, 3))
+    with path.open("w", encoding="utf-8") as output:
+        output.write(f"{count}\nbenchmark molecule\n")
+        np.savetxt(output, coordinates, fmt="C %.6f %.6f %.6f")
+
+
+def write_spectrum(path: Path, count: int):
+    """Write a two column spectrum with a header row"""
+    energy = np.linspace(8900, 9300, count)
+    np.savetxt(path, np.c_[energy, np.sin(energy)], header="energy mu", comments="")
+
+
+def cases(workdir: Path) -> Iterator[tuple[str, Callable[[], Callable]]]:
+    """Name and setup of every case, the setup returns the timed callable"""
+    for count in DEFORMATION_COUNTS:
+        deformations = make_deformations(count)
+        yield f"render/expand_deformations[{count}]", lambda d=deformations: (
+            lambda: expand_deformations(d)
+        )
+        yield f"render/expand_geometry_param_ranges[{count}]", lambda d=deformations: (
+            lambda: expand_geometry_param_ranges(d)
+        )
+        yield f"render/project[{count}]", lambda c=count: _render(make_project(c))
+        yield f"render/project_compiled[{count}]", lambda c=count: _render(
+            make_project(c), compiled=True
+        )
+    for count in ATOM_COUNTS:
+        yield f"parse/xyz[{count}]", lambda c=count: _load_xyz(workdir, c)
+    for count in SPECTRUM_SIZES:
+        yield f"parse/spectrum[{count}]", lambda c=count: _load_spectrum(workdir, c)
+
+
+def _render(model: ProjectModel, compiled: bool = False) -> Callable:
+    return lambda: render_project(model.output_dictionary(compiled))
+
+
+def _load_xyz(workdir: Path, count: int) -> Callable:
+    path = workdir / f"molecule_{count}.xyz"
+    write_xyz(path, count)
+
+    def load():
+        clear_molecule_cache()
+        load_molecule(str(path))
+
+    return load
+
+
+def _load_spectrum(workdir: Path, count: int) -> Callable:
+    path = workdir / f"spectrum_{count}.txt"
+    write_spectrum(path, count)
+    return lambda: load_spectrum(str(path))
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    """Best and median time of one call, over repeated timed loops"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_LOOP_TIME:
+            break
+        loops *= 10 if elapsed < MIN_LOOP_TIME / 10 else 2
+    times = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        times.append((time.perf_counter() - start) / loops)
+    return {"best": min(times), "median": statistics.median(times), "loops": loops}
+
+
+def measure_cold(script: str, repeat: int) -> dict:
+    """Time printed by a script run in a fresh interpreter"""
+    environment = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(output.stdout.split()[-1]))
+    return {"best": min(times), "median": statistics.median(times), "loops": 1}
+
+
+def machine() -> dict:
+    """Description of the machine, results are only compared on equal ones"""
+    return {
+        "node": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def git_revision() -> tuple[str, bool]:
+    """Current commit and whether the working tree has changes"""
+    root = Path(__file__).parent
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def run_suite(name_filter: str = "", repeat: int = 5) -> dict:
+    """Time every case whose name contains the filter
+    Returns a history entry
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup in cases(Path(workdir)):
+            if name_filter in name:
+                results[name] = measure(setup(), repeat)
+                print(f"{name:48} {format_time(results[name]['best'])}")
+    for name, script in COLD_CASES.items():
+        if name_filter in name:
+            results[name] = measure_cold(script, repeat)
+            print(f"{name:48} {format_time(results[name]['best'])}")
+    commit, dirty = git_revision()
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "machine": machine(),
+        "results": results,
+    }
+
+
+def format_time(seconds: float) -> str:
+    """Time with a unit suited to its magnitude"""
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.3f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+def read_history(path: Path) -> list[dict]:
+    """All entries of a history file, oldest first"""
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as history:
+        return [json.loads(line) for line in history if line.strip()]
+
+
+def append_history(path: Path, entry: dict):
+    """Append one entry to a history file"""
+    with path.open("a", encoding="utf-8") as history:
+        history.write(json.dumps(entry, sort_keys=True) + "\n")
+
+
+def find_baseline(history: list[dict], current: dict, revision: str = None) -> dict:
+    """Latest earlier entry of the same machine, optionally of a given commit"""
+    for entry in reversed(history):
+        if entry is current or entry["machine"] != current["machine"]:
+            continue
+        if revision is None or (entry["commit"] or "").startswith(revision):
+            return entry
+    return None
+
+
+def regressions(
+    baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD
+) -> list[tuple[str, float, float, bool]]:
+    """Compare the best times of the cases both entries measured
+    Returns (name, baseline time, current time, regressed) tuples
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name in baseline["results"]:
+            before = baseline["results"][name]["best"]
+            rows.append(
+                (
+                    name,
+                    before,
+                    result["best"],
+                    result["best"] > before * (1 + threshold),
+                )
+            )
+    return rows
+
+
+def _describe_entry(entry: dict) -> str:
+    commit = (entry["commit"] or "unknown")[:10] + ("+" if entry["dirty"] else "")
+    return f"{commit} ({entry['time']})"
+
+
+def compare(history_path: Path, revision: str = None, threshold: float = None) -> int:
+    """Print the comparison of the latest entry with its baseline
+    Returns 1 if any case regressed, 0 otherwise
+    """
+    history = read_history(history_path)
+    if not history:
+        print(f"No benchmark results in {history_path}", file=sys.stderr)
+        return 1
+    current = history[-1]
+    baseline = find_baseline(history, current, revision)
+    if baseline is None:
+        print("No earlier results of this machine to compare with", file=sys.stderr)
+        return 1
+    print(f"{_describe_entry(baseline)} -> {_describe_entry(current)}")
+    rows = regressions(baseline, current, threshold)
+    for name, before, after, regressed in rows:
+        print(
+            f"{name:48} {format_time(before)} {format_time(after)}"
+            f" {after / before:6.2f}x{'  REGRESSION' if regressed else ''}"
+        )
+    slower = sum(row[3] for row in rows)
+    print(f"{slower} of {len(rows)} cases more than {threshold:.0%} slower")
+    return 1 if slower else 0
+
+
+def main(argv: list[str] = None):
+    """Entry point of the benchmark script"""
+    parser = argparse.ArgumentParser(
+        prog="bench.py", description="Run and compare pyfitit-gui benchmarks"
+    )
+    parser.add_argument(
+        "--history", type=Path, default=DEFAULT_HISTORY, help="JSON lines history"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="time the cases and record them")
+    run_parser.add_argument(
+        "-k", "--filter", default="", help="only run cases whose name contains this"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5, help="timed loops")
+    run_parser.add_argument(
+        "--no-save", action="store_true", help="do not append to the history"
+    )
+    compare_parser = commands.add_parser(
+        "compare", help="check the latest results against earlier ones"
+    )
+    compare_parser.add_argument(
+        "--baseline", help="commit to compare with, by default the previous run"
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown counted as a regression",
+    )
+    commands.add_parser("list", help="list the case names")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        with tempfile.TemporaryDirectory() as workdir:
+            for name, _ in cases(Path(workdir)):
+                print(name)
+        print("\n".join(COLD_CASES))
+        return 0
+    if args.command == "compare":
+        return compare(args.history, args.baseline, args.threshold)
+    entry = run_suite(args.filter, args.repeat)
+    if not args.no_save:
+        append_history(args.history, entry)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Module with a headless generator that renders many PyFitIt projects at once
+
+A spec file is either a JSON list of projects or a CSV table with one project
+per row. Every project uses the placeholder names of the project template,
+for example:
+
+    [
+        {
+            "project_name": "ligand_scan_01",
+            "project_folder": "/data/scan",
+            "molecule_file": "molecule.xyz",
+            "spectrum_file": "exp.txt",
+            "parts": "0-5,6-21",
+            "left_interval": 8980, "right_interval": 9100,
+            "energy_range": "-15 0.5 50",
+            "Green": true, "Radius": 6,
+            "GH": 1.5, "Ecent": 30, "Elarg": 30, "Gmax": 15,
+            "Efermi": 0, "shift": 0, "norm": 1,
+            "deformations": [
+                {"part": 1, "atom_1": 0, "atom_2": 6, "def_type": "shift",
+                 "name": "r1", "range_left": -0.2, "range_right": 0.2}
+            ]
+        }
+    ]
+
+In CSV files the `deformations` column holds the same list encoded as JSON.
+This module never imports PyQt5.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .project_model import ProjectModel
+from .rendering import render_project
+from .spectrum import write_spectrum_sidecar
+
+
+def load_spec(path: Path) -> list[dict]:
+    """Read a JSON or CSV spec file into a list of project dictionaries
+    Arguments:
+    path: path to a .json or .csv spec file
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with path.open(newline="", encoding="utf-8") as spec_file:
+            projects = list(csv.DictReader(spec_file))
+        for project in projects:
+            project["deformations"] = json.loads(project.get("deformations") or "[]")
+        return projects
+    with path.open(encoding="utf-8") as spec_file:
+        projects = json.load(spec_file)
+    if isinstance(projects, dict):
+        projects = projects.get("projects", [projects])
+    return projects
+
+
+def validate_project(spec: dict):
+    """Build the model of a single spec entry
+    Returns the model and every problem found in the entry
+    """
+    model, errors = ProjectModel.from_spec(spec)
+    return model, errors + model.validate()
+
+
+def write_project(
+    model: ProjectModel,
+    output_dir: Path = None,
+    overwrite: bool = False,
+    compiled: bool = False,
+    spectrum_sidecar: bool = False,
+):
+    """Render a single validated project and write it as a project file
+    Arguments:
+    model: a validated project model
+    output_dir: directory overriding the project folder of the spec
+    overwrite: whether to replace already existing project files
+    compiled: whether to emit the compiled moleculeConstructor
+    spectrum_sidecar: whether the project prefers the already written sidecar
+    of its spectrum file
+    Returns the path of the written file and the number of bytes written
+    """
+    output_dictionary = model.output_dictionary(compiled, spectrum_sidecar)
+    folder = Path(output_dir or output_dictionary["project_folder"])
+    folder.mkdir(parents=True, exist_ok=True)
+    target = folder / f"{output_dictionary['project_name']}.py"
+    result = render_project(output_dictionary).encode("utf-8")
+    with target.open("wb" if overwrite else "xb") as output:
+        output.write(result)
+    return target, len(result)
+
+
+def write_sidecars(paths: set[str]) -> set[str]:
+    """Write the binary sidecars of spectrum files shared by any number of projects
+    Returns the paths whose sidecar was written
+    """
+    written = set()
+    for path in sorted(paths):
+        try:
+            write_spectrum_sidecar(path)
+        except (OSError, ValueError) as error:
+            print(f"{path}: no spectrum sidecar, {error}", file=sys.stderr)
+        else:
+            written.add(path)
+    return written
+
+
+# pylint: disable=too-many-locals
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-batch command"""
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-batch",
+        description="Render PyFitIt project files from a JSON or CSV spec",
+    )
+    parser.add_argument("spec", type=Path, help="JSON or CSV file listing projects")
+    parser.add_argument(
+        "-o", "--output-dir", type=Path, help="write all projects to this directory"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of writer threads"
+    )
+    parser.add_argument(
+        "--overwrite", action="store_true", help="replace existing project files"
+    )
+    parser.add_argument(
+        "--compiled",
+        action="store_true",
+        help="compose the deformations of every part into one transform",
+    )
+    parser.add_argument(
+        "--spectrum-sidecar",
+        action="store_true",
+        help="write a binary copy of every spectrum that the projects load first",
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="only validate the spec, write nothing"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    projects = load_spec(args.spec)
+    models = []
+    invalid = 0
+    for idx, spec in enumerate(projects):
+        model, errors = validate_project(spec)
+        models.append(model)
+        for error in errors:
+            invalid += 1
+            print(f"{spec.get('project_name', f'#{idx}')}: {error}", file=sys.stderr)
+    if invalid:
+        print(f"Spec contains {invalid} error(s), nothing written", file=sys.stderr)
+        return 1
+    if args.check:
+        print(f"Spec with {len(projects)} project(s) is valid")
+        return 0
+
+    sidecars = (
+        write_sidecars({model.spectrum_path() for model in models})
+        if args.spectrum_sidecar
+        else set()
+    )
+    written = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(
+                write_project,
+                model,
+                args.output_dir,
+                args.overwrite,
+                args.compiled,
+                model.spectrum_path() in sidecars,
+            )
+            for model in models
+        ]
+        for future in futures:
+            try:
+                _, size = future.result()
+            except OSError as error:
+                failed += 1
+                print(f"Failed to save: {error}", file=sys.stderr)
+            else:
+                written += size
+    elapsed = time.perf_counter() - start
+    saved = len(projects) - failed
+    print(
+        f"Rendered {saved} project(s) in {elapsed:.3f} s "
+        f"({saved / elapsed:.1f} projects/s, {written / elapsed / 1e6:.2f} MB/s)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Module inferring bonds of a molecule and suggesting a partition into parts
+
+Two atoms are bonded when they are closer than the sum of their covalent
+radii plus a tolerance. Candidate pairs come from the cell list of the clash
+module, so finding bonds stays close to linear in the number of atoms.
+
+Ligands are the connected components of the bond graph once the bonds to
+metal atoms are removed, and every metal atom is a fragment of its own.
+Bonds lying on no cycle (bridges) tell ring systems from chains. A part of
+the partition input is a single index range, passed to pyFitIt as its own
+setParts argument, so the suggested partition splits the atoms wherever the
+fragment changes along the file order.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from .clash import close_pairs
+
+BOND_TOLERANCE = 0.45
+"""Distance in Angstrom added to the sum of covalent radii of bonded atoms"""
+
+DEFAULT_COVALENT_RADIUS = 1.5
+
+# fmt: off
+COVALENT_RADII = {
+    "H": 0.31, "He": 0.28, "Li": 1.28, "Be": 0.96, "B": 0.84, "C": 0.76,
+    "N": 0.71, "O": 0.66, "F": 0.57, "Ne": 0.58, "Na": 1.66, "Mg": 1.41,
+    "Al": 1.21, "Si": 1.11, "P": 1.07, "S": 1.05, "Cl": 1.02, "Ar": 1.06,
+    "K": 2.03, "Ca": 1.76, "Sc": 1.70, "Ti": 1.60, "V": 1.53, "Cr": 1.39,
+    "Mn": 1.39, "Fe": 1.32, "Co": 1.26, "Ni": 1.24, "Cu": 1.32, "Zn": 1.22,
+    "Ga": 1.22, "Ge": 1.20, "As": 1.19, "Se": 1.20, "Br": 1.20, "Kr": 1.16,
+    "Rb": 2.20, "Sr": 1.95, "Y": 1.90, "Zr": 1.75, "Nb": 1.64, "Mo": 1.54,
+    "Tc": 1.47, "Ru": 1.46, "Rh": 1.42, "Pd": 1.39, "Ag": 1.45, "Cd": 1.44,
+    "In": 1.42, "Sn": 1.39, "Sb": 1.39, "Te": 1.38, "I": 1.39, "Xe": 1.40,
+    "Cs": 2.44, "Ba": 2.15, "La": 2.07, "Ce": 2.04, "Pr": 2.03, "Nd": 2.01,
+    "Sm": 1.98, "Eu": 1.98, "Gd": 1.96, "Tb": 1.94, "Dy": 1.92, "Ho": 1.92,
+    "Er": 1.89, "Tm": 1.90, "Yb": 1.87, "Lu": 1.87, "Hf": 1.75, "Ta": 1.70,
+    "W": 1.62, "Re": 1.51, "Os": 1.44, "Ir": 1.41, "Pt": 1.36, "Au": 1.36,
+    "Hg": 1.32, "Tl": 1.45, "Pb": 1.46, "Bi": 1.48, "Th": 2.06, "U": 1.96,
+}
+# fmt: on
+"""Covalent radii in Angstrom, from Cordero et al., Dalton Trans. 2008"""
+
+NON_METALS = frozenset(
+    "H He B C N O F Ne Si P S Cl Ar Ge As Se Br Kr Sb Te I Xe At Rn".split()
+)
+
+
+@dataclass(frozen=True)
+class BondGraph:
+    """Bonds of a molecule and the fragments they define"""
+
+    bonds: np.ndarray
+    components: np.ndarray
+    fragments: np.ndarray
+    bridges: np.ndarray
+
+    def partition(self) -> str:
+        """Partition text with a part for every run of atoms of one fragment"""
+        starts = np.flatnonzero(np.diff(self.fragments, prepend=-1))
+        stops = np.append(starts[1:], len(self.fragments)) - 1
+        return ",".join(
+            f"{start}-{stop}" if stop > start else str(start)
+            for start, stop in zip(starts, stops)
+        )
+
+    @property
+    def split_fragments(self) -> int:
+        """Number of fragments whose atoms are not contiguous in the file"""
+        runs = np.flatnonzero(np.diff(self.fragments, prepend=-1))
+        counts = np.unique(self.fragments[runs], return_counts=True)[1]
+        return int(np.count_nonzero(counts > 1))
+
+
+def _symbols(elements: np.ndarray) -> list[str]:
+    return [str(element).strip().capitalize() for element in elements]
+
+
+def covalent_radii(elements: np.ndarray) -> np.ndarray:
+    """Covalent radius of every atom, a default one for unknown elements"""
+    return np.array(
+        [
+            COVALENT_RADII.get(symbol, DEFAULT_COVALENT_RADIUS)
+            for symbol in _symbols(elements)
+        ]
+    )
+
+
+def find_bonds(
+    coordinates: np.ndarray, elements: np.ndarray, tolerance: float = BOND_TOLERANCE
+) -> np.ndarray:
+    """Return the (bond, 2) atom index pairs closer than their covalent radii allow"""
+    radii = covalent_radii(elements)
+    if len(radii) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = close_pairs(coordinates, 2 * radii.max() + tolerance)
+    differences = coordinates[pairs[:, 0]] - coordinates[pairs[:, 1]]
+    distances = np.sqrt(np.einsum("ij,ij->i", differences, differences))
+    return pairs[distances <= radii[pairs[:, 0]] + radii[pairs[:, 1]] + tolerance]
+
+
+def connected_components(count: int, bonds: np.ndarray) -> np.ndarray:
+    """Label every atom with the smallest atom index of its connected component
+    Roots are hooked onto smaller roots and paths are halved by pointer
+    jumping, so the number of passes grows with the log of the graph size
+    """
+    labels = np.arange(count)
+    if bonds.size == 0:
+        return labels
+    first, second = bonds[:, 0], bonds[:, 1]
+    while True:
+        first_labels, second_labels = labels[first], labels[second]
+        differ = first_labels != second_labels
+        if not differ.any():
+            return labels
+        low = np.minimum(first_labels[differ], second_labels[differ])
+        high = np.maximum(first_labels[differ], second_labels[differ])
+        np.minimum.at(labels, high, low)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+# pylint: disable=too-many-locals
+def find_bridges(count: int, bonds: np.ndarray) -> np.ndarray:
+    """Mark the bonds lying on no cycle, with an iterative depth first search"""
+    order = np.argsort(np.concatenate((bonds[:, 0], bonds[:, 1])), kind="stable")
+    neighbours = np.concatenate((bonds[:, 1], bonds[:, 0]))[order]
+    edge_ids = np.tile(np.arange(len(bonds)), 2)[order]
+    offsets = np.searchsorted(
+        np.concatenate((bonds[:, 0], bonds[:, 1]))[order], np.arange(count + 1)
+    ).tolist()
+    neighbours, edge_ids = neighbours.tolist(), edge_ids.tolist()
+    discovery = [-1] * count
+    low = [0] * count
+    bridges = np.zeros(len(bonds), dtype=bool)
+    time = 0
+    for root in range(count):
+        if discovery[root] >= 0:
+            continue
+        discovery[root] = low[root] = time
+        time += 1
+        stack = [(root, -1, offsets[root])]
+        while stack:
+            atom, via, position = stack[-1]
+            if position < offsets[atom + 1]:
+                stack[-1] = (atom, via, position + 1)
+                neighbour, edge = neighbours[position], edge_ids[position]
+                if edge == via:
+                    continue
+                if discovery[neighbour] < 0:
+                    discovery[neighbour] = low[neighbour] = time
+                    time += 1
+                    stack.append((neighbour, edge, offsets[neighbour]))
+                else:
+                    low[atom] = min(low[atom], discovery[neighbour])
+                continue
+            stack.pop()
+            if stack:
+                parent = stack[-1][0]
+                low[parent] = min(low[parent], low[atom])
+                if low[atom] > discovery[parent]:
+                    bridges[via] = True
+    return bridges
+
+
+def bond_graph(
+    coordinates: np.ndarray, elements: np.ndarray, tolerance: float = BOND_TOLERANCE
+) -> BondGraph:
+    """Find the bonds, components, ligand fragments and bridges of a molecule"""
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    bonds = find_bonds(coordinates, elements, tolerance)
+    metal = np.array([symbol not in NON_METALS for symbol in _symbols(elements)])
+    ligand_bonds = bonds[~(metal[bonds[:, 0]] | metal[bonds[:, 1]])]
+    return BondGraph(
+        bonds=bonds,
+        components=connected_components(len(coordinates), bonds),
+        fragments=connected_components(len(coordinates), ligand_bonds),
+        bridges=find_bridges(len(coordinates), bonds),
+    )
+
+
+def describe_fragments(graph: BondGraph, elements: np.ndarray, limit: int = 20) -> str:
+    """Formula, size and ring content of the largest fragments"""
+    symbols = np.array(_symbols(elements))
+    ring_atoms = np.zeros(len(symbols), dtype=bool)
+    ring_atoms[graph.bonds[~graph.bridges].ravel()] = True
+    labels, counts = np.unique(graph.fragments, return_counts=True)
+    lines = []
+    for label in labels[np.argsort(-counts, kind="stable")][:limit]:
+        members = np.flatnonzero(graph.fragments == label)
+        formula = "".join(
+            f"{symbol}{count if count > 1 else ''}"
+            for symbol, count in sorted(Counter(symbols[members]).items())
+        )
+        rings = " with rings" if ring_atoms[members].any() else ""
+        size = f"{len(members)} atoms" if len(members) > 1 else "1 atom"
+        lines.append(f"{formula} ({size} from {members[0]}){rings}")
+    if len(labels) > limit:
+        lines.append(f"... and {len(labels) - limit} more fragments")
+    return "\n".join(lines)
+
+
+def part_bonds(graph: BondGraph, parts: list[np.ndarray]) -> list[tuple[int, int, int]]:
+    """Bonds joining different parts as deformation axes
+    Returns (part, atom_1, atom_2) triples for moving the part of atom_1
+    relative to atom_2, every bond listed once for each of its sides
+    """
+    part_of = np.full(int(graph.fragments.size), -1)
+    for number, atoms in enumerate(parts):
+        part_of[atoms[atoms < part_of.size]] = number
+    first, second = graph.bonds[:, 0], graph.bonds[:, 1]
+    joining = (
+        (part_of[first] != part_of[second])
+        & (part_of[first] >= 0)
+        & (part_of[second] >= 0)
+    )
+    axes = []
+    for atom_1, atom_2 in graph.bonds[joining].tolist():
+        axes.append((int(part_of[atom_1]), atom_1, atom_2))
+        axes.append((int(part_of[atom_2]), atom_2, atom_1))
+    return axes
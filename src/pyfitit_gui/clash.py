@@ -0,0 +1,321 @@
+"""Module checking deformed geometries for atoms that come too close
+
+The generated project calls `m.checkInteratomicDistance(minDist = 0.8)`
+for every molecule it builds. That check compares all pairs of atoms and
+only runs once the project does. Here atoms are sorted into cubic cells as
+large as the minimum distance, so only atoms in neighbouring cells are
+compared, and the check stays close to linear in the number of atoms.
+
+Deformations move whole parts rigidly, so distances within a part never
+change. They are checked once on the undeformed molecule, and the deformed
+geometries only need pairs between different parts. Geometries are the edge
+points of the deformation ranges plus random samples from inside them, and
+are checked in parallel worker processes. The workers are started by a fork
+server or spawned, since forking the threads of the GUI is unsafe. With many
+deformations the 2^N edge points can be limited to a random subset of them.
+"""
+
+import os
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .datatypes import Deformation
+from .deformation_engine import deform
+from .processes import process_pool
+
+MIN_DISTANCE = 0.8
+"""Minimum interatomic distance used by the generated project"""
+
+CLASH_CHUNK_BYTES = 32 * 2**20
+"""Approximate size of the geometry blocks a worker deforms at once"""
+
+CLASH_SAMPLES = 256
+"""Number of random geometries from inside the ranges checked besides the edges"""
+
+_HALF_STENCIL = np.array(
+    [
+        (dx, dy, dz)
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) > (0, 0, 0)
+    ]
+)
+
+
+@dataclass
+class GeometryClash:
+    """Closest atom pair of a geometry whose atoms come too close"""
+
+    params: np.ndarray
+    atom_1: int
+    atom_2: int
+    distance: float
+
+
+@dataclass
+class ClashReport:
+    """Result of checking the deformations of a molecule for clashes"""
+
+    min_distance: float
+    geometries_checked: int = 0
+    static_clashes: list[tuple[int, int, float]] = field(default_factory=list)
+    clashes: list[GeometryClash] = field(default_factory=list)
+    edges_sampled: bool = False
+    stopped: bool = False
+
+    def describe(self, deformations: list[Deformation], limit: int = 5) -> str:
+        """Summarise the clashes and the deformation values causing them"""
+        lines = []
+        if self.static_clashes:
+            closest = min(self.static_clashes, key=lambda pair: pair[2])
+            lines.append(
+                f"{len(self.static_clashes)} atom pairs of the undeformed molecule"
+                f" are closer than {self.min_distance}, e.g. atoms {closest[0]}"
+                f" and {closest[1]} at {closest[2]:.3f}"
+            )
+        if self.edges_sampled:
+            lines.append("Only a random subset of the edge points was checked")
+        if self.stopped:
+            lines.append(
+                f"The check was stopped after {self.geometries_checked} geometries"
+            )
+        if not self.clashes:
+            lines.append(
+                f"None of the {self.geometries_checked} deformed geometries has"
+                f" atoms of different parts closer than {self.min_distance}"
+            )
+            return "\n".join(lines)
+        lines.append(
+            f"{len(self.clashes)} of {self.geometries_checked} deformed geometries"
+            f" have atoms of different parts closer than {self.min_distance}"
+        )
+        params = np.array([clash.params for clash in self.clashes])
+        for column, deformation in enumerate(deformations):
+            width = (deformation.range_right - deformation.range_left) or 1.0
+            position = (params[:, column] - deformation.range_left) / width
+            for end, share in (
+                ("left", np.mean(position < 0.5)),
+                ("right", np.mean(position >= 0.5)),
+            ):
+                if share >= 0.9 and len(params) > 1:
+                    lines.append(
+                        f"'{deformation.name}' is in the {end} half of its range"
+                        f" in {share:.0%} of them"
+                    )
+        for clash in sorted(self.clashes, key=lambda clash: clash.distance)[:limit]:
+            values = ", ".join(
+                f"{deformation.name}={value:g}"
+                for deformation, value in zip(deformations, clash.params)
+            )
+            lines.append(
+                f"atoms {clash.atom_1} and {clash.atom_2} at {clash.distance:.3f}"
+                f" for {values}"
+            )
+        return "\n".join(lines)
+
+
+# pylint: disable=too-many-locals
+def close_pairs(coordinates: np.ndarray, min_distance: float) -> np.ndarray:
+    """Find all atom pairs closer than min_distance using a cell list
+    Returns a (pair, 2) array of atom indices, the smaller index first
+    """
+    count = len(coordinates)
+    if count < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    cells = np.floor((coordinates - coordinates.min(axis=0)) / min_distance).astype(
+        np.int64
+    )
+    # A padding cell on each side keeps neighbour keys from wrapping around
+    cells += 1
+    shape = cells.max(axis=0) + 2
+    keys = (cells[:, 0] * shape[1] + cells[:, 1]) * shape[2] + cells[:, 2]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_coordinates = coordinates[order]
+    positions = np.arange(count)
+
+    pairs = []
+    for offset in ((0, 0, 0),) + tuple(map(tuple, _HALF_STENCIL)):
+        offset_key = (offset[0] * shape[1] + offset[1]) * shape[2] + offset[2]
+        starts = np.searchsorted(sorted_keys, sorted_keys + offset_key, side="left")
+        stops = np.searchsorted(sorted_keys, sorted_keys + offset_key, side="right")
+        if offset_key == 0:
+            starts = positions + 1
+        counts = np.maximum(stops - starts, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        first = np.repeat(positions, counts)
+        second = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+            total
+        )
+        differences = sorted_coordinates[first] - sorted_coordinates[second]
+        distances = np.einsum("ij,ij->i", differences, differences)
+        close = distances < min_distance**2
+        pairs.append(np.stack((order[first[close]], order[second[close]]), axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(pairs)
+    return np.sort(pairs, axis=1)
+
+
+def part_labels(atom_count: int, parts: list[slice]) -> np.ndarray:
+    """Label every atom with the last part containing it, -1 for no part"""
+    labels = np.full(atom_count, -1, dtype=np.int64)
+    for number, part in enumerate(parts):
+        labels[part] = number
+    return labels
+
+
+def edge_params(
+    deformations: list[Deformation], limit: int = None, seed: int = 0
+) -> np.ndarray:
+    """Parameter values of every corner of the deformation ranges
+    With more than limit corners, limit random corners are returned instead
+    """
+    bounds = np.array(
+        [
+            (deformation.range_left, deformation.range_right)
+            for deformation in deformations
+        ]
+    ).reshape(-1, 2)
+    if limit is not None and 2 ** len(bounds) > limit:
+        corners = np.random.default_rng(seed).integers(0, 2, (limit, len(bounds)))
+    else:
+        corners = np.arange(2 ** len(bounds))[:, None] >> np.arange(len(bounds)) & 1
+    return bounds[np.arange(len(bounds)), corners]
+
+
+def sample_params(
+    deformations: list[Deformation], samples: int, seed: int = 0
+) -> np.ndarray:
+    """Uniformly random parameter values from inside the deformation ranges"""
+    bounds = np.array(
+        [
+            (deformation.range_left, deformation.range_right)
+            for deformation in deformations
+        ]
+    ).reshape(-1, 2)
+    unit = np.random.default_rng(seed).random((samples, len(bounds)))
+    return bounds[:, 0] + unit * (bounds[:, 1] - bounds[:, 0])
+
+
+_worker_state = {}
+
+
+def _init_worker(coordinates, parts, deformations, min_distance):
+    _worker_state.update(
+        coordinates=coordinates,
+        parts=parts,
+        deformations=deformations,
+        labels=part_labels(len(coordinates), parts),
+        min_distance=min_distance,
+    )
+
+
+def _check_params(params: np.ndarray) -> list[GeometryClash]:
+    state = _worker_state
+    clashes = []
+    chunk = max(1, CLASH_CHUNK_BYTES // state["coordinates"].nbytes)
+    for start in range(0, len(params), chunk):
+        block = params[start : start + chunk]
+        geometries = deform(
+            state["coordinates"], state["parts"], state["deformations"], block
+        )
+        for values, geometry in zip(block, geometries):
+            pairs = close_pairs(geometry, state["min_distance"])
+            pairs = pairs[state["labels"][pairs[:, 0]] != state["labels"][pairs[:, 1]]]
+            if len(pairs) == 0:
+                continue
+            distances = np.linalg.norm(
+                geometry[pairs[:, 0]] - geometry[pairs[:, 1]], axis=1
+            )
+            closest = int(np.argmin(distances))
+            clashes.append(
+                GeometryClash(
+                    values,
+                    int(pairs[closest, 0]),
+                    int(pairs[closest, 1]),
+                    float(distances[closest]),
+                )
+            )
+    return clashes
+
+
+# pylint: disable=too-many-arguments
+def check_clashes(
+    coordinates: np.ndarray,
+    parts: list[slice],
+    deformations: Iterable[Deformation],
+    min_distance: float = MIN_DISTANCE,
+    samples: int = CLASH_SAMPLES,
+    workers: int = None,
+    edge_limit: int = None,
+    progress: Callable[[int], bool] = None,
+) -> ClashReport:
+    """Check the undeformed molecule, all edge points and random inner points
+    Arguments:
+    coordinates: (atom, xyz) coordinates of the undeformed molecule
+    parts: atom slices of the molecule parts
+    deformations: the deformations in the order they are applied
+    min_distance: atoms closer than this are reported
+    samples: number of random geometries from inside the ranges
+    workers: number of worker processes, all cores by default, 1 to stay in process
+    edge_limit: check this many random edge points when there are more
+    progress: called with the number of checked geometries, returning False stops
+    """
+    deformations = list(deformations)
+    coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+    report = ClashReport(min_distance)
+    static_pairs = close_pairs(coordinates, min_distance)
+    report.static_clashes = [
+        (
+            int(first),
+            int(second),
+            float(np.linalg.norm(coordinates[first] - coordinates[second])),
+        )
+        for first, second in static_pairs
+    ]
+    if not deformations:
+        return report
+    params = np.concatenate(
+        (
+            edge_params(deformations, edge_limit),
+            sample_params(deformations, samples),
+        )
+    )
+    report.edges_sampled = (
+        edge_limit is not None and 2 ** len(deformations) > edge_limit
+    )
+    workers = workers or os.cpu_count() or 1
+    # Blocks of at most a few hundred geometries keep progress and stopping prompt
+    blocks = np.array_split(
+        params, min(len(params), max(4 * workers, len(params) // 256 + 1))
+    )
+    checked = _checked_blocks(
+        blocks, workers, (coordinates, parts, deformations, min_distance)
+    )
+    for block, clashes in zip(blocks, checked):
+        report.clashes.extend(clashes)
+        report.geometries_checked += len(block)
+        if progress is not None and progress(report.geometries_checked) is False:
+            report.stopped = report.geometries_checked < len(params)
+            checked.close()
+            break
+    return report
+
+
+def _checked_blocks(blocks: list[np.ndarray], workers: int, initargs: tuple):
+    """Yield the clashes of every block, checked in process or by worker processes"""
+    if workers == 1 or len(blocks) < 2 * workers:
+        _init_worker(*initargs)
+        yield from map(_check_params, blocks)
+        return
+    with process_pool(workers, _init_worker, initargs) as executor:
+        try:
+            yield from executor.map(_check_params, blocks)
+        finally:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,134 @@
+"""Module counting the atoms FDMNES includes in the cluster around the absorber
+
+FDMNES only takes the atoms within the cluster radius of the absorbing atom
+into account, and their number dominates its run time. The distances of all
+atoms to the absorber are sorted once, so the count for any radius is a
+binary search.
+
+The edge geometries of the deformations move atoms towards or away from the
+absorber. Their distances up to an indexed radius are kept in one list
+sorted by distance, together with the geometry each belongs to. The counts of
+all geometries are then updated incrementally: moving the radius only visits
+the distances between the old and the new radius. A radius beyond the
+indexed one rebuilds the index with twice that radius.
+"""
+
+from collections.abc import Iterable
+
+import numpy as np
+
+from .datatypes import Deformation
+from .deformation_engine import corner_count, edge_geometries
+
+CLUSTER_INDEX_RADIUS = 12.0
+"""Smallest radius, in Angstrom, up to which edge geometry distances are indexed"""
+
+MAX_INDEXED_EDGES = 2**14
+"""Largest number of edge geometries whose distances are indexed"""
+
+
+def absorber_distances(geometries: np.ndarray, absorber: int) -> np.ndarray:
+    """Distances of all atoms to the absorber in (geometry, atom, xyz) blocks"""
+    return np.sqrt(
+        ((geometries - geometries[:, absorber : absorber + 1]) ** 2).sum(axis=2)
+    )
+
+
+# pylint: disable=too-many-instance-attributes
+class ClusterIndex:
+    """Atom counts within a radius of the absorber, for a molecule and its edges
+    Init:
+    coordinates: (atom, xyz) coordinates of the undeformed molecule
+    absorber: 0-based index of the absorbing atom
+    parts: atom slices of the molecule parts, None to skip the edge geometries
+    deformations: the deformations building the edge geometries
+    """
+
+    def __init__(
+        self,
+        coordinates: np.ndarray,
+        absorber: int = 0,
+        parts: list[slice] = None,
+        deformations: Iterable[Deformation] = (),
+    ):
+        if not 0 <= absorber < len(coordinates):
+            raise ValueError(f"Absorber {absorber + 1} is not an atom of the molecule!")
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        self.absorber = absorber
+        self.parts = parts
+        self.deformations = list(deformations)
+        self.distances = np.sort(
+            absorber_distances(self.coordinates[None], absorber)[0]
+        )
+        self.edge_count = (
+            corner_count(self.deformations)
+            if parts is not None and self.deformations
+            else 0
+        )
+        self.indexed_radius = 0.0
+        self._edge_distances = np.empty(0)
+        self._edge_geometry = np.empty(0, dtype=np.int64)
+        self._edge_counts = np.zeros(0, dtype=np.int64)
+        self._radius = -np.inf
+
+    @property
+    def edges_indexed(self) -> bool:
+        """Whether there are edge geometries and few enough of them to index"""
+        return 0 < self.edge_count <= MAX_INDEXED_EDGES
+
+    def count(self, radius: float) -> int:
+        """Number of atoms within the radius in the undeformed molecule"""
+        return int(np.searchsorted(self.distances, radius, side="right"))
+
+    def edge_counts(self, radius: float) -> np.ndarray:
+        """Number of atoms within the radius in every edge geometry
+        Returns None when the edge geometries are not indexed
+        """
+        if not self.edges_indexed:
+            return None
+        if radius > self.indexed_radius:
+            self._index_edges(max(CLUSTER_INDEX_RADIUS, 2 * radius))
+        low, high = sorted((self._radius, radius))
+        start, stop = np.searchsorted(self._edge_distances, (low, high), side="right")
+        changed = np.bincount(
+            self._edge_geometry[start:stop], minlength=self.edge_count
+        )
+        if radius >= self._radius:
+            self._edge_counts += changed
+        else:
+            self._edge_counts -= changed
+        self._radius = radius
+        return self._edge_counts
+
+    def _index_edges(self, radius: float):
+        distances, geometry_ids = [], []
+        offset = 0
+        for _, geometries in edge_geometries(
+            self.coordinates, self.parts, self.deformations
+        ):
+            block = absorber_distances(geometries, self.absorber)
+            rows, columns = np.nonzero(block <= radius)
+            distances.append(block[rows, columns])
+            geometry_ids.append(rows + offset)
+            offset += len(geometries)
+        distances = np.concatenate(distances)
+        order = np.argsort(distances, kind="stable")
+        self._edge_distances = distances[order]
+        self._edge_geometry = np.concatenate(geometry_ids)[order]
+        self._edge_counts = np.zeros(self.edge_count, dtype=np.int64)
+        self._radius = -np.inf
+        self.indexed_radius = radius
+
+
+def describe_cluster(index: ClusterIndex, radius: float) -> str:
+    """Atom count within the radius and its range over the edge geometries"""
+    text = f"{index.count(radius)} atoms within {radius:g}"
+    counts = index.edge_counts(radius)
+    if counts is not None:
+        text += (
+            f" ({counts.min()} - {counts.max()}, mean {counts.mean():.1f} in the"
+            f" {index.edge_count} edge geometries)"
+        )
+    elif index.edge_count:
+        text += f" (too many edge geometries to count, {index.edge_count})"
+    return text
@@ -0,0 +1,202 @@
+"""Module showing the energy grid of a project and the estimated cost of its runs
+
+The estimate is redrawn whenever the energy range, the cluster radius, the
+Green mode, the interval or the molecule change, so a setting that multiplies
+the run time shows up before any job is submitted. The cluster index of the
+molecule is kept until the molecule, absorber, partition or deformations
+change, so typing a radius only queries it.
+"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QWidget,
+)
+
+from .lazy import lazy_import
+
+cluster = lazy_import(".cluster", __package__)
+deformation_engine = lazy_import(".deformation_engine", __package__)
+energy_grid = lazy_import(".energy_grid", __package__)
+molecule = lazy_import(".molecule", __package__)
+
+CAMPAIGN_SAMPLES = 1000
+"""Number of sampled geometries the campaign cost is quoted for"""
+
+
+class CostPreview:
+    """Energy grid and cost estimate of the project of a main window
+    Init:
+    window: the main window whose settings and molecule are used
+    """
+
+    def __init__(self, window: QWidget):
+        self.window = window
+        self.model = None
+        self.cluster_index = None
+        self._cluster_key = None
+
+    def create_widgets(self, layout: QHBoxLayout):
+        """Add the estimate label and the calibration button to a layout"""
+        self.window.widgets["energy_grid_info_label"] = QLabel()
+        self.window.widgets["energy_grid_info_label"].setWordWrap(True)
+        calibrate_button = QPushButton("Calibrate")
+        calibrate_button.setToolTip(
+            """<font>Fit the cost estimate to the run times recorded in a directory
+            of finished FDMNES input folders.</font>"""
+        )
+        calibrate_button.clicked.connect(self.calibrate_dialog)
+        self.window.widgets["absorber_input"] = QSpinBox()
+        self.window.widgets["absorber_input"].setMinimum(1)
+        self.window.widgets["absorber_input"].setToolTip(
+            """<font>1-based index of the absorbing atom, the center of the
+            FDMNES cluster.</font>"""
+        )
+        self.window.widgets["absorber_input"].valueChanged.connect(self.update)
+        layout.addWidget(QLabel("Absorber"))
+        layout.addWidget(self.window.widgets["absorber_input"])
+        layout.addWidget(self.window.widgets["energy_grid_info_label"], 1)
+        layout.addWidget(calibrate_button)
+
+    def calibrate_dialog(self):
+        """Callback fitting the cost model to the runs of a deck directory"""
+        deck_dir = QFileDialog.getExistingDirectory(
+            self.window,
+            "Choose a directory of finished FDMNES runs",
+            self.window.project.settings["project_folder"] or ".",
+        )
+        if not deck_dir:
+            return
+        runs = energy_grid.recorded_runs(deck_dir)
+        if not runs:
+            self.window.save_and_exit_error_message(
+                f"No recorded FDMNES runs found in {deck_dir}!"
+            )
+            return
+        self.model = energy_grid.calibrate(runs)
+        try:
+            self.model.save()
+        except OSError as error:
+            self.window.save_and_exit_error_message(
+                f"Could not save the cost model: {error}"
+            )
+        self.update()
+
+    def cost_model(self) -> "energy_grid.CostModel":
+        """Cost model, read from its file on first use"""
+        if self.model is None:
+            self.model = energy_grid.CostModel.load()
+        return self.model
+
+    def absorber(self) -> int:
+        """1-based index of the absorbing atom"""
+        return self.window.widgets["absorber_input"].value()
+
+    def cluster(self) -> "cluster.ClusterIndex":
+        """Cluster index of the loaded molecule, None if there is no molecule
+        The edge geometries are only indexed with a valid partition
+        """
+        loaded = self.window.molecule
+        if loaded is None:
+            return None
+        project = self.window.project
+        store = project.deformations
+        key = (
+            id(loaded),
+            self.absorber(),
+            project.settings["parts"],
+            tuple(
+                bytes(column)
+                for column in (
+                    store.parts,
+                    store.atoms_1,
+                    store.atoms_2,
+                    store.types,
+                    store.ranges_left,
+                    store.ranges_right,
+                )
+            ),
+        )
+        if key != self._cluster_key:
+            try:
+                parts = deformation_engine.part_slices(
+                    molecule.parse_partition(project.settings["parts"])
+                )
+            except ValueError:
+                parts = None
+            self.cluster_index = cluster.ClusterIndex(
+                loaded.coordinates, self.absorber() - 1, parts, store
+            )
+            self._cluster_key = key
+        return self.cluster_index
+
+    def update(self):
+        """Redraw the grid size, coverage and cost estimate"""
+        label = self.window.widgets["energy_grid_info_label"]
+        text = self.window.widgets["FDMNES_energy_range_input"].text()
+        if not text.strip():
+            label.setText("No energy range")
+            return
+        try:
+            grid = energy_grid.parse_energy_range(text)
+        except ValueError as error:
+            label.setText(str(error))
+            return
+        label.setText(
+            f"{len(grid)} energy points" + self._coverage(grid) + self._cost(grid)
+        )
+
+    def _coverage(self, grid) -> str:
+        widgets = self.window.widgets
+        try:
+            left = float(widgets["project_energy_interval_left"].text())
+            right = float(widgets["project_energy_interval_right"].text())
+        except ValueError:
+            return ""
+        try:
+            shift = float(widgets["FDMNES_Shift_input"].text())
+        except ValueError:
+            shift = None
+        problems = energy_grid.grid_coverage_problems(grid, left, right, shift)
+        return f" ({'; '.join(problems)}!)" if problems else ""
+
+    def _cost(self, grid) -> str:
+        try:
+            radius = float(self.window.widgets["FDMNES_radius_input"].text())
+        except ValueError:
+            return ""
+        if self.window.molecule is None:
+            return ""
+        self.window.widgets["absorber_input"].setMaximum(
+            self.window.molecule.atom_count
+        )
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            index = self.cluster()
+            cluster_info = cluster.describe_cluster(index, radius)
+        except ValueError as error:
+            return f", {error}"
+        finally:
+            QApplication.restoreOverrideCursor()
+        atoms = index.count(radius)
+        model = self.cost_model()
+        seconds = model.seconds(
+            len(grid), atoms, self.window.widgets["FDMNES_green"].isChecked()
+        )
+        edges = deformation_engine.corner_count(self.window.project.deformations)
+        return (
+            f", {cluster_info}: about {energy_grid.describe_duration(seconds)}"
+            f" per geometry, {energy_grid.describe_duration(seconds * edges)} for the {edges}"
+            f" edge geometries, {energy_grid.describe_duration(seconds * CAMPAIGN_SAMPLES)} for"
+            f" {CAMPAIGN_SAMPLES} samples"
+            + (
+                f" (calibrated on {model.runs} runs)"
+                if model.runs
+                else " (uncalibrated)"
+            )
+        )
@@ -0,0 +1,429 @@
+"""Module storing sampled geometries and their spectra as one columnar dataset
+
+Training an inverse method needs the parameters, geometry and calculated
+spectrum of every sample. After a run they are spread over a geometry stack,
+its parameter file and one FDMNES folder per sample. A dataset gathers them
+in a directory of contiguous columns:
+
+    header.json       deformation names and ranges, elements, sample count
+    energy.npy        (energy,) float64 grid shared by all spectra
+    samples.npy       (sample,) int64 index of the sample in its stack
+    params.npy        (sample, deformation) float64 parameter values
+    geometries.npy    (sample, atom, 3) float32 coordinates
+    spectra.npy       (sample, energy) float32 spectra on the shared grid
+
+The deformation names and ranges are those of the geometryParamRanges of the
+project, in the same order, so params columns match the generated project.
+Columns are .npy files whose fixed-size header is rewritten when samples are
+appended. The sample count of header.json is updated last, so readers only
+see complete rows and an interrupted append is cut off by the next one.
+Datasets are memory-mapped when opened, which takes the same time for any
+number of samples, and slicing one only reads the slice from disk.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+import numpy as np
+
+from .datatypes import Deformation
+from .fdmnes import FDMNES_OUTPUT_NAME, deck_folder_name, finished_samples
+from .rendering import expand_geometry_param_ranges
+from .sampling import NPY_HEADER_BYTES, npy_header, params_path, project_molecule
+from .spectrum import load_spectrum
+
+DATASET_FORMAT = "pyfitit-gui-dataset"
+DATASET_VERSION = 1
+HEADER_NAME = "header.json"
+ENERGY_NAME = "energy.npy"
+
+COLUMNS = {
+    "samples": "<i8",
+    "params": "<f8",
+    "geometries": "<f4",
+    "spectra": "<f4",
+}
+"""Data type of every column, by the name of its file without .npy"""
+
+DATASET_BLOCK = 1024
+"""Number of samples read from the FDMNES folders and appended at once"""
+
+
+def read_header(path: Path) -> dict:
+    """Read and check the header of a dataset directory"""
+    with (Path(path) / HEADER_NAME).open(encoding="utf-8") as header_file:
+        header = json.load(header_file)
+    if header.get("format") != DATASET_FORMAT:
+        raise ValueError(f"{path} is not a pyfitit-gui dataset!")
+    if header.get("version", 0) > DATASET_VERSION:
+        raise ValueError(
+            f"{path} was written by a newer version (format {header['version']})!"
+        )
+    return header
+
+
+def _write_header(path: Path, header: dict):
+    temporary = path / (HEADER_NAME + ".partial")
+    with temporary.open("w", encoding="utf-8") as header_file:
+        json.dump(header, header_file, indent=1)
+        header_file.flush()
+        os.fsync(header_file.fileno())
+    os.replace(temporary, path / HEADER_NAME)
+
+
+def _row_shapes(header: dict) -> dict[str, tuple]:
+    return {
+        "samples": (),
+        "params": (len(header["names"]),),
+        "geometries": (header["atom_count"], 3),
+        "spectra": (header["energy_points"],),
+    }
+
+
+def check_deformations(header: dict, deformations: Iterable[Deformation]):
+    """Raise ValueError unless the deformations match the parameter columns"""
+    names = [deformation.name for deformation in deformations]
+    if names != header["names"]:
+        raise ValueError(
+            f"Dataset holds the parameters {', '.join(header['names'])}, the project"
+            f" deforms {', '.join(names)}!"
+        )
+
+
+# pylint: disable=too-many-instance-attributes
+class Dataset:
+    """Read-only, memory-mapped view of a dataset directory
+    Init:
+    path: the dataset directory
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.header = read_header(self.path)
+        self.names: list[str] = self.header["names"]
+        self.ranges = np.array(self.header["ranges"], dtype=np.float64).reshape(-1, 2)
+        self.elements = np.array(self.header["elements"])
+        self.energy = np.load(self.path / ENERGY_NAME, mmap_mode="r")
+        shapes = _row_shapes(self.header)
+        count = self.header["count"]
+        self.samples, self.params, self.geometries, self.spectra = (
+            self._column(name, (count,) + shapes[name]) for name in COLUMNS
+        )
+
+    def _column(self, name: str, shape: tuple) -> np.ndarray:
+        if shape[0] == 0:
+            return np.empty(shape, dtype=COLUMNS[name])
+        return np.memmap(
+            self.path / f"{name}.npy",
+            dtype=COLUMNS[name],
+            mode="r",
+            offset=NPY_HEADER_BYTES,
+            shape=shape,
+        )
+
+    def __len__(self):
+        return self.header["count"]
+
+    def param(self, name: str) -> np.ndarray:
+        """Values of one deformation parameter in every sample"""
+        if name not in self.names:
+            raise ValueError(f"Dataset has no parameter '{name}'!")
+        return self.params[:, self.names.index(name)]
+
+    def geometry_param_ranges(self) -> dict[str, list[float]]:
+        """Deformation ranges keyed by name, as in the geometryParamRanges"""
+        return dict(zip(self.names, self.ranges.tolist()))
+
+
+class DatasetWriter:
+    """Appender of samples to an existing dataset directory, see create
+    Init:
+    path: the dataset directory, missing column files are started empty
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.header = read_header(self.path)
+        self.shapes = _row_shapes(self.header)
+        self.files = {}
+        for name, dtype in COLUMNS.items():
+            column = self.path / f"{name}.npy"
+            row_bytes = (
+                int(np.prod(self.shapes[name], dtype=np.int64))
+                * np.dtype(dtype).itemsize
+            )
+            if not column.exists():
+                column.write_bytes(npy_header((0,) + self.shapes[name], dtype))
+            column_file = column.open("r+b")
+            # Rows past the count are left over from an interrupted append
+            column_file.truncate(NPY_HEADER_BYTES + self.header["count"] * row_bytes)
+            column_file.seek(0, os.SEEK_END)
+            self.files[name] = column_file
+
+    @classmethod
+    def create(
+        cls,
+        path: Path,
+        deformations: Iterable[Deformation],
+        elements: np.ndarray,
+        energy: np.ndarray,
+    ):
+        """Start an empty dataset directory and return its writer
+        Arguments:
+        path: directory to create, it must not hold a dataset yet
+        deformations: the deformations of the project, one parameter each
+        elements: element symbols of the atoms
+        energy: energy grid the spectra are interpolated onto
+        """
+        path = Path(path)
+        if (path / HEADER_NAME).exists():
+            raise ValueError(f"{path} already holds a dataset!")
+        deformations = list(deformations)
+        energy = np.asarray(energy, dtype=np.float64)
+        if energy.ndim != 1 or len(energy) < 2 or np.any(np.diff(energy) <= 0):
+            raise ValueError("Energy grid must be increasing with at least 2 points!")
+        path.mkdir(parents=True, exist_ok=True)
+        for name in COLUMNS:
+            (path / f"{name}.npy").unlink(missing_ok=True)
+        np.save(path / ENERGY_NAME, energy)
+        _write_header(
+            path,
+            {
+                "format": DATASET_FORMAT,
+                "version": DATASET_VERSION,
+                "count": 0,
+                "names": [deformation.name for deformation in deformations],
+                "ranges": [
+                    [deformation.range_left, deformation.range_right]
+                    for deformation in deformations
+                ],
+                "geometry_param_ranges": expand_geometry_param_ranges(deformations),
+                "elements": [str(element) for element in elements],
+                "atom_count": len(elements),
+                "energy_points": len(energy),
+            },
+        )
+        return cls(path)
+
+    @property
+    def count(self) -> int:
+        """Number of samples in the dataset"""
+        return self.header["count"]
+
+    def append(
+        self,
+        samples: np.ndarray,
+        params: np.ndarray,
+        geometries: np.ndarray,
+        spectra: np.ndarray,
+    ):
+        """Append rows to all columns at once
+        Raises ValueError if the rows do not have the shapes of the columns
+        """
+        rows = {
+            "samples": samples,
+            "params": params,
+            "geometries": geometries,
+            "spectra": spectra,
+        }
+        count = len(samples)
+        for name, values in rows.items():
+            values = np.asarray(values)
+            if values.shape != (count,) + self.shapes[name]:
+                raise ValueError(
+                    f"{name} has the shape {values.shape}, expected"
+                    f" {(count,) + self.shapes[name]}!"
+                )
+            rows[name] = values
+        if not count:
+            return
+        total = self.header["count"] + count
+        for name, values in rows.items():
+            column_file = self.files[name]
+            column_file.write(values.astype(COLUMNS[name], copy=False).tobytes())
+            column_file.flush()
+            column_file.seek(0)
+            column_file.write(npy_header((total,) + self.shapes[name], COLUMNS[name]))
+            column_file.seek(0, os.SEEK_END)
+            os.fsync(column_file.fileno())
+        self.header["count"] = total
+        _write_header(self.path, self.header)
+
+    def close(self):
+        """Close the column files"""
+        for column_file in self.files.values():
+            column_file.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def _read_block(deck_dir: Path, indices: list[int], energy: np.ndarray):
+    found, spectra = [], []
+    for index in indices:
+        output = deck_dir / deck_folder_name(index) / FDMNES_OUTPUT_NAME
+        try:
+            calculation = load_spectrum(output)
+        except (OSError, ValueError):
+            continue
+        found.append(index)
+        spectra.append(np.interp(energy, calculation.energy, calculation.intensity))
+    return found, np.array(spectra, dtype=np.float64).reshape(len(found), len(energy))
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def build_dataset(
+    model,
+    stack_path: Path,
+    deck_dir: Path,
+    path: Path,
+    energy: np.ndarray = None,
+    progress: Callable[[int], bool] = None,
+) -> tuple[int, int]:
+    """Gather the finished FDMNES folders of a sample stack into a dataset
+    Samples already in the dataset are skipped, so running it again during
+    a calculation only appends the newly finished ones.
+    Arguments:
+    model: project model the samples were drawn for
+    stack_path: .npy geometry stack written by the sampling module
+    deck_dir: directory of the FDMNES folders written by the fdmnes module
+    path: dataset directory, created when it does not hold a dataset yet
+    energy: shared energy grid of a new dataset, by default the energy points
+    of the first calculated spectrum
+    progress: called with the number of appended samples, returning False stops
+    Returns the number of appended samples and of unreadable spectra
+    """
+    deck_dir = Path(deck_dir)
+    geometries = np.load(stack_path, mmap_mode="r")
+    params = np.load(params_path(stack_path), mmap_mode="r")
+    pending = sorted(
+        index
+        for index in finished_samples(deck_dir)
+        if index < len(geometries)
+        and (deck_dir / deck_folder_name(index) / FDMNES_OUTPUT_NAME).exists()
+    )
+    if (Path(path) / HEADER_NAME).exists():
+        existing = Dataset(path)
+        check_deformations(existing.header, model.deformations)
+        energy = np.array(existing.energy)
+        done = set(existing.samples.tolist())
+        pending = [index for index in pending if index not in done]
+        writer = DatasetWriter(path)
+    else:
+        if not pending:
+            return 0, 0
+        if energy is None:
+            first = deck_dir / deck_folder_name(pending[0]) / FDMNES_OUTPUT_NAME
+            energy = load_spectrum(first).energy
+        writer = DatasetWriter.create(
+            path, model.deformations, project_molecule(model).elements, energy
+        )
+    if params.shape[1:] != writer.shapes["params"]:
+        writer.close()
+        raise ValueError(
+            f"{params_path(stack_path)} holds {params.shape[1]} parameters, the"
+            f" project has {writer.shapes['params'][0]} deformations!"
+        )
+    unreadable = 0
+    with writer:
+        start_count = writer.count
+        for offset in range(0, len(pending), DATASET_BLOCK):
+            block = pending[offset : offset + DATASET_BLOCK]
+            found, spectra = _read_block(deck_dir, block, energy)
+            unreadable += len(block) - len(found)
+            writer.append(
+                np.array(found, dtype=np.int64),
+                params[found],
+                geometries[found],
+                spectra,
+            )
+            if progress is not None and progress(writer.count - start_count) is False:
+                break
+        return writer.count - start_count, unreadable
+
+
+def describe_dataset(dataset: Dataset) -> str:
+    """Sample count, parameters, energy grid and size of a dataset"""
+    size = (
+        sum((dataset.path / f"{name}.npy").stat().st_size for name in COLUMNS)
+        + (dataset.path / ENERGY_NAME).stat().st_size
+    )
+    lines = [
+        f"{len(dataset)} samples of {dataset.header['atom_count']} atoms,"
+        f" {size / 2**20:.1f} MiB",
+        f"{len(dataset.energy)} energy points from {dataset.energy[0]:g}"
+        f" to {dataset.energy[-1]:g}",
+    ]
+    lines += [
+        f"  {name}: [{left:g}, {right:g}]"
+        for name, (left, right) in dataset.geometry_param_ranges().items()
+    ]
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-dataset command"""
+    # pylint: disable=import-outside-toplevel
+    from .project_io import load_project
+
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-dataset",
+        description="Gather sampled geometries and their spectra into a dataset",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser(
+        "build", help="append the finished FDMNES folders to a dataset"
+    )
+    build_parser.add_argument("project", type=Path, help="project saved by the app")
+    build_parser.add_argument(
+        "samples", type=Path, help=".npy stack of sampled geometries"
+    )
+    build_parser.add_argument("deck_dir", type=Path, help="FDMNES input folders")
+    build_parser.add_argument("dataset", type=Path, help="dataset directory")
+    build_parser.add_argument(
+        "--energy",
+        type=float,
+        nargs=3,
+        metavar=("START", "STOP", "POINTS"),
+        help="energy grid of a new dataset, by default that of the first spectrum",
+    )
+    info_parser = commands.add_parser("info", help="describe a dataset")
+    info_parser.add_argument("dataset", type=Path, help="dataset directory")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "info":
+            print(describe_dataset(Dataset(args.dataset)))
+            return 0
+        energy = (
+            np.linspace(args.energy[0], args.energy[1], int(args.energy[2]))
+            if args.energy
+            else None
+        )
+        model = load_project(args.project)
+        start = time.perf_counter()
+        appended, unreadable = build_dataset(
+            model, args.samples, args.deck_dir, args.dataset, energy
+        )
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(
+        f"Appended {appended} samples in {time.perf_counter() - start:.2f} s,"
+        f" {unreadable} spectra could not be read"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
 """Module holding data types used for saving and loading data into the app"""
 
+from array import array
+from collections.abc import Iterable
 from dataclasses import dataclass
 
+DEFORMATION_TYPES = ("rotation", "shift")
+
 
 @dataclass
 class Deformation:
@@ -14,3 +18,134 @@ class Deformation:
     name: str
     range_left: float
     range_right: float
+
+    # pylint: disable=too-many-arguments
+    @classmethod
+    def from_text(
+        cls,
+        part: str,
+        atom_1: str,
+        atom_2: str,
+        def_type: str,
+        name: str,
+        range_left: str,
+        range_right: str,
+    ):
+        """Build a deformation from raw field values, e.g. text typed into a dialog
+        Raises ValueError listing every field that could not be converted
+        """
+        errors = []
+        converted = {}
+        for field, value in (("part", part), ("atom_1", atom_1), ("atom_2", atom_2)):
+            try:
+                converted[field] = int(str(value).strip())
+            except ValueError:
+                errors.append(f"{field} must be an integer")
+        for field, value in (("range_left", range_left), ("range_right", range_right)):
+            try:
+                converted[field] = float(str(value).strip().replace(",", "."))
+            except ValueError:
+                errors.append(f"{field} must be a number")
+        if errors:
+            raise ValueError("; ".join(errors))
+        return cls(def_type=str(def_type), name=str(name).strip(), **converted)
+
+
+class DeformationStore:
+    """Compact columnar storage of deformations
+
+    Every field is kept in its own typed array, so thousands of deformations
+    take a fraction of the memory of a list of Deformation objects and single
+    columns can be read without building any objects. Indexing the store
+    returns a Deformation instance.
+    """
+
+    __slots__ = (
+        "parts",
+        "atoms_1",
+        "atoms_2",
+        "types",
+        "names",
+        "ranges_left",
+        "ranges_right",
+    )
+
+    def __init__(self, deformations: Iterable[Deformation] = ()):
+        self.parts = array("l")
+        self.atoms_1 = array("l")
+        self.atoms_2 = array("l")
+        self.types = array("b")
+        self.names: list[str] = []
+        self.ranges_left = array("d")
+        self.ranges_right = array("d")
+        self.extend(deformations)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx: int) -> Deformation:
+        if idx < 0:
+            idx += len(self.names)
+        return Deformation(
+            self.parts[idx],
+            self.atoms_1[idx],
+            self.atoms_2[idx],
+            DEFORMATION_TYPES[self.types[idx]],
+            self.names[idx],
+            self.ranges_left[idx],
+            self.ranges_right[idx],
+        )
+
+    def __iter__(self):
+        for idx in range(len(self.names)):
+            yield self[idx]
+
+    def __setitem__(self, idx: int, deformation: Deformation):
+        self.parts[idx] = deformation.part
+        self.atoms_1[idx] = deformation.atom_1
+        self.atoms_2[idx] = deformation.atom_2
+        self.types[idx] = DEFORMATION_TYPES.index(deformation.def_type)
+        self.names[idx] = deformation.name
+        self.ranges_left[idx] = deformation.range_left
+        self.ranges_right[idx] = deformation.range_right
+
+    def append(self, deformation: Deformation):
+        """Add a single deformation at the end of the store"""
+        self.extend((deformation,))
+
+    def extend(self, deformations: Iterable[Deformation]):
+        """Add many deformations at the end of the store at once"""
+        deformations = list(deformations)
+        self.parts.extend(item.part for item in deformations)
+        self.atoms_1.extend(item.atom_1 for item in deformations)
+        self.atoms_2.extend(item.atom_2 for item in deformations)
+        self.types.extend(
+            DEFORMATION_TYPES.index(item.def_type) for item in deformations
+        )
+        self.names.extend(item.name for item in deformations)
+        self.ranges_left.extend(item.range_left for item in deformations)
+        self.ranges_right.extend(item.range_right for item in deformations)
+
+    def pop(self, idx: int = -1) -> Deformation:
+        """Remove and return the deformation at a given position"""
+        deformation = self[idx]
+        self.remove_rows((idx % len(self.names),))
+        return deformation
+
+    def remove_rows(self, rows: Iterable[int]):
+        """Remove the deformations at the given positions in a single pass"""
+        rows = set(rows)
+        if not rows:
+            return
+        if len(rows) == 1:
+            (row,) = rows
+            for name in self.__slots__:
+                del getattr(self, name)[row]
+            return
+        for name in self.__slots__:
+            column = getattr(self, name)
+            kept = [value for idx, value in enumerate(column) if idx not in rows]
+            if isinstance(column, array):
+                setattr(self, name, array(column.typecode, kept))
+            else:
+                setattr(self, name, kept)
@@ -0,0 +1,150 @@
+"""Module building the tool panels of the main window after its first paint
+
+The main window is painted with empty layouts in place of the cost preview,
+the partition and geometry tools, the smoothing preview and the deformation
+table. Right after the first paint they are built into those layouts, and the
+time from the start of the application to the end of that paint is recorded
+as a startup span, with or without --profile. Using one of the panels or
+their widgets before then builds them on the spot.
+"""
+
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import (
+    QAbstractItemView,
+    QHBoxLayout,
+    QHeaderView,
+    QLayout,
+    QTableView,
+    QWidget,
+)
+
+from .cost_preview import CostPreview
+from .deformation_table import DeformationFilterProxyModel, DeformationTableModel
+from .geometry_tools import GeometryTools
+from .partition_tools import PartitionTools
+from .smoothing_preview import SMOOTHING_TOOLTIPS, SmoothingPreview
+from .tracing import TRACER
+
+FIRST_PAINT = "time to first paint"
+
+PANEL_ATTRIBUTES = (
+    "geometry_tools",
+    "cost_preview",
+    "partition_tools",
+    "smoothing_preview",
+    "deformation_table",
+    "deformation_proxy",
+    "deformation_list",
+)
+"""Attributes of the main window set when the panels are built"""
+
+COST_PREVIEW_INPUTS = (
+    "FDMNES_energy_range_input",
+    "FDMNES_radius_input",
+    "FDMNES_Shift_input",
+    "project_energy_interval_left",
+    "project_energy_interval_right",
+)
+"""Widgets of the main window whose changes update the cost preview"""
+
+
+class PanelWidgets(dict):
+    """Widgets of a main window by name, building the deferred panels when one
+    of their widgets is looked up before they are built
+    Init:
+    panels: the deferred panels of the main window
+    """
+
+    def __init__(self, panels):
+        super().__init__()
+        self.panels = panels
+
+    def __missing__(self, name: str):
+        if self.panels.built:
+            raise KeyError(name)
+        self.panels.build()
+        return self[name]
+
+
+class DeferredPanels(QObject):
+    """Placeholder layouts of a main window, filled after the window is painted
+    Init:
+    window: the main window the panels belong to
+    setting_widgets: names of the input widgets, by project setting
+    started_ns: time.perf_counter_ns() at the start of the application, from
+    which the time to the first paint is measured
+    """
+
+    def __init__(
+        self, window: QWidget, setting_widgets: dict[str, str], started_ns: int = None
+    ):
+        super().__init__(window)
+        self.window = window
+        self.setting_widgets = setting_widgets
+        self.started_ns = time.perf_counter_ns() if started_ns is None else started_ns
+        self.first_paint_ms = None
+        self.built = False
+        self.layouts: dict[str, QLayout] = {}
+        window.installEventFilter(self)
+
+    def layout(self, name: str, layout_class: type = QHBoxLayout) -> QLayout:
+        """Empty layout a panel is built into later"""
+        self.layouts[name] = layout_class()
+        return self.layouts[name]
+
+    # pylint: disable=invalid-name
+    def eventFilter(self, receiver: QObject, event: QEvent) -> bool:
+        """Finish the start-up once the first paint of the window is done"""
+        if receiver is self.window and event.type() == QEvent.Paint:
+            self.window.removeEventFilter(self)
+            QTimer.singleShot(0, self.first_paint_done)
+        return False
+
+    def first_paint_done(self):
+        """Record the time to the first paint, then build the panels"""
+        duration_ns = time.perf_counter_ns() - self.started_ns
+        self.first_paint_ms = duration_ns / 1e6
+        TRACER.record(FIRST_PAINT, "startup", self.started_ns, duration_ns)
+        self.build()
+
+    def build(self):
+        """Build the panels into their layouts, unless they are built already"""
+        if self.built:
+            return
+        self.built = True
+        window = self.window
+        window.geometry_tools = GeometryTools(window)
+        window.cost_preview = CostPreview(window)
+        window.partition_tools = PartitionTools(window)
+        window.smoothing_preview = SmoothingPreview(
+            window, {key: self.setting_widgets[key] for key in SMOOTHING_TOOLTIPS}
+        )
+        window.cost_preview.create_widgets(self.layouts["cost"])
+        window.partition_tools.create_buttons(self.layouts["partition"])
+        window.geometry_tools.create_buttons(self.layouts["geometry"])
+        window.smoothing_preview.create_widgets(self.layouts["smoothing"])
+        self._create_deformation_table(self.layouts["deformations"])
+        for widget_name in COST_PREVIEW_INPUTS:
+            window.widgets[widget_name].textChanged.connect(window.cost_preview.update)
+        window.widgets["FDMNES_green"].toggled.connect(window.cost_preview.update)
+
+    def _create_deformation_table(self, layout: QLayout):
+        window = self.window
+        window.deformation_table = DeformationTableModel(window.project, window)
+        window.deformation_proxy = DeformationFilterProxyModel(window)
+        window.deformation_proxy.setSourceModel(window.deformation_table)
+        window.deformation_proxy.setFilterFixedString(window.deformation_filter.text())
+        window.deformation_filter.textChanged.connect(
+            window.deformation_proxy.setFilterFixedString
+        )
+        window.deformation_list = QTableView()
+        window.deformation_list.setModel(window.deformation_proxy)
+        window.deformation_list.setSortingEnabled(True)
+        window.deformation_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        window.deformation_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        window.deformation_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        window.deformation_list.horizontalHeader().setStretchLastSection(True)
+        window.deformation_list.doubleClicked.connect(window.edit_deformation_dialog)
+        layout.addWidget(window.deformation_list)
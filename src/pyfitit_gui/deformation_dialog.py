@@ -1,5 +1,6 @@
 """Module holding the logic of adding deformations to the simulation input file"""
 
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import (
     QDoubleValidator,
     QIntValidator,
@@ -12,31 +13,34 @@ from PyQt5.QtWidgets import (
     QLabel,
     QLineEdit,
     QListWidget,
+    QListWidgetItem,
     QMessageBox,
     QVBoxLayout,
 )
 
 from .datatypes import Deformation
+from .deformation_table import DeformationTableModel
 
 
 class DeformationDialog(QDialog):
     """Main dialog window definition
     Init:
-    deformations: a list of deformations in the main app
-    deformation_listbox: QListBox object in the main app to display the deformation
+    deformation_table: table model of the main app holding the deformations
     deformation_to_edit_idx: index of a deformation on the deformations list to edit
+    bond_axes: (part, atom_1, atom_2) bonds between parts offered as axes
     """
 
     def __init__(
         self,
-        deformations: list[Deformation],
-        deformation_listbox: QListWidget,
+        deformation_table: DeformationTableModel,
         deformation_to_edit_idx: int = None,
+        bond_axes: list[tuple[int, int, int]] = (),
     ):
         super().__init__()
         self.setWindowTitle("Deformation manager")
 
         main = QVBoxLayout()
+        self.__create_bond_list(main, bond_axes)
         main.addWidget(QLabel("Input structure part index"))
         self.deformation_parts = QLineEdit()
         self.deformation_parts.setValidator(QIntValidator())
@@ -76,22 +80,22 @@ class DeformationDialog(QDialog):
         main.addLayout(deformation_range_box)
 
         if deformation_to_edit_idx is not None:
-            temp_deformation = deformations[deformation_to_edit_idx]
-            self.deformation_parts.setText(temp_deformation.part)
-            self.deformation_first_atom.setText(temp_deformation.atom_1)
-            self.deformation_second_atom.setText(temp_deformation.atom_2)
+            temp_deformation = deformation_table.project.deformations[
+                deformation_to_edit_idx
+            ]
+            self.deformation_parts.setText(str(temp_deformation.part))
+            self.deformation_first_atom.setText(str(temp_deformation.atom_1))
+            self.deformation_second_atom.setText(str(temp_deformation.atom_2))
             self.deformation_name.setText(temp_deformation.name)
             self.deformation_type.setCurrentText(temp_deformation.def_type)
-            self.deformation_range_left.setText(temp_deformation.range_left)
-            self.deformation_range_right.setText(temp_deformation.range_right)
+            self.deformation_range_left.setText(str(temp_deformation.range_left))
+            self.deformation_range_right.setText(str(temp_deformation.range_right))
 
         button = QDialogButtonBox.Save | QDialogButtonBox.Cancel
 
         button_box = QDialogButtonBox(button)
         button_box.accepted.connect(
-            lambda: self.validate(
-                deformations, deformation_listbox, deformation_to_edit_idx
-            )
+            lambda: self.validate(deformation_table, deformation_to_edit_idx)
         )
 
         button_box.rejected.connect(self.reject)
@@ -101,19 +105,42 @@ class DeformationDialog(QDialog):
 
         self.setLayout(main)
 
+    def __create_bond_list(
+        self, layout: QVBoxLayout, bond_axes: list[tuple[int, int, int]]
+    ):
+        if not bond_axes:
+            return
+        layout.addWidget(QLabel("Pick a bond between parts to fill in the axis"))
+        bond_list = QListWidget()
+        for part, atom_1, atom_2 in bond_axes:
+            item = QListWidgetItem(f"Move part {part} along atoms {atom_1} - {atom_2}")
+            item.setData(Qt.UserRole, (part, atom_1, atom_2))
+            bond_list.addItem(item)
+        bond_list.itemClicked.connect(self.fill_bond_axis)
+        layout.addWidget(bond_list)
+
+    def fill_bond_axis(self, item: QListWidgetItem):
+        """Callback filling the part and atom fields from a picked bond"""
+        for line_edit, value in zip(
+            (
+                self.deformation_parts,
+                self.deformation_first_atom,
+                self.deformation_second_atom,
+            ),
+            item.data(Qt.UserRole),
+        ):
+            line_edit.setText(str(value))
+
     def validate(
         self,
-        deformations: list[Deformation],
-        deformation_listbox: QListWidget,
+        deformation_table: DeformationTableModel,
         deformation_to_edit_idx: int = None,
     ):
         """Method that checks if input data conforms to pyfitit way of defining a deformation
         Arguments:
-        deformations: a list of deformations in the main app
-        deformation_listbox: QListBox object in the main app to display the deformation
+        deformation_table: table model of the main app holding the deformations
         deformation_to_edit_idx: index of a deformation on the deformations list to edit
         """
-        invalidate = False
         deformation_holder = [
             self.deformation_parts.text(),
             self.deformation_first_atom.text(),
@@ -124,97 +151,30 @@ class DeformationDialog(QDialog):
             self.deformation_range_right.text(),
         ]
 
-        for item in deformation_holder:
-            if not item:
-                invalidate = True
-                self.deformation_warning_message(
-                    "Warning: All fields must have a value!"
-                )
-                break
-
-        if not invalidate:
-            if (
-                not deformation_holder[1].isdigit()
-                or not deformation_holder[2].isdigit()
-            ):
-                invalidate = True
-                self.deformation_warning_message(
-                    "Warning: Axis atom indices must be intigers!"
-                )
-
-        if not invalidate:
-            for item in deformations:
-                if item.name == self.deformation_name.text():
-                    invalidate = True
-                    self.deformation_warning_message(
-                        "Warning: Deformation names must be unique!"
-                    )
-
-        if not invalidate:
-            deformation_left = deformation_holder[5].replace(",", ".")
-            deformation_right = deformation_holder[6].replace(",", ".")
-            if float(deformation_left) > float(deformation_right):
-                invalidate = True
-                self.deformation_warning_message(
-                    """Warning: Left-hand-side value of deformation range
-                    must be smaller than the right-hand-side value!"""
-                )
-
-        if not invalidate:
-            if deformation_to_edit_idx is not None:
-                self.edit_deformation(
-                    deformations, deformation_listbox, deformation_to_edit_idx
-                )
-            else:
-                self.append_deformation(deformations, deformation_listbox)
-            self.close()
-
-    def edit_deformation(
-        self,
-        deformations: list[Deformation],
-        deformation_listbox: QListWidget,
-        deformation_to_edit_idx: int,
-    ):
-        """Method that loads a defined deformation and allows the user to edit it in GUI
-        Arguments:
-        deformations: a list of deformations in the main app
-        deformation_listbox: QListBox object in the main app to display the deformation
-        deformation_to_edit_idx: index of a deformation on the deformations list to edit
-        """
-        deformations[deformation_to_edit_idx] = Deformation(
-            self.deformation_parts.text(),
-            self.deformation_first_atom.text(),
-            self.deformation_second_atom.text(),
-            self.deformation_type.currentText(),
-            self.deformation_name.text(),
-            self.deformation_range_left.text(),
-            self.deformation_range_right.text(),
-        )
+        if not all(deformation_holder):
+            self.deformation_warning_message("Warning: All fields must have a value!")
+            return
 
-        deformation_listbox.item(deformation_to_edit_idx).setText(
-            self.deformation_name.text()
-        )
+        try:
+            deformation = Deformation.from_text(*deformation_holder)
+        except ValueError as error:
+            self.deformation_warning_message(f"Warning: {error}!")
+            return
 
-    def append_deformation(
-        self, deformations: list[Deformation], deformation_listbox: QListWidget
-    ):
-        """Method to add a defined deformation to the list in the main app
-        Arguments:
-        deformations: a list of deformations in the main app
-        deformation_listbox: QListBox object in the main app to display the deformation
-        """
-        deformations.append(
-            Deformation(
-                self.deformation_parts.text(),
-                self.deformation_first_atom.text(),
-                self.deformation_second_atom.text(),
-                self.deformation_type.currentText(),
-                self.deformation_name.text(),
-                self.deformation_range_left.text(),
-                self.deformation_range_right.text(),
+        if deformation_to_edit_idx is not None:
+            errors = deformation_table.project.check_deformation(
+                deformation, deformation_to_edit_idx
             )
-        )
-        deformation_listbox.addItem(self.deformation_name.text())
+            if not errors:
+                deformation_table.replace_deformation(
+                    deformation_to_edit_idx, deformation
+                )
+        else:
+            errors = deformation_table.append_deformations((deformation,))
+        if errors:
+            self.deformation_warning_message("Warning: " + "\n".join(errors))
+            return
+        self.close()
 
     def deformation_warning_message(self, warning: str):
         """Method displaying a new window with a warning message
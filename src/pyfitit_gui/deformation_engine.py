@@ -0,0 +1,198 @@
+"""Module applying deformations to a molecule the way the generated project does
+
+The generated moleculeConstructor applies the deformations one after another.
+Every axis is taken from the current, already deformed, atom positions.
+Shifts move a part along the axis, and rotations turn it around the axis
+through the first atom.
+
+Edge geometries set every deformation to either end of its range, which
+gives 2^N corner combinations for N deformations. Geometries are built as
+(geometry, atom, xyz) arrays, with the deformation applied to all of them at
+once through batched rotation matrices. Corners sharing the first k
+parameter values also share the geometry after k deformations. That state is
+therefore computed once and then doubled for the next deformation, so each
+deformation step costs the number of distinct prefixes instead of 2^N.
+Rotation angles are in radians, as in pyFitIt.
+"""
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+from .datatypes import Deformation
+
+EDGE_CHUNK_BYTES = 64 * 2**20
+"""Approximate size of the coordinate blocks yielded by edge_geometries"""
+
+
+@dataclass(frozen=True)
+class _Step:
+    part: slice
+    atom_1: int
+    atom_2: int
+    rotation: bool
+    values: tuple[float, float]
+
+
+def part_slices(parts: list[np.ndarray]) -> list[slice]:
+    """Convert the atom indices of molecule parts into slices
+    Raises ValueError if a part is not a contiguous range of atoms
+    """
+    slices = []
+    for number, atoms in enumerate(parts):
+        if len(atoms) == 0 or np.any(np.diff(atoms) != 1):
+            raise ValueError(f"Molecule part {number} is not a contiguous range")
+        slices.append(slice(int(atoms[0]), int(atoms[-1]) + 1))
+    return slices
+
+
+def _steps(
+    deformations: Iterable[Deformation], parts: list[slice], atom_count: int
+) -> list[_Step]:
+    steps = []
+    for deformation in deformations:
+        if not 0 <= deformation.part < len(parts):
+            raise ValueError(
+                f"Deformation '{deformation.name}' uses part {deformation.part},"
+                f" the molecule has {len(parts)} parts"
+            )
+        if parts[deformation.part].stop > atom_count:
+            raise ValueError(
+                f"Part {deformation.part} reaches beyond the {atom_count} atoms"
+                " of the molecule"
+            )
+        if max(deformation.atom_1, deformation.atom_2) >= atom_count:
+            raise ValueError(
+                f"Deformation '{deformation.name}' uses an atom beyond the"
+                f" {atom_count} atoms of the molecule"
+            )
+        steps.append(
+            _Step(
+                parts[deformation.part],
+                deformation.atom_1,
+                deformation.atom_2,
+                deformation.def_type == "rotation",
+                (deformation.range_left, deformation.range_right),
+            )
+        )
+    return steps
+
+
+def rotation_matrices(axes: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    """Build a (n, 3, 3) stack of rotation matrices with the Rodrigues formula
+    Arguments:
+    axes: (n, 3) unit rotation axes
+    angles: (n,) rotation angles in radians
+    """
+    cos = np.cos(angles)[:, None, None]
+    sin = np.sin(angles)[:, None, None]
+    x, y, z = axes[:, 0], axes[:, 1], axes[:, 2]
+    zero = np.zeros_like(x)
+    cross = np.stack(
+        (
+            np.stack((zero, -z, y), axis=1),
+            np.stack((z, zero, -x), axis=1),
+            np.stack((-y, x, zero), axis=1),
+        ),
+        axis=1,
+    )
+    outer = axes[:, :, None] * axes[:, None, :]
+    return cos * np.eye(3) + sin * cross + (1 - cos) * outer
+
+
+def apply_step(coordinates: np.ndarray, step: _Step, values: np.ndarray):
+    """Apply one deformation in place to a (geometry, atom, xyz) block
+    Arguments:
+    coordinates: geometries to deform, modified in place
+    step: the deformation
+    values: (geometry,) shift lengths or rotation angles
+    """
+    axes = coordinates[:, step.atom_1] - coordinates[:, step.atom_2]
+    lengths = np.linalg.norm(axes, axis=1, keepdims=True)
+    if np.any(lengths == 0):
+        raise ValueError(
+            f"Atoms {step.atom_1} and {step.atom_2} coincide, the axis is undefined"
+        )
+    axes /= lengths
+    part = coordinates[:, step.part]
+    if step.rotation:
+        center = coordinates[:, step.atom_1][:, None, :].copy()
+        matrices = rotation_matrices(axes, values)
+        part -= center
+        part[...] = np.matmul(part, matrices.transpose(0, 2, 1))
+        part += center
+    else:
+        part += (axes * values[:, None])[:, None, :]
+
+
+def deform(
+    coordinates: np.ndarray,
+    parts: list[slice],
+    deformations: Iterable[Deformation],
+    params: np.ndarray,
+) -> np.ndarray:
+    """Build the geometries for arbitrary parameter sets
+    Arguments:
+    coordinates: (atom, xyz) coordinates of the undeformed molecule
+    parts: atom slices of the molecule parts
+    deformations: the deformations in the order they are applied
+    params: (geometry, deformation) parameter values
+    Returns a (geometry, atom, xyz) array
+    """
+    steps = _steps(deformations, parts, len(coordinates))
+    params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+    geometries = np.repeat(coordinates[None, :, :], len(params), axis=0)
+    for column, step in enumerate(steps):
+        apply_step(geometries, step, params[:, column])
+    return geometries
+
+
+def corner_count(deformations: Iterable[Deformation]) -> int:
+    """Number of edge geometries of a list of deformations"""
+    return 2 ** len(list(deformations))
+
+
+def edge_geometries(
+    coordinates: np.ndarray,
+    parts: list[slice],
+    deformations: Iterable[Deformation],
+    chunk_bytes: int = EDGE_CHUNK_BYTES,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Build every corner geometry of the deformation ranges block by block
+    Arguments:
+    coordinates: (atom, xyz) coordinates of the undeformed molecule
+    parts: atom slices of the molecule parts
+    deformations: the deformations in the order they are applied
+    chunk_bytes: approximate size of the yielded coordinate blocks
+    Yields (params, geometries) pairs of (geometry, deformation) parameter
+    values and (geometry, atom, xyz) coordinates, covering all 2^N corners
+    """
+    steps = _steps(deformations, parts, len(coordinates))
+    chunk_size = max(1, chunk_bytes // max(1, coordinates.nbytes))
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    yield from _expand(
+        coordinates[None, :, :].copy(), np.empty((1, 0)), steps, chunk_size
+    )
+
+
+def _expand(geometries, params, steps, chunk_size):
+    if not steps:
+        yield params, geometries
+        return
+    step, remaining = steps[0], steps[1:]
+    count = len(geometries)
+    if 2 * count <= chunk_size:
+        geometries = np.concatenate((geometries, geometries))
+        values = np.repeat(step.values, count)
+        apply_step(geometries, step, values)
+        params = np.column_stack((np.concatenate((params, params)), values))
+        yield from _expand(geometries, params, remaining, chunk_size)
+        return
+    for number, value in enumerate(step.values):
+        branch = geometries if number == len(step.values) - 1 else geometries.copy()
+        values = np.full(count, value)
+        apply_step(branch, step, values)
+        yield from _expand(
+            branch, np.column_stack((params, values)), remaining, chunk_size
+        )
@@ -0,0 +1,249 @@
+"""Module with the Qt table model presenting the deformations of a project"""
+
+from collections.abc import Iterable
+
+from PyQt5.QtCore import QAbstractProxyModel, QAbstractTableModel, QModelIndex, Qt
+
+from .datatypes import DEFORMATION_TYPES, Deformation
+from .project_model import ProjectModel
+
+DEFORMATION_COLUMNS = (
+    ("Name", "names"),
+    ("Type", "types"),
+    ("Part", "parts"),
+    ("Atom 1", "atoms_1"),
+    ("Atom 2", "atoms_2"),
+    ("Range left", "ranges_left"),
+    ("Range right", "ranges_right"),
+)
+"""Header labels of the table and the DeformationStore columns they show"""
+
+
+class DeformationTableModel(QAbstractTableModel):
+    """Table model reading deformations straight from the columnar store of a project
+    Init:
+    project: the project model whose deformations are presented
+    """
+
+    def __init__(self, project: ProjectModel, parent=None):
+        super().__init__(parent)
+        self.project = project
+
+    # pylint: disable=invalid-name
+    def rowCount(self, parent=QModelIndex()):
+        """Number of deformations in the project"""
+        return 0 if parent.isValid() else len(self.project.deformations)
+
+    # pylint: disable=invalid-name
+    def columnCount(self, parent=QModelIndex()):
+        """Number of deformation fields shown in the table"""
+        return 0 if parent.isValid() else len(DEFORMATION_COLUMNS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        """Return the value of a single deformation field"""
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        column = getattr(
+            self.project.deformations, DEFORMATION_COLUMNS[index.column()][1]
+        )
+        value = column[index.row()]
+        if column is self.project.deformations.types:
+            value = DEFORMATION_TYPES[value]
+        return str(value)
+
+    # pylint: disable=invalid-name
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        """Return column labels and row numbers"""
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return DEFORMATION_COLUMNS[section][0]
+        return str(section)
+
+    def append_deformations(self, deformations: Iterable[Deformation]) -> list[str]:
+        """Check and append deformations, notifying views with a single insertion
+        Returns the list of problems if the deformations were rejected
+        """
+        deformations = list(deformations)
+        errors = self.project.check_new_deformations(deformations)
+        if errors or not deformations:
+            return errors
+        first_row = len(self.project.deformations)
+        self.beginInsertRows(
+            QModelIndex(), first_row, first_row + len(deformations) - 1
+        )
+        self.project.add_deformations(deformations)
+        self.endInsertRows()
+        return []
+
+    def replace_deformation(self, row: int, deformation: Deformation):
+        """Replace an already checked deformation and refresh its row"""
+        self.project.replace_deformation(row, deformation)
+        self.dataChanged.emit(
+            self.index(row, 0), self.index(row, len(DEFORMATION_COLUMNS) - 1)
+        )
+
+    def remove_deformations(self, rows: Iterable[int]):
+        """Remove the deformations at the given rows in a single pass"""
+        rows = sorted(set(rows))
+        if len(rows) == 1:
+            self.beginRemoveRows(QModelIndex(), rows[0], rows[0])
+            self.project.remove_deformations(rows)
+            self.endRemoveRows()
+        elif rows:
+            self.beginResetModel()
+            self.project.remove_deformations(rows)
+            self.endResetModel()
+
+    def reset_project(self, project: ProjectModel):
+        """Present a different project model, e.g. one loaded from disk"""
+        self.beginResetModel()
+        self.project = project
+        self.endResetModel()
+
+
+class DeformationFilterProxyModel(QAbstractProxyModel):
+    """Proxy model sorting deformations by any column and filtering them by name
+
+    Instead of comparing rows through data() calls, the proxy keeps a list of
+    source rows in display order and rebuilds it straight from the typed
+    columns of the store, which keeps sorting thousands of rows interactive.
+    Sorting only changes the displayed order, never the order of the
+    deformations in the project. Inserting or removing source rows resets the
+    proxy, starting when the source announces the change, and so does an edit
+    that moves a row into or out of the filter; other edits only reorder it.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[int] = []
+        self._positions: list[int] = []
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._filter_text = ""
+
+    # pylint: disable=invalid-name
+    def setSourceModel(self, source_model: DeformationTableModel):
+        """Attach the proxy to a deformation table model"""
+        self.beginResetModel()
+        super().setSourceModel(source_model)
+        for about_to_change, changed in (
+            (source_model.modelAboutToBeReset, source_model.modelReset),
+            (source_model.rowsAboutToBeInserted, source_model.rowsInserted),
+            (source_model.rowsAboutToBeRemoved, source_model.rowsRemoved),
+        ):
+            about_to_change.connect(self.beginResetModel)
+            changed.connect(self._end_reset)
+        source_model.dataChanged.connect(self._source_data_changed)
+        self._rebuild()
+        self.endResetModel()
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """Change the displayed order of the deformations"""
+        self._sort_column = column
+        self._sort_order = order
+        self._relayout()
+
+    # pylint: disable=invalid-name
+    def setFilterFixedString(self, text: str):
+        """Show only the deformations whose name contains the given text"""
+        self._filter_text = text.lower()
+        self._reset()
+
+    def index(self, row: int, column: int, parent=QModelIndex()):
+        """Create a proxy index, the table has no hierarchy"""
+        if parent.isValid() or not 0 <= row < len(self._rows):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, _index=QModelIndex()):
+        """Proxy indices never have a parent"""
+        return QModelIndex()
+
+    # pylint: disable=invalid-name
+    def rowCount(self, parent=QModelIndex()):
+        """Number of deformations passing the filter"""
+        return 0 if parent.isValid() else len(self._rows)
+
+    # pylint: disable=invalid-name
+    def columnCount(self, parent=QModelIndex()):
+        """Number of columns of the source table"""
+        return 0 if parent.isValid() else len(DEFORMATION_COLUMNS)
+
+    # pylint: disable=invalid-name
+    def mapToSource(self, proxy_index: QModelIndex):
+        """Translate a displayed index into a project model index"""
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(
+            self._rows[proxy_index.row()], proxy_index.column()
+        )
+
+    # pylint: disable=invalid-name
+    def mapFromSource(self, source_index: QModelIndex):
+        """Translate a project model index into a displayed index"""
+        if not source_index.isValid():
+            return QModelIndex()
+        position = self._positions[source_index.row()]
+        if position < 0:
+            return QModelIndex()
+        return self.createIndex(position, source_index.column())
+
+    # pylint: disable=invalid-name
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        """Column labels of the source and project row numbers of the displayed rows"""
+        if orientation == Qt.Vertical and role == Qt.DisplayRole:
+            return str(self._rows[section]) if section < len(self._rows) else None
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def _rebuild(self, rows: list[int] = None):
+        deformations = self.sourceModel().project.deformations
+        self._rows = self._displayed_rows() if rows is None else rows
+        self._positions = [-1] * len(deformations)
+        for position, row in enumerate(self._rows):
+            self._positions[row] = position
+
+    def _displayed_rows(self) -> list[int]:
+        deformations = self.sourceModel().project.deformations
+        if self._filter_text:
+            rows = [
+                row
+                for row, name in enumerate(deformations.names)
+                if self._filter_text in name.lower()
+            ]
+        else:
+            rows = list(range(len(deformations)))
+        if self._sort_column >= 0:
+            column = getattr(deformations, DEFORMATION_COLUMNS[self._sort_column][1])
+            if column is deformations.types:
+                rows.sort(key=lambda row: DEFORMATION_TYPES[column[row]])
+            else:
+                rows.sort(key=column.__getitem__)
+            if self._sort_order == Qt.DescendingOrder:
+                rows.reverse()
+        return rows
+
+    def _reset(self):
+        self.beginResetModel()
+        self._end_reset()
+
+    def _end_reset(self):
+        self._rebuild()
+        self.endResetModel()
+
+    def _source_data_changed(self):
+        rows = self._displayed_rows()
+        if len(rows) == len(self._rows) and set(rows) == set(self._rows):
+            self._relayout(rows)
+        else:
+            self._reset()
+
+    def _relayout(self, rows: list[int] = None):
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        source_indices = [self.mapToSource(index) for index in persistent]
+        self._rebuild(rows)
+        self.changePersistentIndexList(
+            persistent, [self.mapFromSource(index) for index in source_indices]
+        )
+        self.layoutChanged.emit()
@@ -0,0 +1,219 @@
+"""Module parsing FDMNES energy ranges and estimating the cost of calculations
+
+An FDMNES range `e0 step0 e1 step1 e2 ...` is turned into the energy grid
+FDMNES calculates. The run time of a calculation is modelled as
+
+    time = c * points * atoms**p
+
+with the grid size, the number of atoms within the cluster radius around the
+absorber, and separate constants for the Green (multiple scattering) and the
+finite difference modes. The constants start from rough defaults and are
+fitted by least squares, in log space, to the times recorded by the job
+queues of past runs. Jobs restored from the result cache are not counted.
+"""
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from .scheduler import QUEUE_FILE_NAME, JobQueue
+
+DEFAULT_COST_MODEL_PATH = Path.home() / ".cache" / "pyfitit_gui" / "cost_model.json"
+
+COST_MODES = ("fdm", "green")
+DEFAULT_COST_TERMS = {"fdm": (-9.2, 3.0), "green": (-8.5, 2.0)}
+"""Default natural log of c and power p of the cost model of every mode"""
+
+_KEYWORD = re.compile(r"^\s*([A-Za-z_]\w*)\s*$")
+
+
+def parse_energy_range(text: str) -> np.ndarray:
+    """Return the energy grid of an FDMNES range 'e0 step0 e1 step1 ... en'
+    Raises ValueError describing the first problem of the range
+    """
+    try:
+        values = np.array(text.replace(",", " ").split(), dtype=float)
+    except ValueError:
+        raise ValueError(f"Energy range '{text}' must only hold numbers!") from None
+    if len(values) == 1:
+        return values
+    if len(values) < 3 or len(values) % 2 == 0:
+        raise ValueError(
+            "Energy range must be 'e0 step0 e1 step1 ... en', an odd number"
+            " of at least 3 values!"
+        )
+    bounds, steps = values[::2], values[1::2]
+    if np.any(steps <= 0):
+        raise ValueError("Energy range steps must be positive!")
+    if np.any(np.diff(bounds) <= 0):
+        raise ValueError("Energy range bounds must increase!")
+    counts = np.floor(np.diff(bounds) / steps + 1e-9).astype(np.int64)
+    counts = np.maximum(counts, 1)
+    starts = np.repeat(bounds[:-1], counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    grid = starts + offsets * np.repeat(steps, counts)
+    return np.append(grid, bounds[-1])
+
+
+def grid_coverage_problems(
+    grid: np.ndarray, left: float, right: float, shift: float = None
+) -> list[str]:
+    """Check that a calculated grid covers the experimental energy interval
+    Arguments:
+    grid: calculated energies, relative to the edge
+    left, right: experimental energy interval
+    shift: energy added to calculated energies to match the experiment, if known
+    """
+    problems = []
+    width = abs(right - left)
+    if grid[-1] - grid[0] < width:
+        problems.append(
+            f"the grid spans {grid[-1] - grid[0]:g} eV but the interval {width:g} eV"
+        )
+    if shift is not None and (
+        grid[0] + shift > min(left, right) or grid[-1] + shift < max(left, right)
+    ):
+        problems.append(
+            f"shifted by {shift:g} eV the grid covers {grid[0] + shift:g} -"
+            f" {grid[-1] + shift:g} eV, not the interval"
+        )
+    return problems
+
+
+def cluster_atom_count(
+    coordinates: np.ndarray, radius: float, absorber: int = 0
+) -> int:
+    """Number of atoms within the cluster radius around the absorbing atom"""
+    distances = np.sqrt(((coordinates - coordinates[absorber]) ** 2).sum(1))
+    return int(np.count_nonzero(distances <= radius))
+
+
+@dataclass
+class CostModel:
+    """Fitted run time model, terms maps a mode to the log of c and the power p"""
+
+    terms: dict
+    runs: int = 0
+
+    @classmethod
+    def default(cls):
+        """Uncalibrated model"""
+        return cls({mode: list(term) for mode, term in DEFAULT_COST_TERMS.items()})
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_COST_MODEL_PATH):
+        """Load a calibrated model, the default one if there is none"""
+        try:
+            with open(path, encoding="utf-8") as model_file:
+                return cls(**json.load(model_file))
+        except (OSError, ValueError, TypeError):
+            return cls.default()
+
+    def save(self, path: Path = DEFAULT_COST_MODEL_PATH):
+        """Save the model as JSON"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as model_file:
+            json.dump(asdict(self), model_file)
+
+    def seconds(self, points: int, atoms: int, green: bool) -> float:
+        """Estimated run time of one calculation in seconds"""
+        log_c, power = self.terms["green" if green else "fdm"]
+        return float(np.exp(log_c) * points * max(atoms, 1) ** power)
+
+
+@dataclass(frozen=True)
+class DeckRun:
+    """Size of a finished calculation and its run time"""
+
+    points: int
+    atoms: int
+    green: bool
+    elapsed: float
+
+
+def read_deck(path: Path) -> tuple[np.ndarray, float, bool, int, np.ndarray]:
+    """Read the range, radius, Green flag, absorber and coordinates of an input
+    Only the keywords written by the fdmnes module are understood
+    Raises ValueError if one is missing
+    """
+    sections, keyword = {}, None
+    with open(path, encoding="ascii", errors="replace") as deck:
+        for line in deck:
+            if line.lstrip().startswith("!"):
+                continue
+            match = _KEYWORD.match(line)
+            if match:
+                keyword = match.group(1).lower()
+                sections[keyword] = []
+            elif keyword is not None and line.strip():
+                sections[keyword].append(line)
+    try:
+        grid = parse_energy_range(" ".join(sections["range"]))
+        radius = float(sections["radius"][0])
+        absorber = int(sections["absorber"][0].split()[0]) - 1
+        atoms = np.array(
+            [line.split()[1:4] for line in sections["molecule"][1:]], dtype=float
+        )
+    except (KeyError, IndexError, ValueError) as error:
+        raise ValueError(f"Could not read FDMNES input {path}: {error}!") from None
+    return grid, radius, "green" in sections, absorber, atoms
+
+
+def recorded_runs(deck_dir: Path, input_name: str = "in.txt") -> list[DeckRun]:
+    """Sizes and run times of the calculations finished in a deck directory"""
+    queue_path = Path(deck_dir) / QUEUE_FILE_NAME
+    if not queue_path.exists():
+        return []
+    queue = JobQueue(queue_path)
+    try:
+        timings = queue.timings()
+    finally:
+        queue.close()
+    runs = []
+    for folder, elapsed in timings:
+        try:
+            grid, radius, green, absorber, atoms = read_deck(
+                os.path.join(folder, input_name)
+            )
+        except (OSError, ValueError):
+            continue
+        runs.append(
+            DeckRun(
+                len(grid), cluster_atom_count(atoms, radius, absorber), green, elapsed
+            )
+        )
+    return runs
+
+
+def calibrate(runs: list[DeckRun], model: CostModel = None) -> CostModel:
+    """Fit the cost model of every mode with recorded runs
+    The power is only fitted when the runs span a range of cluster sizes,
+    otherwise the power of the given model is kept and only c is fitted
+    """
+    model = model or CostModel.default()
+    terms = {mode: list(term) for mode, term in model.terms.items()}
+    for mode in COST_MODES:
+        selected = [run for run in runs if run.green == (mode == "green")]
+        if not selected:
+            continue
+        log_atoms = np.log([max(run.atoms, 1) for run in selected])
+        # Time is linear in the number of points, only c and p are fitted
+        target = np.log([max(run.elapsed, 1e-3) / run.points for run in selected])
+        if len(selected) >= 3 and np.ptp(log_atoms) > 0.1:
+            matrix = np.stack((np.ones_like(log_atoms), log_atoms), axis=1)
+            terms[mode] = np.linalg.lstsq(matrix, target, rcond=None)[0].tolist()
+        else:
+            terms[mode][0] = float(np.mean(target - terms[mode][1] * log_atoms))
+    return CostModel(terms, len(runs))
+
+
+def describe_duration(seconds: float) -> str:
+    """Format a duration with a unit suiting its size"""
+    for unit, size in (("days", 86400), ("h", 3600), ("min", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.1f} {unit}"
+    return f"{seconds:.1f} s"
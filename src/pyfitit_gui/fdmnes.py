@@ -0,0 +1,279 @@
+"""Module writing FDMNES input folders for sampled geometries
+
+Every sample of a geometry stack written by the sampling module gets its own
+folder holding `fdmfile.txt` and `in.txt`, ready to be run by FDMNES. The
+part of the input shared by all samples (energy range, cluster radius, Green
+mode and absorber) is rendered once, so writing a deck only formats the atom
+lines. Worker processes read the stack through a memory map and write whole
+batches of folders each.
+
+A folder is first written under a temporary name and renamed when complete.
+Running the writer again therefore skips all finished folders and only
+redoes the ones that were interrupted.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .processes import process_pool
+from .result_cache import (
+    CACHE_KEY_FILE,
+    CACHED_MARKER,
+    DEFAULT_CACHE_DIR,
+    ResultCache,
+    cache_key,
+    calculation_settings,
+)
+from .sampling import params_path, project_molecule
+
+FDMNES_INPUT_NAME = "in.txt"
+FDMNES_OUTPUT_NAME = "out.txt"
+"""Spectrum FDMNES writes for the Filout name of deck_header"""
+DECK_BATCH = 256
+"""Number of sample folders written by a worker per task"""
+
+_TEMPORARY_SUFFIX = ".tmp"
+
+_ELEMENTS = (
+    "H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu"
+    " Zn Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs"
+    " Ba La Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl"
+    " Pb Bi Po At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm"
+).split()
+ATOMIC_NUMBERS = {symbol: number for number, symbol in enumerate(_ELEMENTS, 1)}
+
+
+def atomic_numbers(elements: np.ndarray) -> list[int]:
+    """Translate element symbols, or atomic numbers given as text, to numbers
+    Raises ValueError naming the first unknown element
+    """
+    numbers = []
+    for element in elements:
+        element = str(element).strip()
+        if element.isdigit():
+            numbers.append(int(element))
+        elif element.capitalize() in ATOMIC_NUMBERS:
+            numbers.append(ATOMIC_NUMBERS[element.capitalize()])
+        else:
+            raise ValueError(f"Unknown element '{element}'!")
+    return numbers
+
+
+def deck_header(settings: dict, absorber: int = 1) -> str:
+    """Render the part of the FDMNES input shared by every sample
+    Arguments:
+    settings: project settings holding energy_range, Radius and Green
+    absorber: 1-based index of the absorbing atom
+    """
+    lines = [
+        "Filout",
+        " out",
+        "",
+        "Range",
+        f" {settings['energy_range']}",
+        "",
+        "Radius",
+        f" {settings['Radius']}",
+        "",
+    ]
+    if settings["Green"] in (True, "True"):
+        lines += ["Green", ""]
+    lines += ["Absorber", f" {absorber}", "", "Molecule", " 1 1 1 90 90 90", ""]
+    return "\n".join(lines)
+
+
+def deck_folder_name(index: int) -> str:
+    """Name of the folder holding the input of a sample"""
+    return f"{index:07d}"
+
+
+_worker_state = {}
+
+
+# pylint: disable=too-many-arguments
+def _init_worker(
+    stack_path, params_file, output_dir, header, numbers, calculation, cache_dir
+):
+    _worker_state.update(
+        geometries=np.load(stack_path, mmap_mode="r"),
+        params=np.load(params_file, mmap_mode="r") if params_file else None,
+        output_dir=Path(output_dir),
+        header=header,
+        numbers=numbers,
+        atom_template="".join(
+            f" {number} {{:.6f}} {{:.6f}} {{:.6f}}\n" for number in numbers
+        ),
+        calculation=calculation,
+        cache=ResultCache(cache_dir) if cache_dir is not None else None,
+    )
+
+
+def _write_batch(indices: list[int]) -> tuple[int, int]:
+    state = _worker_state
+    geometries = np.asarray(state["geometries"][indices])
+    cached = 0
+    for index, geometry in zip(indices, geometries):
+        final = state["output_dir"] / deck_folder_name(index)
+        temporary = final.with_name(final.name + _TEMPORARY_SUFFIX)
+        if temporary.exists():
+            shutil.rmtree(temporary)
+        temporary.mkdir()
+        comment = f"! sample {index}"
+        if state["params"] is not None:
+            comment += " params " + " ".join(f"{v:.8g}" for v in state["params"][index])
+        text = (
+            comment
+            + "\n\n"
+            + state["header"]
+            + state["atom_template"].format(*geometry.ravel())
+            + "\nEnd\n"
+        )
+        (temporary / FDMNES_INPUT_NAME).write_text(text, encoding="ascii")
+        (temporary / "fdmfile.txt").write_text(
+            f"1\n{FDMNES_INPUT_NAME}\n", encoding="ascii"
+        )
+        key = cache_key(state["numbers"], geometry, state["calculation"])
+        (temporary / CACHE_KEY_FILE).write_text(key, encoding="ascii")
+        if state["cache"] is not None and state["cache"].restore(
+            key, temporary, count_miss=False
+        ):
+            (temporary / CACHED_MARKER).touch()
+            cached += 1
+        os.replace(temporary, final)
+    return len(indices), cached
+
+
+def finished_samples(output_dir: Path) -> set[int]:
+    """Return the indices of the samples whose folders are complete"""
+    if not os.path.isdir(output_dir):
+        return set()
+    with os.scandir(output_dir) as entries:
+        return {
+            int(entry.name)
+            for entry in entries
+            if entry.is_dir() and entry.name.isdigit()
+        }
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def write_decks(
+    stack_path: Path,
+    elements: np.ndarray,
+    settings: dict,
+    output_dir: Path,
+    absorber: int = 1,
+    workers: int = None,
+    progress=None,
+    cache_dir: Path = None,
+) -> tuple[int, int, int]:
+    """Write one FDMNES input folder per sample of a geometry stack
+    Arguments:
+    stack_path: .npy stack of (sample, atom, 3) coordinates
+    elements: element symbols of the atoms
+    settings: project settings holding energy_range, Radius and Green
+    output_dir: directory receiving the sample folders
+    absorber: 1-based index of the absorbing atom
+    workers: number of worker processes, all cores by default
+    progress: called with the number of finished samples, returning False stops
+    cache_dir: result cache to restore already calculated samples from
+    Returns the number of folders written, the number already present and
+    the number of written folders whose results came from the cache
+    """
+    stack_path = Path(stack_path)
+    output_dir = Path(output_dir)
+    geometries = np.load(stack_path, mmap_mode="r")
+    if geometries.ndim != 3 or geometries.shape[1:] != (len(elements), 3):
+        raise ValueError(
+            f"{stack_path} does not hold geometries of {len(elements)} atoms!"
+        )
+    if not 1 <= absorber <= len(elements):
+        raise ValueError(f"Absorber {absorber} is not an atom of the molecule!")
+    numbers = atomic_numbers(elements)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    done = finished_samples(output_dir)
+    todo = [index for index in range(len(geometries)) if index not in done]
+    batches = [
+        todo[start : start + DECK_BATCH] for start in range(0, len(todo), DECK_BATCH)
+    ]
+    params_file = params_path(stack_path)
+    initargs = (
+        stack_path,
+        params_file if params_file.exists() else None,
+        output_dir,
+        deck_header(settings, absorber),
+        numbers,
+        calculation_settings(settings, absorber),
+        cache_dir,
+    )
+    written = cached = 0
+    with process_pool(
+        workers or os.cpu_count() or 1, _init_worker, initargs
+    ) as executor:
+        for count, batch_cached in executor.map(_write_batch, batches):
+            written += count
+            cached += batch_cached
+            if progress is not None and progress(len(done) + written) is False:
+                executor.shutdown(cancel_futures=True)
+                break
+    return written, len(done), cached
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-fdmnes command"""
+    # pylint: disable=import-outside-toplevel
+    from .project_io import load_project
+
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-fdmnes",
+        description="Write FDMNES input folders for a stack of sampled geometries",
+    )
+    parser.add_argument("project", type=Path, help="project saved by the app")
+    parser.add_argument("samples", type=Path, help=".npy stack of sampled geometries")
+    parser.add_argument("output_dir", type=Path, help="directory for the folders")
+    parser.add_argument(
+        "-a", "--absorber", type=int, default=1, help="1-based absorbing atom index"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of writer processes"
+    )
+    parser.add_argument(
+        "--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="result cache"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="do not restore cached results"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        model = load_project(args.project)
+        molecule = project_molecule(model)
+        start = time.perf_counter()
+        written, skipped, cached = write_decks(
+            args.samples,
+            molecule.elements,
+            model.settings,
+            args.output_dir,
+            args.absorber,
+            args.workers,
+            cache_dir=None if args.no_cache else args.cache_dir,
+        )
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"Wrote {written} input folders in {elapsed:.2f} s"
+        f" ({written / elapsed:.0f} folders/s), {skipped} were already complete,"
+        f" {cached} results restored from the cache"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""Module with the deformation tools of the main window working on whole geometries
+
+The tools build deformed copies of the loaded molecule to preview the edge
+points, look for clashing atoms, write sampled training geometries and
+prepare FDMNES inputs for them. The clash check runs in a QThread behind a
+progress dialog, so the window keeps painting and the check can be cancelled.
+"""
+
+import os
+import threading
+import time
+
+from PyQt5.QtCore import QEventLoop, QObject, Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QApplication,
+    QFileDialog,
+    QHBoxLayout,
+    QInputDialog,
+    QMessageBox,
+    QProgressDialog,
+    QPushButton,
+    QWidget,
+)
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+clash = lazy_import(".clash", __package__)
+deformation_engine = lazy_import(".deformation_engine", __package__)
+fdmnes = lazy_import(".fdmnes", __package__)
+molecule = lazy_import(".molecule", __package__)
+result_cache = lazy_import(".result_cache", __package__)
+sampling = lazy_import(".sampling", __package__)
+
+SAVE_EDGE_LIMIT = 1024
+"""Number of edge points checked for clashes before saving a project"""
+
+CHECK_EDGE_LIMIT = 65536
+"""Number of edge points checked for clashes by the distance check button"""
+
+
+class ClashWorker(QObject):
+    """Runs a clash check in the thread the object is moved to
+    Init:
+    arguments: keyword arguments of clash.check_clashes
+    """
+
+    progressed = pyqtSignal(int)
+    checked = pyqtSignal(object)
+
+    def __init__(self, arguments: dict):
+        super().__init__()
+        self.arguments = arguments
+        self.stop_requested = threading.Event()
+
+    def run(self):
+        """Check for clashes and send the report, or the error stopping the check"""
+        try:
+            result = clash.check_clashes(**self.arguments, progress=self._progress)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # the event loop waiting for the report must always be quit
+            result = error
+        self.checked.emit(result)
+
+    def _progress(self, done: int) -> bool:
+        self.progressed.emit(done)
+        return not self.stop_requested.is_set()
+
+
+class GeometryTools:
+    """Callbacks of the geometry buttons, acting on the project of a main window
+    Init:
+    window: the main window whose project and molecule are used
+    """
+
+    def __init__(self, window: QWidget):
+        self.window = window
+
+    def create_buttons(self, layout: QHBoxLayout):
+        """Add the buttons starting the tools to a layout"""
+        preview_deformations = QPushButton()
+        preview_deformations.setText("Preview edges")
+        preview_deformations.setToolTip(
+            """<font>Apply all deformations to the molecule at every combination
+            of their range ends, as the generated project will.</font>"""
+        )
+        preview_deformations.clicked.connect(self.preview_edge_geometries)
+        check_distances = QPushButton()
+        check_distances.setText("Check distances")
+        check_distances.setToolTip(
+            f"""<font>Look for atoms closer than the minimum distance in the edge
+            geometries and in random geometries within the ranges. With more
+            than {CHECK_EDGE_LIMIT} edge geometries a random subset of them is
+            checked.</font>"""
+        )
+        check_distances.clicked.connect(self.check_clashes_dialog)
+        sample_geometries = QPushButton()
+        sample_geometries.setText("Sample")
+        sample_geometries.setToolTip(
+            """<font>Write deformed geometries sampled within the deformation
+            ranges, e.g. as training data for the inverse method.</font>"""
+        )
+        sample_geometries.clicked.connect(self.sample_geometries_dialog)
+        write_fdmnes = QPushButton()
+        write_fdmnes.setText("FDMNES inputs")
+        write_fdmnes.setToolTip(
+            """<font>Write an FDMNES input folder for every geometry of a sample
+            stack. Interrupted runs continue where they stopped.</font>"""
+        )
+        write_fdmnes.clicked.connect(self.write_fdmnes_dialog)
+
+        layout.addWidget(preview_deformations)
+        layout.addWidget(check_distances)
+        layout.addWidget(sample_geometries)
+        layout.addWidget(write_fdmnes)
+
+    def molecule_geometry(self) -> tuple:
+        """Return the coordinates and part slices of the loaded molecule
+        Raises ValueError if no molecule or partition is available
+        """
+        self.window.update_project_settings()
+        if self.window.molecule is None:
+            raise ValueError("Choose a readable molecule file first!")
+        if not self.window.project.settings["parts"]:
+            raise ValueError("Input the molecule partition first!")
+        parts = deformation_engine.part_slices(
+            molecule.parse_partition(self.window.project.settings["parts"])
+        )
+        return self.window.molecule.coordinates, parts
+
+    def preview_edge_geometries(self):
+        """Callback that builds every edge geometry and reports how far atoms move"""
+        try:
+            coordinates, parts = self.molecule_geometry()
+            if not self.window.project.deformations:
+                raise ValueError("No deformations defined!")
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            start = time.perf_counter()
+            largest_shift = 0.0
+            try:
+                for _, geometries in deformation_engine.edge_geometries(
+                    coordinates, parts, self.window.project.deformations
+                ):
+                    largest_shift = max(
+                        largest_shift,
+                        float(np.sqrt(((geometries - coordinates) ** 2).sum(2).max())),
+                    )
+            finally:
+                QApplication.restoreOverrideCursor()
+        except ValueError as error:
+            self.window.save_and_exit_error_message(str(error))
+            return
+        message_box = QMessageBox(self.window)
+        message_box.setWindowTitle("Edge geometries")
+        edge_count = deformation_engine.corner_count(self.window.project.deformations)
+        message_box.setText(
+            f"Built {edge_count} edge geometries"
+            f" of {len(coordinates)} atoms in {time.perf_counter() - start:.2f} s."
+            f"\nThe largest atom displacement is {largest_shift:.3f}."
+        )
+        message_box.exec_()
+
+    def clash_report(self, edge_limit: int):
+        """Check the loaded molecule and its deformed geometries for clashes
+        Arguments:
+        edge_limit: check this many random edge points when there are more,
+        which also keeps the maximum of the progress dialog within its int
+        Returns None when there is no molecule or partition to check, a report
+        marked as stopped when the check was cancelled
+        Raises ValueError if the check fails
+        """
+        try:
+            coordinates, parts = self.molecule_geometry()
+        except ValueError:
+            return None
+        deformations = list(self.window.project.deformations)
+        edge_count = min(2 ** len(deformations), edge_limit)
+        progress_dialog = QProgressDialog(
+            "Checking interatomic distances...",
+            "Cancel",
+            0,
+            edge_count + clash.CLASH_SAMPLES if deformations else 0,
+            self.window,
+        )
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        thread = QThread(self.window)
+        worker = ClashWorker(
+            {
+                "coordinates": coordinates,
+                "parts": parts,
+                "deformations": deformations,
+                "edge_limit": edge_limit,
+            }
+        )
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+
+        def progressed(done: int):
+            progress_dialog.setValue(done)
+            if progress_dialog.wasCanceled():
+                worker.stop_requested.set()
+
+        worker.progressed.connect(progressed)
+        progress_dialog.canceled.connect(worker.stop_requested.set)
+        results = []
+        loop = QEventLoop()
+        worker.checked.connect(results.append)
+        worker.checked.connect(loop.quit)
+        thread.start()
+        loop.exec_()
+        thread.quit()
+        thread.wait()
+        progress_dialog.close()
+        if isinstance(results[0], Exception):
+            raise ValueError(f"The distance check failed: {results[0]}")
+        return results[0]
+
+    def check_clashes_dialog(self):
+        """Callback that reports atoms coming too close in deformed geometries"""
+        try:
+            self.molecule_geometry()
+            report = self.clash_report(CHECK_EDGE_LIMIT)
+        except ValueError as error:
+            self.window.save_and_exit_error_message(str(error))
+            return
+        message_box = QMessageBox(self.window)
+        message_box.setWindowTitle("Interatomic distances")
+        message_box.setText(report.describe(list(self.window.project.deformations)))
+        message_box.exec_()
+
+    def sample_geometries_dialog(self):
+        """Callback that writes deformed geometries sampled within the ranges"""
+        try:
+            _, parts = self.molecule_geometry()
+            if not self.window.project.deformations:
+                raise ValueError("No deformations defined!")
+        except ValueError as error:
+            self.window.save_and_exit_error_message(str(error))
+            return
+        method, accepted = QInputDialog.getItem(
+            self.window,
+            "Sample geometries",
+            "Sampling method",
+            sampling.SAMPLING_METHODS,
+            0,
+            False,
+        )
+        if not accepted:
+            return
+        count, accepted = QInputDialog.getInt(
+            self.window, "Sample geometries", "Number of samples", 1000, 1, 100_000_000
+        )
+        if not accepted:
+            return
+        count = sampling.sample_count(
+            count, method, len(self.window.project.deformations)
+        )
+        fname = QFileDialog.getSaveFileName(
+            self.window,
+            "Save sampled geometries",
+            self.window.project.settings["project_folder"] or ".",
+            "NumPy stack (*.npy);;XYZ frames (*.xyz)",
+        )
+        if not fname[0]:
+            return
+        progress_dialog, progress = self._progress("Writing geometries...", count)
+        try:
+            written = sampling.write_samples(
+                self.window.molecule,
+                parts,
+                list(self.window.project.deformations),
+                fname[0],
+                count,
+                method,
+                progress=progress,
+            )
+        except (OSError, ValueError, ImportError) as error:
+            self.window.save_and_exit_error_message(str(error))
+            return
+        finally:
+            progress_dialog.close()
+        message_box = QMessageBox(self.window)
+        message_box.setWindowTitle("Sample geometries")
+        message_box.setText(f"Wrote {written} geometries to {fname[0]}")
+        message_box.exec_()
+
+    def write_fdmnes_dialog(self):
+        """Callback that writes FDMNES input folders for a stack of sampled geometries"""
+        self.window.update_project_settings()
+        settings = self.window.project.settings
+        missing = [
+            label
+            for key, label in (("energy_range", "energy range"), ("Radius", "radius"))
+            if settings[key] == ""
+        ]
+        if self.window.molecule is None:
+            missing.insert(0, "molecule file")
+        if missing:
+            self.window.save_and_exit_error_message(
+                f"Input the {', '.join(missing)} first!"
+            )
+            return
+        stack = QFileDialog.getOpenFileName(
+            self.window,
+            "Choose sampled geometries",
+            settings["project_folder"] or ".",
+            "NumPy stack (*.npy)",
+        )[0]
+        if not stack:
+            return
+        output_dir = QFileDialog.getExistingDirectory(
+            self.window,
+            "Choose a directory for the FDMNES inputs",
+            os.path.dirname(stack),
+        )
+        if not output_dir:
+            return
+        count = len(np.load(stack, mmap_mode="r"))
+        progress_dialog, progress = self._progress("Writing FDMNES inputs...", count)
+        try:
+            written, skipped, cached = fdmnes.write_decks(
+                stack,
+                self.window.molecule.elements,
+                settings,
+                output_dir,
+                self.window.cost_preview.absorber(),
+                progress=progress,
+                cache_dir=result_cache.DEFAULT_CACHE_DIR,
+            )
+        except (OSError, ValueError) as error:
+            self.window.save_and_exit_error_message(str(error))
+            return
+        finally:
+            progress_dialog.close()
+        message_box = QMessageBox(self.window)
+        message_box.setWindowTitle("FDMNES inputs")
+        message_box.setText(
+            f"Wrote {written} input folders to {output_dir},"
+            f" {skipped} were already complete, {cached} results restored from"
+            " the cache"
+        )
+        message_box.exec_()
+
+    def _progress(self, label: str, maximum: int):
+        progress_dialog = QProgressDialog(label, "Cancel", 0, maximum, self.window)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+
+        def progress(done: int) -> bool:
+            progress_dialog.setValue(done)
+            QApplication.processEvents()
+            return not progress_dialog.wasCanceled()
+
+        return progress_dialog, progress
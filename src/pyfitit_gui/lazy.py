@@ -0,0 +1,35 @@
+"""Module deferring the import of heavy modules until they are first used
+
+The GUI needs NumPy and the engines built on it only once a molecule or
+spectrum is loaded or a tool is used, but importing them takes most of the
+start-up time. Modules imported with lazy_import are registered right away
+and only executed when one of their attributes is first read, so the window
+can be painted before they load.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str, package: str = None) -> ModuleType:
+    """Return a module that is executed when one of its attributes is first read
+    Arguments:
+    name: absolute module name, or a relative one resolved against package
+    package: package of the importing module, usually __package__
+    A module that is already imported is returned as it is
+    """
+    name = importlib.util.resolve_name(name, package)
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -1,18 +1,45 @@
 """Module contatining a helper function to launch the app from command line"""
 
+import argparse
 import sys
+import time
 
 from PyQt5.QtWidgets import QApplication
 
 from .main_window import MainWindow
+from .profiling import TracingApplication, enable_profiling
+from .tracing import TRACER
 
+DEFAULT_TRACE_PATH = "pyfitit_gui_trace.json"
 
-def main():
+
+def main(argv: list[str] = None):
     """Helper function to launch the GUI app"""
-    app = QApplication(sys.argv)
-    main_window = MainWindow()
+    started_ns = time.perf_counter_ns()
+    parser = argparse.ArgumentParser(prog="pyfitit-gui")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=DEFAULT_TRACE_PATH,
+        metavar="TRACE",
+        help="record a Chrome trace of the session, by default to "
+        + DEFAULT_TRACE_PATH,
+    )
+    args, qt_arguments = parser.parse_known_args(argv)
+    qt_arguments = sys.argv[:1] + qt_arguments
+    if args.profile is None:
+        app = QApplication(qt_arguments)
+    else:
+        app = TracingApplication(qt_arguments)
+        enable_profiling()
+    main_window = MainWindow(started_ns=started_ns)
     main_window.show()
-    app.exec()
+    code = app.exec()
+    if args.profile is not None:
+        TRACER.export_chrome(args.profile)
+        print(TRACER.summary())
+        print(f"Trace written to {args.profile}")
+    return code
 
 
 if __name__ == "__main__":
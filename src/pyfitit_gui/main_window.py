@@ -2,10 +2,8 @@
 
 import os
 from collections.abc import Callable
-from pathlib import Path
-from string import Template
 
-from PyQt5.QtCore import QRegExp, Qt
+from PyQt5.QtCore import QRegExp, Qt, QTimer
 from PyQt5.QtGui import QDoubleValidator, QFont, QIcon, QRegExpValidator
 from PyQt5.QtWidgets import (
     QCheckBox,
@@ -16,30 +14,96 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QLineEdit,
-    QListWidget,
     QMessageBox,
     QPushButton,
     QVBoxLayout,
     QWidget,
 )
 
+from .deferred_panels import PANEL_ATTRIBUTES, DeferredPanels, PanelWidgets
 from .deformation_dialog import DeformationDialog
-
-
+from .geometry_tools import SAVE_EDGE_LIMIT
+from .lazy import lazy_import
+from .plot_widget import SpectrumPlot
+from .project_io import PROJECT_SUFFIX, ProjectJournal, load_project
+from .project_model import ProjectModel
+from .rendering import (
+    EMPTY_FIELD_VALUES,
+    expand_deformations,
+    expand_geometry_param_ranges,
+    render_project,
+)
+from .smoothing_preview import SMOOTHING_TOOLTIPS
+
+molecule = lazy_import(".molecule", __package__)
+scheduler_panel = lazy_import(".scheduler_panel", __package__)
+script_importer = lazy_import(".script_importer", __package__)
+spectrum = lazy_import(".spectrum", __package__)
+
+PROJECT_SETTING_WIDGETS = {
+    "project_folder": "project_directory_label",
+    "molecule_file": "molecule_file_label",
+    "spectrum_file": "spectrum_file_label",
+    "project_name": "project_name_input",
+    "parts": "molecule_partition_input",
+    "left_interval": "project_energy_interval_left",
+    "right_interval": "project_energy_interval_right",
+    "energy_range": "FDMNES_energy_range_input",
+    "Radius": "FDMNES_radius_input",
+    "GH": "FDMNES_gamma_hole_input",
+    "Ecent": "FDMNES_Ecent_input",
+    "Elarg": "FDMNES_Elarg_input",
+    "Gmax": "FDMNES_Gmax_input",
+    "Efermi": "FDMNES_Efermi_input",
+    "shift": "FDMNES_Shift_input",
+    "norm": "PyFitIt_norm_input",
+}
+"""Project model settings and the names of the widgets they are typed into"""
+
+AUTOSAVE_COMPACTION_INTERVAL_MS = 30_000
+
+TEMPLATE_SPECTRUM_LAYOUT = (1, 0, 1)
+"""Header rows, energy and intensity column read by the generated project"""
+
+
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
 class MainWindow(QWidget):
-    """Main application class holding the layout and logic of the program"""
+    """Main application class holding the layout and logic of the program
+    Init:
+    parent: parent widget
+    started_ns: time.perf_counter_ns() at the start of the application
+    """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, started_ns: int = None):
         super().__init__(parent)
-        self.widgets = {}
-        self.deformations = []
+        self.project = ProjectModel()
+        self.journal = None
+        self.molecule = None
+        self.spectrum = None
+        self.panels = DeferredPanels(self, PROJECT_SETTING_WIDGETS, started_ns)
+        self.widgets = PanelWidgets(self.panels)
         self.setWindowTitle("PyFitIt GUI")
         self.main_box = QHBoxLayout()
         self.draw_left_column()
         self.draw_sperator()
         self.draw_right_column()
         self.setLayout(self.main_box)
-
+        self.__connect_project_settings()
+
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setInterval(AUTOSAVE_COMPACTION_INTERVAL_MS)
+        self.autosave_timer.timeout.connect(self.compact_journal)
+        self.autosave_timer.start()
+
+    def __getattr__(self, name: str):
+        """Build the deferred panels when one is used before the first paint"""
+        panels = self.__dict__.get("panels")
+        if name in PANEL_ATTRIBUTES and panels is not None and not panels.built:
+            panels.build()
+            return getattr(self, name)
+        raise AttributeError(f"'{type(self).__name__}' has no attribute '{name}'")
+
+    # pylint: disable=too-many-statements
     def draw_left_column(self):
         """Helper function to draw the left column of the UI"""
         left_column_main = QVBoxLayout()
@@ -188,35 +252,66 @@ class MainWindow(QWidget):
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_gamma_hole", "", 4, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_gamma_hole",
+            SMOOTHING_TOOLTIPS["GH"],
+            4,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_Ecent", "", 5, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_Ecent",
+            SMOOTHING_TOOLTIPS["Ecent"],
+            5,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_Elarg", "", 6, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_Elarg",
+            SMOOTHING_TOOLTIPS["Elarg"],
+            6,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_Gmax", "", 7, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_Gmax",
+            SMOOTHING_TOOLTIPS["Gmax"],
+            7,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_Efermi", "", 8, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_Efermi",
+            SMOOTHING_TOOLTIPS["Efermi"],
+            8,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "FDMNES_Shift", "", 9, validator=QDoubleValidator()
+            fit_input_layout,
+            "FDMNES_Shift",
+            SMOOTHING_TOOLTIPS["shift"],
+            9,
+            validator=QDoubleValidator(),
         )
 
         self.__add_parameter_input_widget(
-            fit_input_layout, "PyFitIt_norm", "", 10, validator=QDoubleValidator()
+            fit_input_layout,
+            "PyFitIt_norm",
+            SMOOTHING_TOOLTIPS["norm"],
+            10,
+            validator=QDoubleValidator(),
         )
 
         fit_input_frame.setLayout(fit_input_layout)
         left_column_main.addWidget(fit_input_frame)
+        left_column_main.addLayout(self.panels.layout("cost"))
+
+        self.__create_spectrum_preview(left_column_main)
 
         self.main_box.addLayout(left_column_main)
 
@@ -233,18 +328,24 @@ class MainWindow(QWidget):
         molecule_deformations_frame.setFrameShape(QFrame.Panel)
 
         partition_box = QHBoxLayout()
-        molecule_partition_regex = QRegExp(r"(?:(\d+.+\,+)|(\d\,))")
+        molecule_partition_regex = QRegExp(r"\d+(-\d+)?(,\d+(-\d+)?)*,?")
         molecule_partition_validator = QRegExpValidator(molecule_partition_regex)
         self.__add_parameter_input_widget(
             partition_box,
             "molecule_partition",
-            "",
+            "Comma separated parts, each one atom or a range, e.g. 0-5,6-21",
             validator=molecule_partition_validator,
         )
+        partition_box.addLayout(self.panels.layout("partition"))
         right_column.addLayout(partition_box)
 
-        self.deformation_list = QListWidget()
-        right_column.addWidget(self.deformation_list)
+        self.widgets["molecule_info_label"] = QLabel("No molecule loaded")
+        right_column.addWidget(self.widgets["molecule_info_label"])
+
+        self.deformation_filter = QLineEdit()
+        self.deformation_filter.setPlaceholderText("Filter deformations")
+        right_column.addWidget(self.deformation_filter)
+        right_column.addLayout(self.panels.layout("deformations", QVBoxLayout), 1)
 
         molecule_button_box = QHBoxLayout()
         self.__create_deformations_list(molecule_button_box)
@@ -262,6 +363,8 @@ class MainWindow(QWidget):
         save_project_box.setFrameShape(QFrame.Panel)
         save_project_layout = QHBoxLayout()
 
+        self.__create_project_state_buttons(save_project_layout)
+
         self.__create_save_and_exit_box(save_project_layout)
 
         save_project_box.setLayout(save_project_layout)
@@ -279,14 +382,21 @@ class MainWindow(QWidget):
 
     def deformation_dialog(self):
         """Helper callback function to start the deformation addition dialog"""
-        dlg = DeformationDialog(self.deformations, self.deformation_list)
+        dlg = DeformationDialog(
+            self.deformation_table,
+            bond_axes=self.partition_tools.deformation_axes(),
+        )
         dlg.exec()
 
     def edit_deformation_dialog(self):
         """Helper callback function to start the deformation edit dialog"""
-        if len(self.deformation_list.selectedItems()) == 1:
-            idx = self.deformation_list.row(self.deformation_list.selectedItems()[0])
-            dlg = DeformationDialog(self.deformations, self.deformation_list, idx)
+        rows = self.selected_deformation_rows()
+        if len(rows) == 1:
+            dlg = DeformationDialog(
+                self.deformation_table,
+                rows[0],
+                self.partition_tools.deformation_axes(),
+            )
             dlg.exec()
         else:
             error_dialog = QMessageBox(self)
@@ -296,19 +406,28 @@ class MainWindow(QWidget):
             error_dialog.setWindowTitle("Deformation edit warning")
             error_dialog.exec_()
 
+    def selected_deformation_rows(self) -> list[int]:
+        """Return the project model rows of the deformations selected in the table"""
+        return sorted(
+            self.deformation_proxy.mapToSource(index).row()
+            for index in self.deformation_list.selectionModel().selectedRows()
+        )
+
     def remove_deformations(self):
-        """Callback that removes a deformation selected on the ListWidget object"""
+        """Callback that removes the deformations selected in the table"""
+        rows = self.selected_deformation_rows()
+        if not rows:
+            return
         message_box = QMessageBox()
         message_box.setWindowTitle("Deformation deletion dialog")
-        message_box.setText("Are you sure you want to delete the selected deformation?")
+        message_box.setText(
+            f"Are you sure you want to delete the {len(rows)} selected deformation(s)?"
+        )
         message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         retval = message_box.exec()
         if retval == QMessageBox.Yes:
-            idx = self.deformation_list.selectedIndexes()
-            self.deformations.pop(idx.row())
-            self.deformation_list.takeItem(idx.row())
+            self.deformation_table.remove_deformations(rows)
 
-    # pylint: disable=too-many-locals
     def save_project_dialog(self, close: bool):
         """Start the save project dialog, optionally closing the program after a successful save
         Arguments:
@@ -323,89 +442,262 @@ class MainWindow(QWidget):
                 "Are you sure you want to save the current project and exit?"
             )
         message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        message_box.setCheckBox(QCheckBox("Write a binary copy of the spectrum"))
         retval = message_box.exec()
         if retval == QMessageBox.Yes:
-            deformations = self.expand_deformations()
-            green = "True" if self.widgets["FDMNES_green"].isChecked() else "False"
-            project_dir = self.widgets["project_directory_label"].text()
-            project_name = self.widgets["project_name_input"].text()
-            if deformations:
-                output_dictionary = {
-                    "geometry_param_ranges": self.expand_geometry_param_ranges(),
-                    "molecule_file": self.widgets["molecule_file_label"].text(),
-                    "parts": self.widgets["molecule_partition_input"].text(),
-                    "deformations": deformations,
-                    "project_name": project_name,
-                    "project_folder": project_dir,
-                    "spectrum_file": self.widgets["spectrum_file_label"].text(),
-                    "left_interval": self.widgets[
-                        "project_energy_interval_left"
-                    ].text(),
-                    "right_interval": self.widgets[
-                        "project_energy_interval_right"
-                    ].text(),
-                    "energy_range": self.widgets["FDMNES_energy_range_input"].text(),
-                    "Green": green,
-                    "Radius": self.widgets["FDMNES_radius_input"].text(),
-                    "GH": self.widgets["FDMNES_gamma_hole_input"].text(),
-                    "Ecent": self.widgets["FDMNES_Ecent_input"].text(),
-                    "Elarg": self.widgets["FDMNES_Elarg_input"].text(),
-                    "Gmax": self.widgets["FDMNES_Gmax_input"].text(),
-                    "Efermi": self.widgets["FDMNES_Efermi_input"].text(),
-                    "shift": self.widgets["FDMNES_Shift_input"].text(),
-                    "norm": self.widgets["PyFitIt_norm_input"].text(),
-                }
-                invalidate = False
-                for _, value in output_dictionary.items():
-                    if value in (
-                        "",
-                        "No directory chosen!",
-                        "No spectrum file chosen!",
-                        "No molecule file chosen!",
-                    ):
-                        invalidate = True
-                        self.save_and_exit_error_message(
-                            "Cannot generate project as there are empty fields!"
-                        )
-                        break
-
-                if float(output_dictionary["left_interval"]) > float(
-                    output_dictionary["right_interval"]
-                ):
-                    self.save_and_exit_error_message(
-                        "Start of energy interval is larger than the end!"
+            self.update_project_settings()
+            errors = self.project.validate()
+            if errors:
+                self.save_and_exit_error_message("\n".join(errors))
+                return
+            try:
+                report = self.geometry_tools.clash_report(SAVE_EDGE_LIMIT)
+            except ValueError as error:
+                self.save_and_exit_error_message(str(error))
+                return
+            if report is not None and report.stopped:
+                return
+            if report is not None and (report.clashes or report.static_clashes):
+                clash_box = QMessageBox(self)
+                clash_box.setWindowTitle("Atoms too close")
+                clash_box.setText(
+                    report.describe(list(self.project.deformations))
+                    + "\n\nSave the project anyway?"
+                )
+                clash_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+                if clash_box.exec() != QMessageBox.Yes:
+                    return
+            output_dictionary = self.project.output_dictionary(
+                self.widgets["compiled_constructor"].isChecked(),
+                message_box.checkBox().isChecked() and self.write_spectrum_sidecar(),
+            )
+            project_dir = output_dictionary["project_folder"]
+            project_name = output_dictionary["project_name"]
+            result = render_project(output_dictionary)
+            # pylint: disable=bare-except
+            try:
+                with open(
+                    # pylint: disable=line-too-long
+                    f"{project_dir}/{project_name}.py",
+                    "w+",
+                    encoding="utf-8",
+                ) as output:
+                    output.write(result)
+            except:
+                self.save_and_exit_error_message("Failed to save, file already exists!")
+            else:
+                if self.journal is None:
+                    self.attach_journal(
+                        os.path.join(project_dir, project_name + PROJECT_SUFFIX)
                     )
+                save_success_msgbox = QMessageBox()
+                save_success_msgbox.setText(
+                    f"Saved project successfuly as {project_name}.py"
+                )
+                save_success_msgbox.setWindowTitle("Save successful")
+                save_success_msgbox.setStandardButtons(QMessageBox.Ok)
+                save_success_msgbox.exec()
+                if close:
+                    self.close()
+
+    def update_project_settings(self):
+        """Copy the values typed into the widgets into the project model"""
+        for key, widget_name in PROJECT_SETTING_WIDGETS.items():
+            value = self.widgets[widget_name].text()
+            if value in EMPTY_FIELD_VALUES:
+                value = ""
+            self.project.set_setting(key, value)
+        self.project.set_setting("Green", self.widgets["FDMNES_green"].isChecked())
+        self.update_molecule_limits()
+        self.update_spectrum_preview()
+
+    def update_molecule_limits(self):
+        """Load the chosen molecule file and pass its atom and part counts
+        to the project model, so deformations are checked against them"""
+        self.molecule = None
+        molecule_info = "No molecule loaded"
+        path = self.project.molecule_path()
+        if self.project.settings["molecule_file"] and os.path.isfile(path):
+            try:
+                self.molecule = molecule.load_molecule(path)
+            except (OSError, ValueError) as error:
+                molecule_info = f"Could not read molecule: {error}"
+            else:
+                molecule_info = f"Molecule: {self.molecule.atom_count} atoms"
+        self.project.atom_count = self.molecule.atom_count if self.molecule else None
+
+        self.project.part_count = None
+        if self.project.settings["parts"]:
+            try:
+                self.project.part_count = len(
+                    molecule.parse_partition(self.project.settings["parts"])
+                )
+            except ValueError as error:
+                molecule_info += f", {error}"
+            else:
+                molecule_info += f", {self.project.part_count} parts"
+        self.widgets["molecule_info_label"].setText(molecule_info)
+        self.cost_preview.update()
+
+    def update_spectrum_preview(self):
+        """Load the chosen spectrum file into the preview plot if it changed"""
+        path = self.project.spectrum_path()
+        if self.spectrum is not None and self.spectrum.path == path:
+            return
+        self.spectrum = None
+        self.smoothing_preview.redraw()
+        if not self.project.settings["spectrum_file"] or not os.path.isfile(path):
+            self.widgets["spectrum_info_label"].setText("No spectrum loaded")
+            return
+        try:
+            self.spectrum = spectrum.load_spectrum(path)
+        except (OSError, ValueError) as error:
+            self.widgets["spectrum_info_label"].setText(
+                f"Could not read spectrum: {error}"
+            )
+            return
+        self.smoothing_preview.redraw()
+        self.update_spectrum_interval()
+
+    def update_spectrum_interval(self):
+        """Show the typed energy interval on the preview plot"""
+        if self.spectrum is None:
+            return
+        plot = self.widgets["spectrum_plot"]
+        try:
+            plot.set_interval(
+                float(self.widgets["project_energy_interval_left"].text()),
+                float(self.widgets["project_energy_interval_right"].text()),
+            )
+        except ValueError:
+            plot.set_interval()
+        # A fitted norm depends on the interval
+        self.smoothing_preview.timer.start()
+        layout = self.spectrum.layout
+        spectrum_info = (
+            f"{len(self.spectrum.energy)} points, "
+            f"{self.spectrum.energy[0]:g} - {self.spectrum.energy[-1]:g} eV"
+        )
+        if plot.interval is not None:
+            spectrum_info += f", {plot.interval_point_count()} within the interval"
+        if (
+            layout.skiprows,
+            layout.energy_column,
+            layout.intensity_column,
+        ) != TEMPLATE_SPECTRUM_LAYOUT:
+            spectrum_info += (
+                f". Detected energy in column {layout.energy_column} and intensity"
+                f" in column {layout.intensity_column} after {layout.skiprows}"
+                " header rows, while the generated project reads columns 0 and 1"
+                " after 1 header row!"
+            )
+        self.widgets["spectrum_info_label"].setText(spectrum_info)
 
-                if not invalidate:
-                    project_template_path = (
-                        Path(__file__).parent / "templates" / "project.template"
-                    )
-                    with project_template_path.open() as file_path:
-                        template = Template(file_path.read())
-                        result = template.substitute(output_dictionary)
-                        # pylint: disable=bare-except
-                        try:
-                            with open(
-                                # pylint: disable=line-too-long
-                                f"{project_dir}/{project_name}.py",
-                                "w+",
-                                encoding="utf-8",
-                            ) as output:
-                                output.write(result)
-                        except:
-                            self.save_and_exit_error_message(
-                                "Failed to save, file already exists!"
-                            )
-                        else:
-                            save_success_msgbox = QMessageBox()
-                            save_success_msgbox.setText(
-                                f"Saved project successfuly as {project_name}.py"
-                            )
-                            save_success_msgbox.setWindowTitle("Save successful")
-                            save_success_msgbox.setStandardButtons(QMessageBox.Ok)
-                            save_success_msgbox.exec()
-                            if close:
-                                self.close()
+    def scheduler_panel(self):
+        """Callback showing the window running FDMNES over input folders"""
+        if self.widgets.get("scheduler_panel") is None:
+            self.widgets["scheduler_panel"] = scheduler_panel.SchedulerPanel(
+                self.project.settings["project_folder"], self
+            )
+        self.widgets["scheduler_panel"].show()
+        self.widgets["scheduler_panel"].raise_()
+
+    def open_project_state_dialog(self):
+        """Callback that loads a project saved in the native format of the app"""
+        fname = QFileDialog.getOpenFileName(
+            self, "Open project", ".", f"PyFitIt GUI projects (*{PROJECT_SUFFIX})"
+        )
+        if not fname[0]:
+            return
+        try:
+            project = load_project(fname[0])
+        except (OSError, ValueError, KeyError) as error:
+            self.save_and_exit_error_message(f"Failed to open project: {error}")
+            return
+        self.set_project(project, fname[0])
+
+    def import_script_dialog(self):
+        """Callback that loads the settings and deformations of a PyFitIt project script"""
+        fname = QFileDialog.getOpenFileName(
+            self, "Import project script", ".", "PyFitIt project scripts (*.py)"
+        )
+        if not fname[0]:
+            return
+        try:
+            project, warnings = script_importer.import_script(fname[0])
+        except (OSError, SyntaxError) as error:
+            self.save_and_exit_error_message(f"Failed to import script: {error}")
+            return
+        self.set_project(project)
+        if warnings:
+            warning_dialog = QMessageBox(self)
+            # pylint: disable=no-member
+            warning_dialog.setIcon(QMessageBox.Icon.Warning)
+            warning_dialog.setText("The script was imported with warnings:")
+            warning_dialog.setDetailedText("\n".join(warnings))
+            warning_dialog.setWindowTitle("Import warning")
+            warning_dialog.exec_()
+
+    def save_project_state_dialog(self):
+        """Callback that saves the project in the native format of the app
+        and keeps saving further changes to its journal"""
+        fname = QFileDialog.getSaveFileName(
+            self, "Save project as", ".", f"PyFitIt GUI projects (*{PROJECT_SUFFIX})"
+        )
+        if not fname[0]:
+            return
+        path = fname[0]
+        if not path.endswith(PROJECT_SUFFIX):
+            path += PROJECT_SUFFIX
+        self.update_project_settings()
+        try:
+            self.attach_journal(path)
+        except OSError as error:
+            self.save_and_exit_error_message(f"Failed to save project: {error}")
+
+    def set_project(self, project: ProjectModel, path: str = None):
+        """Show a different project model in the window
+        Arguments:
+        project: the project model to show
+        path: the native project file it belongs to, enables autosave if given
+        """
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        self.project = project
+        self.deformation_table.reset_project(project)
+        for key, widget_name in PROJECT_SETTING_WIDGETS.items():
+            value = project.settings[key]
+            if widget_name.endswith("_label") and not value:
+                value = "No directory chosen!"
+            self.widgets[widget_name].setText(value)
+        self.widgets["FDMNES_green"].setChecked(project.settings["Green"])
+        self.update_molecule_limits()
+        self.update_spectrum_preview()
+        if path is not None:
+            self.attach_journal(path)
+
+    def attach_journal(self, path: str):
+        """Save the project to a native file and record all further changes"""
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = ProjectJournal(self.project, path)
+        self.setWindowTitle(f"PyFitIt GUI - {os.path.basename(path)}")
+
+    def compact_journal(self):
+        """Fold a long autosave journal back into the project file"""
+        if self.journal is not None and self.journal.compaction_due:
+            self.journal.compact()
+
+    # pylint: disable=invalid-name
+    def closeEvent(self, event):
+        """Compact the autosave journal and stop running jobs before the window closes"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.widgets.get("scheduler_panel") is not None:
+            self.widgets["scheduler_panel"].close()
+        super().closeEvent(event)
 
     def quit_without_saving_dialog(self):
         """Helper callback function that calls save_project_dialog(close = False)"""
@@ -428,6 +720,7 @@ class MainWindow(QWidget):
             self, "Choose a molecule file", path, "Molecule files (*.xyz)"
         )
         self.widgets["molecule_file_label"].setText(fname[0])
+        self.update_project_settings()
 
     def get_spectrum_file(self):
         """Callback function that updates spectrum file path based on user choice"""
@@ -440,6 +733,7 @@ class MainWindow(QWidget):
             self, "Choose a spectrum file", path, "Any file type (*)"
         )
         self.widgets["spectrum_file_label"].setText(fname[0])
+        self.update_project_settings()
 
     def get_project_directory(self):
         """Callback function that updates the project directory based on user choice"""
@@ -447,6 +741,18 @@ class MainWindow(QWidget):
             self, "Choose project directory", "."
         )
         self.widgets["project_directory_label"].setText(dirname)
+        self.update_project_settings()
+
+    def write_spectrum_sidecar(self) -> bool:
+        """Write the binary copy of the spectrum, report whether it was written"""
+        try:
+            spectrum.write_spectrum_sidecar(self.project.spectrum_path())
+        except (OSError, ValueError) as error:
+            self.save_and_exit_error_message(
+                f"Spectrum copy not written, the project parses the text file: {error}"
+            )
+            return False
+        return True
 
     def save_and_exit_error_message(self, warning):
         """Helper function that displays an error dialog
@@ -462,28 +768,8 @@ class MainWindow(QWidget):
     def expand_deformations(self):
         """Function that translates a list of deformations into a string
         representation that would be encountered in a PyFitIt project file"""
-        # pylint: disable=line-too-long
-        deform_string_list = []
-        for deformation in self.deformations:
-            if deformation.def_type == "shift":
-                deform_string_list.append(f'    deformation = "{deformation.name}"\n')
-                deform_string_list.append(
-                    f"    axis = normalize(m.atom[{deformation.atom_1}]-m.atom[{deformation.atom_2}])\n"
-                )
-                deform_string_list.append(
-                    f"    m.part[{deformation.part}].shift(axis*params[deformation])\n\n"
-                )
-            elif deformation.def_type == "rotation":
-                deform_string_list.append(f'    deformation = "{deformation.name}"\n')
-                deform_string_list.append(
-                    f"    axis = normalize(m.atom[{deformation.atom_1}]-m.atom[{deformation.atom_2}])\n"
-                )
-                deform_string_list.append(
-                    f"    m.part[{deformation.part}].rotate(axis, m.atom[{deformation.atom_1}], params[deformation])\n\n"
-                )
-
-        if deform_string_list:
-            deformation_string = "".join(deform_string_list)
+        deformation_string = expand_deformations(self.project.deformations)
+        if deformation_string:
             return deformation_string
         self.save_and_exit_error_message(
             "No deformations defined, unable to generate project!"
@@ -493,16 +779,8 @@ class MainWindow(QWidget):
     def expand_geometry_param_ranges(self):
         """Function that translates the deformations object into
         a list of deformation names and their respective ranges"""
-        geometry_param_ranges_list = []
-        for deformation in self.deformations:
-            geometry_param_ranges_list.append(
-                f" '{deformation.name}': [{deformation.range_left}, {deformation.range_right}],\n"
-            )
-
-        if geometry_param_ranges_list:
-            geometry_string = "".join(geometry_param_ranges_list)
-            if geometry_string[-1] == "\n":
-                geometry_string = geometry_string[:-1]
+        geometry_string = expand_geometry_param_ranges(self.project.deformations)
+        if geometry_string:
             return geometry_string
         self.save_and_exit_error_message(
             "No deformations defined, unable to generate project!"
@@ -532,19 +810,82 @@ class MainWindow(QWidget):
         add_deformation.setText("Add")
         add_deformation.setIcon(add_button_icon)
         add_deformation.clicked.connect(self.deformation_dialog)
-
         layout.addWidget(remove_deformation)
         layout.addStretch()
+        layout.addLayout(self.panels.layout("geometry"))
+        layout.addStretch()
         layout.addWidget(edit_deformation)
         layout.addStretch()
         layout.addWidget(add_deformation)
 
+    def __create_spectrum_preview(self, layout: QVBoxLayout):
+        spectrum_preview_label = QLabel("Spectrum preview")
+        spectrum_preview_label.setFont(QFont("default", 11, QFont.Bold))
+        layout.addWidget(spectrum_preview_label)
+        self.widgets["spectrum_plot"] = SpectrumPlot()
+        layout.addWidget(self.widgets["spectrum_plot"])
+        self.widgets["spectrum_info_label"] = QLabel("No spectrum loaded")
+        self.widgets["spectrum_info_label"].setWordWrap(True)
+        layout.addWidget(self.widgets["spectrum_info_label"])
+        layout.addLayout(self.panels.layout("smoothing"))
+
+    def __connect_project_settings(self):
+        for widget_name in PROJECT_SETTING_WIDGETS.values():
+            widget = self.widgets[widget_name]
+            if isinstance(widget, QLineEdit):
+                widget.editingFinished.connect(self.update_project_settings)
+        self.widgets["FDMNES_green"].toggled.connect(self.update_project_settings)
+        for widget_name in (
+            "project_energy_interval_left",
+            "project_energy_interval_right",
+        ):
+            self.widgets[widget_name].textChanged.connect(self.update_spectrum_interval)
+
+    def __create_project_state_buttons(self, layout: QHBoxLayout):
+        open_state_button = QPushButton("Open project")
+        open_state_button.setToolTip(
+            f"<font>Open a project saved by this app (*{PROJECT_SUFFIX}).</font>"
+        )
+        open_state_button.clicked.connect(self.open_project_state_dialog)
+        layout.addWidget(open_state_button)
+
+        save_state_button = QPushButton("Save project as")
+        save_state_button.setToolTip(
+            """<font>Save the state of the app so it can be reopened later.
+            Further changes are then saved automatically.</font>"""
+        )
+        save_state_button.clicked.connect(self.save_project_state_dialog)
+        layout.addWidget(save_state_button)
+
+        import_script_button = QPushButton("Import script")
+        import_script_button.setToolTip(
+            """<font>Load an existing PyFitIt project script.
+            The script is only read, never run.</font>"""
+        )
+        import_script_button.clicked.connect(self.import_script_dialog)
+        layout.addWidget(import_script_button)
+
+        run_jobs_button = QPushButton("Run FDMNES")
+        run_jobs_button.setToolTip(
+            """<font>Run FDMNES in every folder written by "FDMNES inputs"
+            and follow the progress of the jobs.</font>"""
+        )
+        run_jobs_button.clicked.connect(self.scheduler_panel)
+        layout.addWidget(run_jobs_button)
+
     def __create_save_and_exit_box(self, layout: QHBoxLayout):
         buttons = (
             QDialogButtonBox.Cancel | QDialogButtonBox.Save | QDialogButtonBox.Close
         )
         buttons_box = QDialogButtonBox(buttons)
 
+        self.widgets["compiled_constructor"] = QCheckBox("Compiled")
+        self.widgets["compiled_constructor"].setToolTip(
+            """<font>Compose all deformations of a part into one transform in the
+            generated moleculeConstructor, which builds geometries faster. Needs
+            parts that do not overlap.</font>"""
+        )
+        layout.addWidget(self.widgets["compiled_constructor"])
         layout.addWidget(buttons_box)
         cancel_button = buttons_box.button(QDialogButtonBox.Cancel)
         cancel_button.clicked.connect(self.quit_without_saving_dialog)
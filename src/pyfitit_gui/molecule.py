@@ -0,0 +1,172 @@
+"""Module loading molecule files into NumPy arrays
+
+Files are memory-mapped and the atom lines are read from the mapping by the
+C parser of np.loadtxt, which checks the columns of every line. Parsed
+molecules are cached by path. A cached molecule is reused while the
+modification time and size of its file are unchanged, or when the file was
+only touched and its content hash still matches.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+MOLECULE_CACHE_SIZE = 16
+"""Number of parsed molecules kept in memory"""
+
+ELEMENT_WIDTH = 8
+"""Longest element label accepted in an atom line"""
+
+_PARTITION_ITEM = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\s*$")
+
+
+@dataclass(frozen=True)
+class MoleculeData:
+    """Class holding the atoms of a parsed molecule file"""
+
+    path: str
+    elements: np.ndarray
+    coordinates: np.ndarray
+    comment: str = ""
+
+    @property
+    def atom_count(self) -> int:
+        """Number of atoms in the molecule"""
+        return len(self.elements)
+
+
+@dataclass
+class _CacheEntry:
+    mtime_ns: int
+    size: int
+    digest: bytes
+    molecule: MoleculeData
+
+
+_cache: OrderedDict[str, _CacheEntry] = OrderedDict()
+
+
+def _file_digest(buffer) -> bytes:
+    return hashlib.blake2b(buffer, digest_size=16).digest()
+
+
+def parse_xyz(buffer, path: str = "") -> MoleculeData:
+    """Parse the content of an .xyz file
+    The first line holds the atom count, the second a comment and every
+    following line an element symbol and three coordinates. Any further
+    columns, e.g. charges, are ignored, but every atom line must have as
+    many columns as the first one.
+    Arguments:
+    buffer: the file content, either bytes or a memory-mapped file, which is
+    read line by line in place
+    path: file name used in error messages
+    Raises ValueError if the content does not follow this format
+    """
+    stream = buffer if isinstance(buffer, mmap.mmap) else io.BytesIO(buffer)
+    stream.seek(0)
+    header, comment = stream.readline(), stream.readline()
+    if not comment.endswith(b"\n"):
+        raise ValueError(f"{path}: not an xyz file, the header is incomplete")
+    try:
+        atom_count = int(header)
+    except ValueError as error:
+        raise ValueError(f"{path}: first line must hold the atom count") from error
+    comment = comment.rstrip(b"\r\n").decode("utf-8", "replace")
+    if atom_count == 0:
+        return MoleculeData(path, np.empty(0, dtype=str), np.empty((0, 3)), comment)
+    start = stream.tell()
+    column_count = len(stream.readline().split())
+    stream.seek(start)
+    if column_count < 4:
+        raise ValueError(f"{path}: atom lines need an element and three coordinates")
+    columns = [("element", f"U{ELEMENT_WIDTH + 1}"), ("x", "f8"), ("y", "f8")]
+    columns += [("z", "f8")] + [(f"column_{n}", "U1") for n in range(4, column_count)]
+    try:
+        table = np.loadtxt(
+            iter(stream.readline, b""),
+            dtype=columns,
+            comments=None,
+            max_rows=atom_count,
+            ndmin=1,
+            encoding="utf-8",
+        )
+    except ValueError as error:
+        raise ValueError(
+            f"{path}: every atom line must hold an element and"
+            f" {column_count - 1} numbers, {str(error).split(';', maxsplit=1)[0]}"
+        ) from error
+    if len(table) < atom_count:
+        raise ValueError(f"{path}: file holds fewer atoms than declared")
+    if np.any(np.char.str_len(table["element"]) > ELEMENT_WIDTH):
+        raise ValueError(
+            f"{path}: element labels must not be longer than {ELEMENT_WIDTH}"
+            " characters"
+        )
+    return MoleculeData(
+        path=path,
+        elements=table["element"],
+        coordinates=np.column_stack((table["x"], table["y"], table["z"])),
+        comment=comment,
+    )
+
+
+def load_molecule(path: str) -> MoleculeData:
+    """Load a molecule file, reusing a cached copy when the file did not change"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    entry = _cache.get(path)
+    if entry and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+        _cache.move_to_end(path)
+        return entry.molecule
+
+    with open(path, "rb") as molecule_file:
+        if stat.st_size == 0:
+            raise ValueError(f"{path}: file is empty")
+        with mmap.mmap(molecule_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            digest = _file_digest(buffer)
+            if entry and entry.digest == digest:
+                molecule = entry.molecule
+            else:
+                molecule = parse_xyz(buffer, path)
+
+    _cache[path] = _CacheEntry(stat.st_mtime_ns, stat.st_size, digest, molecule)
+    _cache.move_to_end(path)
+    while len(_cache) > MOLECULE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return molecule
+
+
+def clear_molecule_cache():
+    """Forget all cached molecules"""
+    _cache.clear()
+
+
+def cached_molecule_count() -> int:
+    """Number of molecules currently cached"""
+    return len(_cache)
+
+
+def parse_partition(text: str) -> list[np.ndarray]:
+    """Translate the molecule partition input into atom indices of each part
+    Parts are separated by commas and are either a single atom index or an
+    inclusive range like `6-21`, e.g. `0-5,6-21,22` defines three parts. The
+    generated project passes every part as its own setParts argument.
+    Raises ValueError if the text does not follow this format
+    """
+    parts = []
+    for item in text.strip().strip(",").split(","):
+        match = _PARTITION_ITEM.match(item)
+        if match is None:
+            raise ValueError(f"Invalid molecule part '{item.strip()}'")
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) is not None else first
+        if last < first:
+            raise ValueError(f"Molecule part '{item.strip()}' is reversed")
+        parts.append(np.arange(first, last + 1))
+    return parts
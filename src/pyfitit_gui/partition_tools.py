@@ -0,0 +1,96 @@
+"""Module with the bond based partition tools of the main window
+
+The bond graph of the loaded molecule is built on first use and kept until
+another molecule is loaded. It proposes the molecule partition and lists the
+bonds between parts, from which deformation axes can be picked.
+"""
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QApplication,
+    QHBoxLayout,
+    QMessageBox,
+    QPushButton,
+    QWidget,
+)
+
+from .lazy import lazy_import
+
+bonds = lazy_import(".bonds", __package__)
+molecule = lazy_import(".molecule", __package__)
+
+
+class PartitionTools:
+    """Callbacks inferring the partition of the molecule of a main window
+    Init:
+    window: the main window whose molecule and partition input are used
+    """
+
+    def __init__(self, window: QWidget):
+        self.window = window
+        self._graph: tuple[object, "bonds.BondGraph"] = (None, None)
+
+    def create_buttons(self, layout: QHBoxLayout):
+        """Add the partition suggestion button to a layout"""
+        suggest_button = QPushButton("Suggest")
+        suggest_button.setToolTip(
+            """<font>Infer bonds from covalent radii and propose a part for every
+            ligand, metal atom and separate molecule.</font>"""
+        )
+        suggest_button.clicked.connect(self.suggest_partition_dialog)
+        layout.addWidget(suggest_button)
+
+    def graph(self) -> "bonds.BondGraph":
+        """Bond graph of the loaded molecule, None if no molecule is loaded"""
+        loaded = self.window.molecule
+        if loaded is None:
+            return None
+        if self._graph[0] is not loaded:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self._graph = (
+                    loaded,
+                    bonds.bond_graph(loaded.coordinates, loaded.elements),
+                )
+            finally:
+                QApplication.restoreOverrideCursor()
+        return self._graph[1]
+
+    def suggest_partition_dialog(self):
+        """Callback proposing a partition and typing it in when accepted"""
+        self.window.update_project_settings()
+        graph = self.graph()
+        if graph is None:
+            self.window.save_and_exit_error_message("Choose a molecule file first!")
+            return
+        partition = graph.partition()
+        text = (
+            f"Found {len(graph.bonds)} bonds and"
+            f" {len(set(graph.fragments.tolist()))} fragments:\n"
+            f"{bonds.describe_fragments(graph, self.window.molecule.elements)}\n\n"
+            f"Suggested partition: {partition}"
+        )
+        if graph.split_fragments:
+            text += (
+                f"\n\n{graph.split_fragments} fragments are not contiguous in the"
+                " molecule file and are split into several parts. Reorder the"
+                " atoms to keep them whole."
+            )
+        message_box = QMessageBox(self.window)
+        message_box.setWindowTitle("Suggested partition")
+        message_box.setText(text + "\n\nUse this partition?")
+        message_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        if message_box.exec() == QMessageBox.Yes:
+            self.window.widgets["molecule_partition_input"].setText(partition)
+            self.window.update_project_settings()
+
+    def deformation_axes(self) -> list[tuple[int, int, int]]:
+        """Bonds between the parts of the current partition as deformation axes
+        Returns an empty list without a molecule or a valid partition
+        """
+        try:
+            parts = molecule.parse_partition(self.window.project.settings["parts"])
+        except ValueError:
+            return []
+        graph = self.graph()
+        return [] if graph is None else bonds.part_bonds(graph, parts)
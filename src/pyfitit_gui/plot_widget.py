@@ -0,0 +1,111 @@
+"""Module with a lightweight widget plotting spectra
+
+Curves are decimated to a few points per horizontal pixel before drawing,
+so the cost of a repaint depends on the widget width, not on the number of
+points of the plotted spectrum.
+"""
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QColor, QPainter, QPen, QPolygonF
+from PyQt5.QtWidgets import QSizePolicy, QWidget
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+spectrum = lazy_import(".spectrum", __package__)
+
+PLOT_MARGIN = 8
+CURVE_COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#9467bd")
+INTERVAL_COLOR = QColor(255, 200, 0, 60)
+
+
+class SpectrumPlot(QWidget):
+    """Widget drawing one or more curves and a highlighted energy interval"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.curves: list[tuple["np.ndarray", "np.ndarray"]] = []
+        self.interval: tuple[float, float] = None
+        self._decimated: list[tuple["np.ndarray", "np.ndarray"]] = []
+        self._decimated_width = -1
+        self.setMinimumHeight(160)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def set_curves(self, curves: list[tuple["np.ndarray", "np.ndarray"]]):
+        """Replace the plotted curves, each a pair of sorted x and y arrays"""
+        self.curves = [
+            (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+            for x, y in curves
+            if len(x)
+        ]
+        self._decimated_width = -1
+        self.update()
+
+    def set_interval(self, left: float = None, right: float = None):
+        """Highlight the [left, right] interval or remove the highlight"""
+        self.interval = (
+            None
+            if left is None or right is None
+            else (min(left, right), max(left, right))
+        )
+        self.update()
+
+    def interval_point_count(self) -> int:
+        """Number of points of the first curve lying within the interval"""
+        if not self.curves or self.interval is None:
+            return 0
+        start, stop = spectrum.interval_indices(self.curves[0][0], *self.interval)
+        return stop - start
+
+    def _decimate(self, width: int):
+        if width != self._decimated_width:
+            self._decimated = [
+                spectrum.minmax_decimate(x, y, width) for x, y in self.curves
+            ]
+            self._decimated_width = width
+
+    # pylint: disable=invalid-name
+    def paintEvent(self, _event):
+        """Draw the interval and the decimated curves"""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        area = QRectF(self.rect()).adjusted(
+            PLOT_MARGIN, PLOT_MARGIN, -PLOT_MARGIN, -PLOT_MARGIN
+        )
+        painter.setPen(QPen(Qt.gray))
+        painter.drawRect(area)
+        if not self.curves or area.width() < 2 or area.height() < 2:
+            painter.end()
+            return
+
+        self._decimate(int(area.width()))
+        x_min = min(x[0] for x, _ in self.curves)
+        x_max = max(x[-1] for x, _ in self.curves)
+        y_min = min(float(y.min()) for _, y in self._decimated)
+        y_max = max(float(y.max()) for _, y in self._decimated)
+        x_scale = area.width() / ((x_max - x_min) or 1.0)
+        y_scale = area.height() / ((y_max - y_min) or 1.0)
+
+        if self.interval is not None:
+            left = area.left() + (max(self.interval[0], x_min) - x_min) * x_scale
+            right = area.left() + (min(self.interval[1], x_max) - x_min) * x_scale
+            if right > left:
+                painter.fillRect(
+                    QRectF(left, area.top(), right - left, area.height()),
+                    INTERVAL_COLOR,
+                )
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        for number, (x, y) in enumerate(self._decimated):
+            painter.setPen(QPen(QColor(CURVE_COLORS[number % len(CURVE_COLORS)]), 1.2))
+            painter.drawPolyline(
+                QPolygonF(
+                    [
+                        QPointF(area.left() + (point_x - x_min) * x_scale, point_y)
+                        for point_x, point_y in zip(
+                            x, area.bottom() - (y - y_min) * y_scale
+                        )
+                    ]
+                )
+            )
+        painter.end()
@@ -0,0 +1,28 @@
+"""Module starting the worker process pools of the engine
+
+Pools are created from the GUI thread and from the threads of the service, and
+forking a process while other threads run can leave locks of the child held
+forever. Workers are therefore started by a fork server, or spawned where
+there is none.
+"""
+
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+"""Start method of the worker processes"""
+
+
+def process_pool(
+    workers: int, initializer: Callable = None, initargs: tuple = ()
+) -> ProcessPoolExecutor:
+    """Pool of worker processes started without forking the calling process"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(START_METHOD),
+        initializer=initializer,
+        initargs=initargs,
+    )
@@ -0,0 +1,176 @@
+"""Module turning on the tracing of the GUI, used by the --profile flag
+
+Spans are placed around the callbacks of the main window, its helpers and
+the deformation dialog, around the stages the callbacks run, e.g. template
+rendering or file parsing, and around modal dialogs. Time spent waiting for
+the user therefore shows up as a dialog span instead of a stall. The
+application reports the Qt paint, layout and resize events it handles, and
+a timer samples how late the event loop gets to it.
+
+The main window records the time from the start of the application to the
+end of its first paint as a startup span, also without profiling. The engine
+modules the stages live in are imported lazily, so their stages are only
+instrumented after the first paint, which they would otherwise delay.
+"""
+
+import importlib
+import time
+
+from PyQt5.QtCore import QEvent, QObject, Qt, QTimer
+from PyQt5.QtWidgets import QApplication, QDialog, QFileDialog, QMessageBox
+
+from . import main_window
+from .cost_preview import CostPreview
+from .deformation_dialog import DeformationDialog
+from .geometry_tools import GeometryTools
+from .partition_tools import PartitionTools
+from .project_model import ProjectModel
+from .smoothing_preview import SmoothingPreview
+from .tracing import TRACER, instrument_class, instrument_functions, traced
+
+LATENCY_INTERVAL_MS = 20
+"""Interval of the timer sampling the event loop latency"""
+
+LATENCY_SAMPLE = "event loop latency (ms)"
+
+TRACED_EVENTS = {
+    QEvent.Paint: "Qt paint",
+    QEvent.LayoutRequest: "Qt layout",
+    QEvent.Resize: "Qt resize",
+    QEvent.Show: "Qt show",
+}
+"""Qt events whose handling is timed, by the name of their spans"""
+
+STAGES = {
+    "main_window": ("load_project", "render_project"),
+    "molecule": ("load_molecule",),
+    "spectrum": ("load_spectrum", "write_spectrum_sidecar"),
+    "script_importer": ("import_script",),
+}
+"""Functions called by the main window callbacks that are timed as stages, by
+the name of the module of the package they are looked up in"""
+
+FILE_DIALOGS = (
+    "getExistingDirectory",
+    "getOpenFileName",
+    "getOpenFileNames",
+    "getSaveFileName",
+)
+
+
+class TracingApplication(QApplication):
+    """Application timing the paint, layout and resize events it delivers
+    Init:
+    arguments: command line arguments for Qt
+    """
+
+    def __init__(self, arguments: list[str]):
+        super().__init__(arguments)
+        self.painted = False
+
+    def notify(self, receiver: QObject, event: QEvent) -> bool:
+        """Deliver an event, inside a span for the traced event types"""
+        name = TRACED_EVENTS.get(event.type())
+        if name is None:
+            return super().notify(receiver, event)
+        if not self.painted and event.type() == QEvent.Paint:
+            self.painted = True
+            QTimer.singleShot(0, self.first_paint_done)
+        with TRACER.span(name, "qt"):
+            return super().notify(receiver, event)
+
+    def first_paint_done(self):
+        """Instrument the stages once the first paint is done"""
+        if TRACER.enabled:
+            with TRACER.span("instrument stages", "startup"):
+                instrument_stages()
+
+
+class LatencyMonitor(QObject):
+    """Timer sampling how much later than due the event loop runs it
+    Init:
+    interval_ms: interval of the timer
+    parent: owner of the monitor
+    """
+
+    def __init__(self, interval_ms: int = LATENCY_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.interval = interval_ms / 1000
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.sample)
+        self._last = time.perf_counter()
+
+    def start(self):
+        """Start sampling"""
+        self._last = time.perf_counter()
+        self.timer.start()
+
+    def sample(self):
+        """Record how late the timer fired"""
+        now = time.perf_counter()
+        TRACER.sample(
+            LATENCY_SAMPLE, max(0.0, (now - self._last - self.interval) * 1e3)
+        )
+        self._last = now
+
+
+def _traced_exec(method):
+    def exec_dialog(dialog, *args):
+        with TRACER.span(f"{type(dialog).__name__}.exec", "dialog"):
+            return method(dialog, *args)
+
+    exec_dialog.__traced__ = True
+    return exec_dialog
+
+
+def instrument_stages():
+    """Wrap the stages and the classes built on demand in spans, importing
+    their modules
+    """
+    for module_name, names in STAGES.items():
+        instrument_functions(
+            importlib.import_module(f".{module_name}", __package__), names
+        )
+    instrument_class(
+        importlib.import_module(".scheduler_panel", __package__).SchedulerPanel
+    )
+    instrument_class(
+        importlib.import_module(".surrogate_panel", __package__).SurrogatePanel
+    )
+
+
+def enable_profiling() -> LatencyMonitor:
+    """Turn on tracing and place the spans, after the application is created and
+    before the main window is built
+    The stages are instrumented by TracingApplication after the first paint
+    Returns the latency monitor, which starts once the event loop runs
+    """
+    TRACER.enabled = True
+    for cls in (
+        main_window.MainWindow,
+        DeformationDialog,
+        GeometryTools,
+        SmoothingPreview,
+        CostPreview,
+        PartitionTools,
+    ):
+        instrument_class(cls)
+    instrument_functions(ProjectModel, ("validate", "output_dictionary"))
+    for name in FILE_DIALOGS:
+        method = getattr(QFileDialog, name)
+        if not getattr(method, "__traced__", False):
+            setattr(
+                QFileDialog,
+                name,
+                staticmethod(traced(method, f"QFileDialog.{name}", "dialog")),
+            )
+    for cls in (QDialog, QMessageBox):
+        for name in ("exec", "exec_"):
+            method = vars(cls).get(name)
+            if method is not None and not getattr(method, "__traced__", False):
+                setattr(cls, name, _traced_exec(method))
+    monitor = LatencyMonitor(parent=QApplication.instance())
+    QTimer.singleShot(0, monitor.start)
+    return monitor
@@ -0,0 +1,208 @@
+"""Module saving and loading the native project state of the app
+
+A project is stored as a base file holding the whole model and a journal
+next to it (the same path with `.journal` appended). The journal is an
+append-only list of JSON lines, one per change reported by the project model,
+so autosave only writes what changed since the last save. Loading reads the
+base file and replays the journal on top of it, and compaction folds the
+journal back into a fresh base file.
+
+Journal records are numbered, and the base file stores the generation, the
+number of the last record folded into it. Loading skips records that are not
+newer than the base, so a journal left behind by a crash between replacing
+the base file and deleting the journal is never replayed twice.
+
+Deformations are written column by column, which keeps both the file and
+the time needed to parse it small for projects with thousands of them.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from .datatypes import DEFORMATION_TYPES, DeformationStore
+from .project_model import ProjectModel
+
+PROJECT_SUFFIX = ".pfgui"
+FORMAT_NAME = "pyfitit-gui-project"
+FORMAT_VERSION = 1
+
+
+def journal_path(path: Path) -> Path:
+    """Return the path of the journal belonging to a project file"""
+    path = Path(path)
+    return path.with_name(path.name + ".journal")
+
+
+def project_to_dict(model: ProjectModel, generation: int = 0) -> dict:
+    """Represent the whole project model as plain JSON-compatible data
+    Arguments:
+    model: the project model
+    generation: number of the last journal record folded into the model
+    """
+    store = model.deformations
+    return {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "generation": generation,
+        "settings": dict(model.settings),
+        "deformations": {
+            "part": store.parts.tolist(),
+            "atom_1": store.atoms_1.tolist(),
+            "atom_2": store.atoms_2.tolist(),
+            "def_type": [DEFORMATION_TYPES[code] for code in store.types],
+            "name": list(store.names),
+            "range_left": store.ranges_left.tolist(),
+            "range_right": store.ranges_right.tolist(),
+        },
+    }
+
+
+def project_from_dict(data: dict) -> ProjectModel:
+    """Rebuild a project model from data written by project_to_dict"""
+    if data.get("format") != FORMAT_NAME:
+        raise ValueError("Not a PyFitIt GUI project file")
+    if data.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(
+            f"Project file version {data['version']} is newer than supported"
+        )
+    model = ProjectModel()
+    for key, value in data.get("settings", {}).items():
+        if key in model.settings:
+            model.set_setting(key, value)
+    columns = data.get("deformations", {})
+    store = DeformationStore()
+    store.parts.extend(columns.get("part", []))
+    store.atoms_1.extend(columns.get("atom_1", []))
+    store.atoms_2.extend(columns.get("atom_2", []))
+    store.types.extend(
+        DEFORMATION_TYPES.index(kind) for kind in columns.get("def_type", [])
+    )
+    store.names.extend(columns.get("name", []))
+    store.ranges_left.extend(columns.get("range_left", []))
+    store.ranges_right.extend(columns.get("range_right", []))
+    if len({len(getattr(store, name)) for name in store.__slots__}) > 1:
+        raise ValueError("Deformation columns of the project file differ in length")
+    errors = model.load_deformation_store(store)
+    if errors:
+        raise ValueError("\n".join(errors))
+    return model
+
+
+def stored_generation(path: Path) -> int:
+    """Newest generation written at a project path, by its base file or journal
+    Returns 0 when there is no readable project at the path
+    """
+    path = Path(path)
+    generation = 0
+    try:
+        with path.open(encoding="utf-8") as project_file:
+            generation = json.load(project_file).get("generation", 0)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        with journal_path(path).open(encoding="utf-8") as journal_file:
+            for line in journal_file:
+                generation = max(generation, json.loads(line).get("generation", 0))
+    except (OSError, ValueError, AttributeError):
+        pass
+    return generation
+
+
+def save_project(model: ProjectModel, path: Path, generation: int = None):
+    """Write the full project atomically and discard its now folded-in journal
+    Arguments:
+    model: the project model
+    path: path of the project file
+    generation: number of the last journal record folded into the model, by
+    default one above anything written at the path before
+    Returns the generation of the written base file
+    """
+    path = Path(path)
+    if generation is None:
+        generation = stored_generation(path) + 1
+    temporary_path = path.with_name(path.name + ".tmp")
+    with temporary_path.open("w", encoding="utf-8") as project_file:
+        json.dump(
+            project_to_dict(model, generation), project_file, separators=(",", ":")
+        )
+        project_file.flush()
+        os.fsync(project_file.fileno())
+    os.replace(temporary_path, path)
+    journal_path(path).unlink(missing_ok=True)
+    return generation
+
+
+def load_project(path: Path) -> ProjectModel:
+    """Read a project file and replay its journal, if there is one
+    Records not newer than the base file are skipped, and a truncated last
+    journal line, left behind by a crash, is ignored
+    """
+    path = Path(path)
+    with path.open(encoding="utf-8") as project_file:
+        data = json.load(project_file)
+    model = project_from_dict(data)
+    base_generation = data["generation"]
+    journal = journal_path(path)
+    if journal.exists():
+        with journal.open(encoding="utf-8") as journal_file:
+            for line in journal_file:
+                try:
+                    change = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if change.pop("generation") > base_generation:
+                    model.apply_change(change)
+    return model
+
+
+class ProjectJournal:
+    """Append-only change log following a project model
+    The current state of the model is written as the base file when the
+    journal is created, so the journal only ever holds changes made after that.
+    Init:
+    model: the project model whose changes are recorded
+    path: path of the project file the journal belongs to
+    compact_after: number of recorded changes after which compaction is due
+    """
+
+    def __init__(self, model: ProjectModel, path: Path, compact_after: int = 500):
+        self.model = model
+        self.path = Path(path)
+        self.compact_after = compact_after
+        self.entries = 0
+        self.generation = save_project(model, self.path)
+        # pylint: disable=consider-using-with
+        self._file = journal_path(self.path).open("a", encoding="utf-8")
+        model.listeners.append(self.record)
+
+    def record(self, change: dict):
+        """Append a single change and make sure it reached the disk"""
+        self.generation += 1
+        self._file.write(
+            json.dumps({"generation": self.generation, **change}, separators=(",", ":"))
+            + "\n"
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries += 1
+
+    @property
+    def compaction_due(self) -> bool:
+        """Whether the journal grew long enough to be folded into the base file"""
+        return self.entries >= self.compact_after
+
+    def compact(self):
+        """Fold the journal into a fresh base file and start an empty journal"""
+        self._file.close()
+        save_project(self.model, self.path, self.generation)
+        # pylint: disable=consider-using-with
+        self._file = journal_path(self.path).open("a", encoding="utf-8")
+        self.entries = 0
+
+    def close(self):
+        """Compact the journal and stop following the model"""
+        if self.record in self.model.listeners:
+            self.model.listeners.remove(self.record)
+        self.compact()
+        self._file.close()
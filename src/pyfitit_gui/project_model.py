@@ -0,0 +1,373 @@
+"""Module holding the GUI-independent state of a project and its validation
+
+The model keeps the deformations together with a name to index dictionary,
+so checking a single edit costs the same regardless of how many deformations
+a project has. Deformations are only accepted into the model once they pass
+these checks, therefore validating the whole project never has to rescan them.
+"""
+
+import os
+from collections.abc import Callable
+from dataclasses import asdict
+
+from .datatypes import DEFORMATION_TYPES, Deformation, DeformationStore
+from .lazy import lazy_import
+from .rendering import (
+    SIDECAR_SPECTRUM_LOADER,
+    SPECTRUM_LOADER,
+    expand_compiled_deformations,
+    expand_deformations,
+    expand_geometry_param_ranges,
+    expand_parts,
+    find_empty_fields,
+)
+
+deformation_engine = lazy_import(".deformation_engine", __package__)
+energy_grid = lazy_import(".energy_grid", __package__)
+molecule = lazy_import(".molecule", __package__)
+
+PROJECT_FIELDS = (
+    "project_name",
+    "project_folder",
+    "molecule_file",
+    "spectrum_file",
+    "parts",
+    "left_interval",
+    "right_interval",
+    "energy_range",
+    "Green",
+    "Radius",
+    "GH",
+    "Ecent",
+    "Elarg",
+    "Gmax",
+    "Efermi",
+    "shift",
+    "norm",
+)
+"""Project template placeholders that are set directly by the user"""
+
+NUMERIC_FIELDS = (
+    "left_interval",
+    "right_interval",
+    "Radius",
+    "GH",
+    "Ecent",
+    "Elarg",
+    "Gmax",
+    "Efermi",
+    "shift",
+    "norm",
+)
+
+
+class ProjectModel:
+    """Class holding project settings and deformations independently of any widgets
+
+    Every change is reported as a small dictionary to the callables in
+    `listeners`, which is how the autosave journal follows the project.
+    `atom_count` and `part_count` describe the loaded molecule; when set,
+    deformations are also checked against them.
+    """
+
+    def __init__(self):
+        self.settings = {key: "" for key in PROJECT_FIELDS}
+        self.settings["Green"] = False
+        self.deformations = DeformationStore()
+        self._name_index: dict[str, int] = {}
+        self.listeners: list[Callable[[dict], None]] = []
+        self.atom_count: int = None
+        self.part_count: int = None
+
+    @classmethod
+    def from_spec(cls, spec: dict):
+        """Build a model from a dictionary keyed like the project template
+        Deformations that fail the checks are skipped, the others are kept
+        Returns the model and a list of problems found while loading it
+        """
+        model = cls()
+        errors = [f"missing field '{key}'" for key in PROJECT_FIELDS if key not in spec]
+        for key in PROJECT_FIELDS:
+            if key in spec:
+                model.set_setting(key, spec[key])
+        deformations = []
+        names = set()
+        for raw_deformation in spec.get("deformations") or []:
+            try:
+                deformation = Deformation.from_text(**raw_deformation)
+            except (TypeError, ValueError) as error:
+                errors.append(f"malformed deformation {raw_deformation} ({error})")
+                continue
+            problems = model.check_deformation(deformation)
+            if deformation.name in names:
+                problems.append(
+                    f"Deformation name '{deformation.name}' must be unique!"
+                )
+            if problems:
+                errors.extend(
+                    f"skipped deformation '{deformation.name}': {problem}"
+                    for problem in problems
+                )
+                continue
+            names.add(deformation.name)
+            deformations.append(deformation)
+        model.add_deformations(deformations)
+        return model, errors
+
+    def set_setting(self, key: str, value):
+        """Store a single project setting"""
+        if key not in self.settings:
+            raise KeyError(f"Unknown project setting '{key}'")
+        if key == "Green":
+            if isinstance(value, str):
+                value = value.strip().lower() in ("true", "1", "yes")
+            value = bool(value)
+        else:
+            value = str(value).strip()
+        if self.settings[key] != value:
+            self.settings[key] = value
+            self._notify({"op": "set", "key": key, "value": value})
+
+    def __len__(self):
+        return len(self.deformations)
+
+    def index_of(self, name: str) -> int:
+        """Return the position of the deformation with the given name or -1"""
+        return self._name_index.get(name, -1)
+
+    def check_deformation(self, deformation: Deformation, idx: int = None) -> list[str]:
+        """Return every reason a deformation cannot be stored in the model
+        Arguments:
+        deformation: the deformation to check
+        idx: position of the deformation it is going to replace, if any
+        """
+        errors = []
+        if not deformation.name:
+            errors.append("Deformation name must not be empty!")
+        elif self._name_index.get(deformation.name, idx) != idx:
+            errors.append(f"Deformation name '{deformation.name}' must be unique!")
+        if deformation.def_type not in DEFORMATION_TYPES:
+            errors.append(f"Unknown deformation type '{deformation.def_type}'!")
+        if min(deformation.part, deformation.atom_1, deformation.atom_2) < 0:
+            errors.append("Part and axis atom indices must not be negative!")
+        if deformation.atom_1 == deformation.atom_2:
+            errors.append("Axis atoms must be two different atoms!")
+        if self.atom_count is not None and (
+            max(deformation.atom_1, deformation.atom_2) >= self.atom_count
+        ):
+            errors.append(
+                f"Axis atom indices must be smaller than the atom count "
+                f"of the molecule ({self.atom_count})!"
+            )
+        if self.part_count is not None and deformation.part >= self.part_count:
+            errors.append(
+                f"Part index must be smaller than the number "
+                f"of molecule parts ({self.part_count})!"
+            )
+        if deformation.range_left > deformation.range_right:
+            errors.append(
+                "Left-hand-side value of deformation range "
+                "must be smaller than the right-hand-side value!"
+            )
+        return errors
+
+    def add_deformation(self, deformation: Deformation):
+        """Append an already checked deformation"""
+        self.add_deformations((deformation,))
+
+    def replace_deformation(self, idx: int, deformation: Deformation):
+        """Replace the deformation at a given position with an already checked one"""
+        del self._name_index[self.deformations[idx].name]
+        self._name_index[deformation.name] = idx
+        self.deformations[idx] = deformation
+        self._notify({"op": "replace", "row": idx, "deformation": asdict(deformation)})
+
+    def check_new_deformations(self, deformations: list[Deformation]) -> list[str]:
+        """Return every reason a group of deformations cannot be appended together"""
+        errors = []
+        new_names = set()
+        for deformation in deformations:
+            errors.extend(self.check_deformation(deformation))
+            if deformation.name in new_names:
+                errors.append(f"Deformation name '{deformation.name}' must be unique!")
+            new_names.add(deformation.name)
+        return errors
+
+    def add_deformations(self, deformations: list[Deformation]):
+        """Append many already checked deformations at once"""
+        first_row = len(self.deformations)
+        self._name_index.update(
+            (deformation.name, first_row + offset)
+            for offset, deformation in enumerate(deformations)
+        )
+        self.deformations.extend(deformations)
+        if self.listeners:
+            self._notify(
+                {
+                    "op": "add",
+                    "deformations": [
+                        asdict(deformation) for deformation in deformations
+                    ],
+                }
+            )
+
+    def load_deformation_store(self, store: DeformationStore) -> list[str]:
+        """Replace all deformations with a whole store, e.g. one read from a file
+        The columns are checked in bulk; if any problem is found it is
+        returned and the model is left unchanged
+        """
+        errors = []
+        names = store.names
+        if len(set(names)) != len(names):
+            errors.append("Deformation names must be unique!")
+        if not all(names):
+            errors.append("Deformation name must not be empty!")
+        if min(store.parts + store.atoms_1 + store.atoms_2, default=0) < 0:
+            errors.append("Part and axis atom indices must not be negative!")
+        if max(store.types, default=0) >= len(DEFORMATION_TYPES):
+            errors.append("Unknown deformation type!")
+        if any(map(int.__eq__, store.atoms_1, store.atoms_2)):
+            errors.append("Axis atoms must be two different atoms!")
+        if any(map(float.__gt__, store.ranges_left, store.ranges_right)):
+            errors.append(
+                "Left-hand-side value of deformation range "
+                "must be smaller than the right-hand-side value!"
+            )
+        if not errors:
+            self.deformations = store
+            self._name_index = {name: row for row, name in enumerate(names)}
+        return errors
+
+    def remove_deformation(self, idx: int):
+        """Remove the deformation at a given position"""
+        self.remove_deformations((idx,))
+
+    def remove_deformations(self, rows):
+        """Remove the deformations at the given positions in a single pass"""
+        rows = set(rows)
+        if not rows:
+            return
+        names = self.deformations.names
+        for row in rows:
+            del self._name_index[names[row]]
+        self.deformations.remove_rows(rows)
+        first_row = min(rows, default=len(self.deformations))
+        names = self.deformations.names
+        for position in range(first_row, len(names)):
+            self._name_index[names[position]] = position
+        self._notify({"op": "remove", "rows": sorted(rows)})
+
+    def apply_change(self, change: dict):
+        """Repeat a change previously reported to the listeners, e.g. from a journal"""
+        if change["op"] == "set":
+            self.set_setting(change["key"], change["value"])
+        elif change["op"] == "add":
+            self.add_deformations(
+                [Deformation(**deformation) for deformation in change["deformations"]]
+            )
+        elif change["op"] == "replace":
+            self.replace_deformation(
+                change["row"], Deformation(**change["deformation"])
+            )
+        elif change["op"] == "remove":
+            self.remove_deformations(change["rows"])
+        else:
+            raise ValueError(f"Unknown project change '{change['op']}'")
+
+    def _notify(self, change: dict):
+        for listener in self.listeners:
+            listener(change)
+
+    def validate(self) -> list[str]:
+        """Check the whole project and return every error found at once"""
+        errors = []
+        empty_fields = find_empty_fields(self.settings)
+        if empty_fields:
+            errors.append(
+                "Cannot generate project as there are empty fields: "
+                + ", ".join(empty_fields)
+            )
+        numbers = {}
+        for key in NUMERIC_FIELDS:
+            if self.settings[key] == "":
+                continue
+            try:
+                numbers[key] = float(self.settings[key].replace(",", "."))
+            except ValueError:
+                errors.append(f"Field '{key}' must be a number!")
+        if (
+            "left_interval" in numbers
+            and "right_interval" in numbers
+            and numbers["left_interval"] > numbers["right_interval"]
+        ):
+            errors.append("Start of energy interval is larger than the end!")
+        if self.settings["energy_range"]:
+            try:
+                energy_grid.parse_energy_range(self.settings["energy_range"])
+            except ValueError as error:
+                errors.append(str(error))
+        if not self.deformations:
+            errors.append("No deformations defined, unable to generate project!")
+        store = self.deformations
+        if self.atom_count is not None and (
+            max(store.atoms_1 + store.atoms_2, default=-1) >= self.atom_count
+        ):
+            errors.append(
+                f"Some deformations use atoms beyond the atom count "
+                f"of the molecule ({self.atom_count})!"
+            )
+        if self.part_count is not None and (
+            max(store.parts, default=-1) >= self.part_count
+        ):
+            errors.append(
+                f"Some deformations use parts beyond the number "
+                f"of molecule parts ({self.part_count})!"
+            )
+        return errors
+
+    def output_dictionary(
+        self, compiled: bool = False, spectrum_sidecar: bool = False
+    ) -> dict:
+        """Return the dictionary substituted into the project template
+        Arguments:
+        compiled: whether to compose the deformations of every part into one
+        transform, needs a partition into contiguous parts
+        spectrum_sidecar: whether the project prefers the binary sidecar of
+        the spectrum file, see spectrum.write_spectrum_sidecar
+        """
+        output_dictionary = {
+            key: str(value) for key, value in self.settings.items() if key != "Green"
+        }
+        output_dictionary["Green"] = "True" if self.settings["Green"] else "False"
+        output_dictionary["parts"] = expand_parts(self.settings["parts"])
+        if compiled:
+            try:
+                parts = deformation_engine.part_slices(
+                    molecule.parse_partition(self.settings["parts"])
+                )
+            except ValueError:
+                parts = None
+            output_dictionary["deformations"] = expand_compiled_deformations(
+                self.deformations, parts
+            )
+        else:
+            output_dictionary["deformations"] = expand_deformations(self.deformations)
+        output_dictionary["geometry_param_ranges"] = expand_geometry_param_ranges(
+            self.deformations
+        )
+        output_dictionary["spectrum_loader"] = (
+            SIDECAR_SPECTRUM_LOADER if spectrum_sidecar else SPECTRUM_LOADER
+        )
+        return output_dictionary
+
+    def molecule_path(self) -> str:
+        """Path of the molecule file as the generated project reads it"""
+        return os.path.join(
+            self.settings["project_folder"], self.settings["molecule_file"]
+        )
+
+    def spectrum_path(self) -> str:
+        """Path of the spectrum file as the generated project reads it"""
+        return os.path.join(
+            self.settings["project_folder"], self.settings["spectrum_file"]
+        )
@@ -0,0 +1,224 @@
+"""Module translating deformations and project settings into a PyFitIt project file.
+
+This module does not depend on PyQt5, so it can be used both by the GUI
+and by the headless batch generator.
+
+Deformations are emitted either as one pyFitIt call per deformation or in a
+compiled form. The compiled moleculeConstructor composes every deformation of
+a part into one 4x4 affine transform. The axis of each step is taken from the
+axis atoms moved by the transforms composed so far, which gives the same
+geometry as the sequential calls. Every moved part is then transformed once
+with a single matrix product.
+
+The spectrum is either parsed from the text file on every run or read from
+its binary sidecar, see the spectrum module, while that is still fresh."""
+
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+
+from .datatypes import Deformation
+
+PROJECT_TEMPLATE_PATH = Path(__file__).parent / "templates" / "project.template"
+
+EMPTY_FIELD_VALUES = (
+    "",
+    "No directory chosen!",
+    "No spectrum file chosen!",
+    "No molecule file chosen!",
+)
+"""Values treated as an unfilled field when generating a project"""
+
+
+@lru_cache(maxsize=1)
+def project_template() -> Template:
+    """Read the project template once and keep it for subsequent renders"""
+    with PROJECT_TEMPLATE_PATH.open(encoding="utf-8") as template_file:
+        return Template(template_file.read())
+
+
+def expand_parts(partition: str) -> str:
+    """Translate the molecule partition input into the arguments of setParts
+    pyFitIt reads every argument of setParts as one part, and a comma inside
+    an argument joins ranges into the same part. Every comma separated part
+    of the input is therefore passed as its own string argument.
+    """
+    return ", ".join(
+        f"'{part.strip()}'" for part in partition.split(",") if part.strip()
+    )
+
+
+def expand_deformations(deformations: Iterable[Deformation]) -> str:
+    """Function that translates a list of deformations into a string
+    representation that would be encountered in a PyFitIt project file"""
+    # pylint: disable=line-too-long
+    deform_string_list = []
+    for deformation in deformations:
+        if deformation.def_type == "shift":
+            deform_string_list.append(f'    deformation = "{deformation.name}"\n')
+            deform_string_list.append(
+                f"    axis = normalize(m.atom[{deformation.atom_1}]-m.atom[{deformation.atom_2}])\n"
+            )
+            deform_string_list.append(
+                f"    m.part[{deformation.part}].shift(axis*params[deformation])\n\n"
+            )
+        elif deformation.def_type == "rotation":
+            deform_string_list.append(f'    deformation = "{deformation.name}"\n')
+            deform_string_list.append(
+                f"    axis = normalize(m.atom[{deformation.atom_1}]-m.atom[{deformation.atom_2}])\n"
+            )
+            deform_string_list.append(
+                f"    m.part[{deformation.part}].rotate(axis, m.atom[{deformation.atom_1}], params[deformation])\n\n"
+            )
+    return "".join(deform_string_list)
+
+
+# pylint: disable=line-too-long
+COMPILED_CONSTRUCTOR = """\
+    # Deformations composed into one affine transform per part
+    import numpy as np
+
+    transforms = np.tile(np.eye(4), ($transform_count, 1, 1))
+    for $step_fields in (
+$steps
+    ):
+        center = transforms[part_1, :3, :3] @ m.atom[atom_1] + transforms[part_1, :3, 3]
+        axis = normalize(center - transforms[part_2, :3, :3] @ m.atom[atom_2] - transforms[part_2, :3, 3])
+        step = np.eye(4)
+        if rotation:
+            angle = params[deformation]
+            cross = np.array(((0, -axis[2], axis[1]), (axis[2], 0, -axis[0]), (-axis[1], axis[0], 0)))
+            step[:3, :3] = np.cos(angle) * np.eye(3) + np.sin(angle) * cross + (1 - np.cos(angle)) * np.outer(axis, axis)
+            step[:3, 3] = center - step[:3, :3] @ center
+        else:
+            step[:3, 3] = axis * params[deformation]
+        transforms[part] = step @ transforms[part]
+    for part, start, stop in ($moved_parts):
+        m.atom[start:stop] = m.atom[start:stop] @ transforms[part, :3, :3].T + transforms[part, :3, 3]
+
+"""
+"""Deformation block of the compiled moleculeConstructor, rotation angles in radians"""
+
+COMPILED_STEP_FIELDS = (
+    "deformation",
+    "part",
+    "atom_1",
+    "part_1",
+    "atom_2",
+    "part_2",
+    "rotation",
+)
+"""Loop variables of the compiled block, one tuple of them per deformation"""
+
+
+def _overlapping(parts: list[slice]) -> bool:
+    ordered = sorted(parts, key=lambda part: part.start)
+    return any(second.start < first.stop for first, second in zip(ordered, ordered[1:]))
+
+
+def _owner(parts: list[slice], atom: int) -> int:
+    return next(
+        (number for number, part in enumerate(parts) if part.start <= atom < part.stop),
+        len(parts),
+    )
+
+
+def expand_compiled_deformations(
+    deformations: Iterable[Deformation], parts: list[slice]
+) -> str:
+    """Translate deformations into the compiled moleculeConstructor block
+    Falls back to the sequential form of expand_deformations when the parts
+    overlap or a deformation uses a part that is not defined
+    Arguments:
+    deformations: the deformations in the order they are applied
+    parts: atom slices of the molecule parts
+    """
+    deformations = list(deformations)
+    if (
+        not deformations
+        or parts is None
+        or _overlapping(parts)
+        or max(deformation.part for deformation in deformations) >= len(parts)
+    ):
+        return expand_deformations(deformations)
+    steps = "".join(
+        f'        ("{deformation.name}", {deformation.part},'
+        f" {deformation.atom_1}, {_owner(parts, deformation.atom_1)},"
+        f" {deformation.atom_2}, {_owner(parts, deformation.atom_2)},"
+        f' {deformation.def_type == "rotation"}),\n'
+        for deformation in deformations
+    )
+    moved_parts = "".join(
+        f"({number}, {parts[number].start}, {parts[number].stop}), "
+        for number in sorted({deformation.part for deformation in deformations})
+    )
+    return Template(COMPILED_CONSTRUCTOR).substitute(
+        transform_count=len(parts) + 1,
+        step_fields=", ".join(COMPILED_STEP_FIELDS),
+        steps=steps[:-1],
+        moved_parts=moved_parts[:-1],
+    )
+
+
+SPECTRUM_LOADER = """\
+    project.spectrum = readSpectrum(file_path, energyColumn = 0, intensityColumn = 1, skiprows = 1)"""
+"""Spectrum loading of the generated projectConstructor"""
+
+SIDECAR_SPECTRUM_LOADER = (
+    """\
+    import hashlib, json, os
+    import numpy as np
+
+    def sidecar_is_fresh():
+        try:
+            with open(file_path + '.npy.json') as meta:
+                fingerprint = json.load(meta)
+            if not os.path.exists(file_path + '.npy'):
+                return False
+            if (fingerprint['size'], fingerprint['mtime_ns']) == (os.stat(file_path).st_size, os.stat(file_path).st_mtime_ns):
+                return True
+            with open(file_path, 'rb') as source:
+                return fingerprint['blake2b'] == hashlib.blake2b(source.read(), digest_size=16).hexdigest()
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    if not sidecar_is_fresh():
+"""
+    + SPECTRUM_LOADER.replace("    ", "        ", 1)
+    + """
+    else:
+        spectrum = np.load(file_path + '.npy', mmap_mode='r')
+        project.spectrum = Spectrum(spectrum[0], spectrum[1])"""
+)
+"""Spectrum loading preferring the memory-mapped sidecar of the spectrum file"""
+# pylint: enable=line-too-long
+
+
+def expand_geometry_param_ranges(deformations: Iterable[Deformation]) -> str:
+    """Function that translates the deformations object into
+    a list of deformation names and their respective ranges"""
+    geometry_string = "".join(
+        f" '{deformation.name}': [{deformation.range_left}, {deformation.range_right}],\n"
+        for deformation in deformations
+    )
+    if geometry_string.endswith("\n"):
+        geometry_string = geometry_string[:-1]
+    return geometry_string
+
+
+def find_empty_fields(output_dictionary: dict) -> list[str]:
+    """Return the keys of the output dictionary that hold no usable value"""
+    return [
+        key
+        for key, value in output_dictionary.items()
+        if str(value) in EMPTY_FIELD_VALUES
+    ]
+
+
+def render_project(output_dictionary: dict) -> str:
+    """Substitute the output dictionary into the project template
+    Arguments:
+    output_dictionary: mapping of every template placeholder to its value
+    """
+    return project_template().substitute(output_dictionary)
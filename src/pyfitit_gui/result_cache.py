@@ -0,0 +1,217 @@
+"""Module caching FDMNES results by the content of the calculation
+
+A result is stored under a hash of the rounded atomic coordinates, the atomic
+numbers and the FDMNES calculation settings. Projects that share a molecule
+and settings therefore reuse every geometry they have in common, whatever
+their deformation lists or fit intervals. The deck writer records the key
+of every input folder. It restores cached results right away, and the
+scheduler stores new results and restores any that appeared in the meantime.
+Every geometry is counted once, as a hit when the deck writer restores it and
+otherwise as a hit or a miss when the scheduler looks it up before running it.
+Restored files are copies, so a calculation writing to its folder cannot
+change the cache.
+
+Entries are directories of output files indexed by a SQLite database, which
+also keeps the hit and miss counts. Once the cache exceeds its size limit,
+the least recently used entries are removed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+CACHE_DECIMALS = 4
+"""Decimal places of the coordinates, in Angstrom, that make up a cache key"""
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "pyfitit_gui" / "results"
+DEFAULT_CACHE_BYTES = 10 * 2**30
+CACHE_KEY_FILE = "cache_key"
+CACHED_MARKER = "cached_result"
+"""File marking an input folder whose results were restored from the cache"""
+
+_INDEX_NAME = "index.sqlite"
+
+
+def calculation_settings(settings: dict, absorber: int = 1) -> dict:
+    """Extract the project settings that change the result of an FDMNES run"""
+    return {
+        "energy_range": " ".join(str(settings["energy_range"]).split()),
+        "radius": float(settings["Radius"]),
+        "green": settings["Green"] in (True, "True"),
+        "absorber": int(absorber),
+    }
+
+
+def cache_key(numbers: list[int], coordinates: np.ndarray, calculation: dict) -> str:
+    """Canonical hash of a geometry and the settings of its calculation
+    Arguments:
+    numbers: atomic numbers of the atoms
+    coordinates: (atom, xyz) coordinates
+    calculation: settings returned by calculation_settings
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(calculation, sort_keys=True).encode())
+    digest.update(np.asarray(numbers, dtype="<i4").tobytes())
+    digest.update(
+        np.rint(np.asarray(coordinates) * 10**CACHE_DECIMALS).astype("<i8").tobytes()
+    )
+    return digest.hexdigest()
+
+
+def read_cache_key(folder: str) -> str:
+    """Return the cache key recorded in an input folder, None if there is none"""
+    try:
+        with open(os.path.join(folder, CACHE_KEY_FILE), encoding="ascii") as key_file:
+            return key_file.read().strip() or None
+    except OSError:
+        return None
+
+
+class ResultCache:
+    """Size-bounded store of calculation results shared between projects
+    Init:
+    directory: where entries and their index are kept
+    max_bytes: total size above which least recently used entries are removed
+    """
+
+    def __init__(self, directory: Path = DEFAULT_CACHE_DIR, max_bytes: int = None):
+        self.directory = Path(directory)
+        self.max_bytes = DEFAULT_CACHE_BYTES if max_bytes is None else max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.directory / _INDEX_NAME,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries"
+            " (key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._connection.execute(
+            "INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0)"
+        )
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def restore(self, key: str, folder: str, count_miss: bool = True) -> bool:
+        """Copy the cached results of a key into a folder
+        An index row whose entry directory is gone is removed and is a miss
+        Arguments:
+        key: cache key of the geometry
+        folder: input folder receiving the results
+        count_miss: whether not finding the key counts as a miss
+        Returns whether there were any, counting a hit or a miss
+        """
+        with self._lock:
+            found = self._connection.execute(
+                "SELECT 1 FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            entry = self._entry_path(key)
+            if found and not entry.is_dir():
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                found = None
+            if found:
+                for source in entry.iterdir():
+                    shutil.copy2(source, os.path.join(folder, source.name))
+                self._connection.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+                self._count("hits")
+            elif count_miss:
+                self._count("misses")
+            return bool(found)
+
+    def store(self, key: str, folder: str, exclude: set[str]):
+        """Cache the files of a folder, except the excluded names, under a key"""
+        entry = self._entry_path(key)
+        temporary = entry.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}")
+        temporary.mkdir(parents=True, exist_ok=True)
+        size = 0
+        with os.scandir(folder) as files:
+            for source in files:
+                if source.is_file() and source.name not in exclude:
+                    shutil.copy2(source.path, temporary / source.name)
+                    size += source.stat().st_size
+        with self._lock:
+            if entry.exists():
+                shutil.rmtree(temporary)
+            else:
+                os.replace(temporary, entry)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            self._evict()
+
+    def stats(self) -> dict[str, int]:
+        """Entry count, total size and the hits and misses counted so far"""
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            counts = dict(
+                self._connection.execute("SELECT name, value FROM stats").fetchall()
+            )
+        return {"entries": entries, "bytes": size, **counts}
+
+    def clear(self):
+        """Remove every entry and reset the statistics"""
+        with self._lock:
+            for (key,) in self._connection.execute(
+                "SELECT key FROM entries"
+            ).fetchall():
+                shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("UPDATE stats SET value = 0")
+
+    def close(self):
+        """Close the index"""
+        with self._lock:
+            self._connection.close()
+
+    def _count(self, name: str):
+        self._connection.execute(
+            "UPDATE stats SET value = value + 1 WHERE name = ?", (name,)
+        )
+
+    def _evict(self):
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_path(key), ignore_errors=True)
+            self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+
+
+def describe_stats(stats: dict[str, int]) -> str:
+    """One line summary of the statistics of a cache"""
+    lookups = stats["hits"] + stats["misses"]
+    rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+    return (
+        f"{stats['entries']} cached results, {stats['bytes'] / 2**20:.1f} MB,"
+        f" {stats['hits']} hits, {stats['misses']} misses, hit rate {rate}"
+    )
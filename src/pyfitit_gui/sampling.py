@@ -0,0 +1,315 @@
+"""Module sampling the deformation ranges and writing the deformed geometries
+
+Training geometries of the inverse method are points of the hypercube
+spanned by the geometryParamRanges of a project. Points come from a Latin
+hypercube, a Sobol sequence or a regular grid. They are produced lazily in
+blocks whose deformed geometries take about SAMPLE_BLOCK_BYTES, so memory
+use grows with neither the number of samples nor the size of the molecule;
+only the Latin hypercube keeps one stratum index per sample and dimension.
+Worker processes, started as in the processes module, deform the molecule
+for each block, and the parent writes the finished blocks in order. Output
+is either a multi-frame .xyz file or a binary .npy stack of shape (sample,
+atom, 3), written next to a .npy file holding the parameter values.
+
+Sobol sequences need SciPy, which is imported only when they are used.
+"""
+
+import argparse
+import os
+import struct
+import sys
+import time
+import warnings
+from collections import deque
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+from .datatypes import Deformation
+from .deformation_engine import deform, part_slices
+from .molecule import MoleculeData, load_molecule, parse_partition
+from .processes import process_pool
+
+SAMPLING_METHODS = ("lhs", "sobol", "grid")
+SAMPLE_FORMATS = (".xyz", ".npy")
+SAMPLE_BLOCK = 1024
+"""Largest number of samples generated and deformed at once"""
+
+SAMPLE_BLOCK_BYTES = 32 * 2**20
+"""Approximate size of the float64 geometries a worker deforms at once"""
+
+NPY_HEADER_BYTES = 128
+
+
+def _latin_hypercube(count: int, dimensions: int, seed: int, block: int):
+    # Every dimension visits the count strata in its own random order
+    rng = np.random.default_rng(seed)
+    strata = np.empty(
+        (count, dimensions), dtype=np.int32 if count < 2**31 else np.int64
+    )
+    for dimension in range(dimensions):
+        order = np.arange(count, dtype=strata.dtype)
+        rng.shuffle(order)
+        strata[:, dimension] = order
+    for start in range(0, count, block):
+        stop = min(start + block, count)
+        yield (strata[start:stop] + rng.random((stop - start, dimensions))) / count
+
+
+def _sobol(count: int, dimensions: int, seed: int, block: int):
+    try:
+        # pylint: disable=import-outside-toplevel
+        from scipy.stats import qmc
+    except ImportError as error:
+        raise ImportError("Sobol sampling requires SciPy to be installed!") from error
+    try:
+        engine = qmc.Sobol(dimensions, rng=np.random.default_rng(seed))
+    except TypeError:
+        engine = qmc.Sobol(dimensions, seed=seed)
+
+    def blocks():
+        with warnings.catch_warnings():
+            # Blocks are not powers of two, which only affects the balance of
+            # the last, incomplete block of the sequence
+            warnings.simplefilter("ignore", UserWarning)
+            for start in range(0, count, block):
+                yield engine.random(min(block, count - start))
+
+    return blocks()
+
+
+def _grid(count: int, dimensions: int, _seed: int, block: int):
+    per_axis = _grid_points_per_axis(count, dimensions)
+    count = sample_count(count, "grid", dimensions)
+    for start in range(0, count, block):
+        index = np.arange(start, min(start + block, count))
+        yield np.stack(np.unravel_index(index, (per_axis,) * dimensions), axis=1) / (
+            per_axis - 1
+        )
+
+
+def _grid_points_per_axis(count: int, dimensions: int) -> int:
+    per_axis = max(2, round(count ** (1 / dimensions)))
+    while per_axis > 2 and per_axis**dimensions > count:
+        per_axis -= 1
+    return per_axis
+
+
+def sample_count(count: int, method: str, dimensions: int) -> int:
+    """Number of samples a method actually generates when asked for count
+    A grid is never larger than requested unless even two points per axis are
+    more, in which case the two-point grid, i.e. the edge points, is used
+    """
+    if method == "grid":
+        per_axis = _grid_points_per_axis(count, dimensions)
+        return per_axis**dimensions if per_axis > 2 else min(count, 2**dimensions)
+    return count
+
+
+_UNIT_SAMPLERS: dict[str, Callable] = {
+    "lhs": _latin_hypercube,
+    "sobol": _sobol,
+    "grid": _grid,
+}
+
+
+def sample_params(
+    deformations: list[Deformation],
+    count: int,
+    method: str = "lhs",
+    seed: int = 0,
+    block: int = SAMPLE_BLOCK,
+) -> Iterator[np.ndarray]:
+    """Generate parameter values within the deformation ranges block by block
+    Arguments:
+    deformations: the deformations, one dimension each
+    count: number of samples, a grid uses the largest full grid not above it
+    method: one of SAMPLING_METHODS
+    seed: seed of the random generator
+    block: number of samples per yielded (sample, deformation) array
+    """
+    if method not in _UNIT_SAMPLERS:
+        raise ValueError(
+            f"Unknown sampling method '{method}', use one of {SAMPLING_METHODS}!"
+        )
+    if not deformations:
+        raise ValueError("No deformations defined!")
+    left = np.array([deformation.range_left for deformation in deformations])
+    right = np.array([deformation.range_right for deformation in deformations])
+    units = _UNIT_SAMPLERS[method](count, len(deformations), seed, block)
+    return (left + unit * (right - left) for unit in units)
+
+
+_worker_state = {}
+
+
+def _init_worker(molecule, parts, deformations, output_format):
+    _worker_state.update(
+        molecule=molecule,
+        parts=parts,
+        deformations=deformations,
+        output_format=output_format,
+        xyz_template="".join(
+            f"{element} {{:.6f}} {{:.6f}} {{:.6f}}\n" for element in molecule.elements
+        ),
+    )
+
+
+def _deform_block(params: np.ndarray):
+    state = _worker_state
+    geometries = deform(
+        state["molecule"].coordinates, state["parts"], state["deformations"], params
+    )
+    if state["output_format"] == ".npy":
+        return params, geometries.astype(np.float32).tobytes()
+    header = f"{geometries.shape[1]}\n"
+    names = [deformation.name for deformation in state["deformations"]]
+    frames = []
+    for values, geometry in zip(params, geometries):
+        comment = " ".join(f"{name}={value:.6g}" for name, value in zip(names, values))
+        frames.append(
+            header + comment + "\n" + state["xyz_template"].format(*geometry.ravel())
+        )
+    return params, "".join(frames).encode("utf-8")
+
+
+def npy_header(shape: tuple, dtype: str) -> bytes:
+    """Header of a .npy file with the data starting at NPY_HEADER_BYTES
+    A fixed-size header can be rewritten in place once the final count is known
+    """
+    text = repr({"descr": dtype, "fortran_order": False, "shape": shape})
+    text = text.ljust(NPY_HEADER_BYTES - 11) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+def params_path(path: Path) -> Path:
+    """Return the path of the .npy file holding the parameters of a sample file"""
+    path = Path(path)
+    return path.with_name(path.stem + ".params.npy")
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def write_samples(
+    molecule: MoleculeData,
+    parts: list[slice],
+    deformations: list[Deformation],
+    path: Path,
+    count: int,
+    method: str = "lhs",
+    seed: int = 0,
+    workers: int = None,
+    progress: Callable[[int], bool] = None,
+) -> int:
+    """Deform the molecule for sampled parameters and stream the geometries to disk
+    Arguments:
+    molecule: the undeformed molecule
+    parts: atom slices of the molecule parts
+    deformations: the deformations in the order they are applied
+    path: output .xyz or .npy file, the parameters go to params_path(path)
+    count, method, seed: passed to sample_params
+    workers: number of worker processes, all cores by default
+    progress: called with the number of written samples, returning False stops
+    Returns the number of written samples
+    """
+    path = Path(path)
+    output_format = path.suffix.lower()
+    if output_format not in SAMPLE_FORMATS:
+        raise ValueError(f"Samples can only be written as {SAMPLE_FORMATS} files!")
+    deformations = list(deformations)
+    geometry_bytes = max(molecule.coordinates.nbytes, 1)
+    block = max(1, min(SAMPLE_BLOCK, SAMPLE_BLOCK_BYTES // geometry_bytes))
+    blocks = sample_params(deformations, count, method, seed, block)
+    count = sample_count(count, method, len(deformations))
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with process_pool(
+        workers, _init_worker, (molecule, parts, deformations, output_format)
+    ) as executor, path.open("wb", buffering=2**22) as output, params_path(path).open(
+        "wb"
+    ) as params_output:
+        geometry_shape = (count, molecule.atom_count, 3)
+        if output_format == ".npy":
+            output.write(npy_header(geometry_shape, "<f4"))
+        params_output.write(npy_header((count, len(deformations)), "<f8"))
+        # Only a few blocks are in flight at any time, so memory stays flat
+        pending = deque()
+        for params in blocks:
+            pending.append(executor.submit(_deform_block, params))
+            if len(pending) < 2 * workers:
+                continue
+            written += _write_block(pending.popleft(), output, params_output)
+            if progress is not None and progress(written) is False:
+                executor.shutdown(cancel_futures=True)
+                break
+        else:
+            while pending:
+                written += _write_block(pending.popleft(), output, params_output)
+                if progress is not None:
+                    progress(written)
+        if written < count:
+            if output_format == ".npy":
+                output.seek(0)
+                output.write(npy_header((written,) + geometry_shape[1:], "<f4"))
+            params_output.seek(0)
+            params_output.write(npy_header((written, len(deformations)), "<f8"))
+    return written
+
+
+def _write_block(future, output, params_output) -> int:
+    params, data = future.result()
+    output.write(data)
+    params_output.write(params.astype("<f8").tobytes())
+    return len(params)
+
+
+def project_molecule(model) -> MoleculeData:
+    """Load the molecule of a project, relative paths start at the project folder"""
+    return load_molecule(model.molecule_path())
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-sample command"""
+    # pylint: disable=import-outside-toplevel
+    from .project_io import load_project
+
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-sample",
+        description="Write deformed geometries sampled within the deformation ranges",
+    )
+    parser.add_argument("project", type=Path, help="project saved by the app")
+    parser.add_argument("output", type=Path, help="output .xyz or .npy file")
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("-m", "--method", choices=SAMPLING_METHODS, default="lhs")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        model = load_project(args.project)
+        molecule = project_molecule(model)
+        parts = part_slices(parse_partition(model.settings["parts"]))
+        start = time.perf_counter()
+        written = write_samples(
+            molecule,
+            parts,
+            list(model.deformations),
+            args.output,
+            args.count,
+            args.method,
+            args.seed,
+            args.workers,
+        )
+    except (OSError, ValueError, ImportError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"Wrote {written} geometries in {elapsed:.2f} s"
+        f" ({written / elapsed:.0f} geometries/s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,406 @@
+"""Module running an executable, e.g. FDMNES, over a directory of input folders
+
+Jobs are kept in a SQLite queue inside the deck directory, so an interrupted
+run resumes with the folders that did not finish. Every job runs the
+configured command in its folder, with the output going to a log file there.
+At most one job per slot runs at a time, with one slot per core by default.
+On Linux every slot can be pinned to its own core, which keeps long FDMNES
+runs from migrating between cores.
+
+Failed jobs and jobs exceeding the timeout are retried a given number of
+times before they are marked as failed. With a result cache, folders whose
+calculation was already done are filled from it instead of being run, and
+new results are added to it. This module never imports PyQt5.
+"""
+
+import argparse
+import os
+import shlex
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from .result_cache import (
+    CACHED_MARKER,
+    DEFAULT_CACHE_DIR,
+    ResultCache,
+    describe_stats,
+    read_cache_key,
+)
+
+QUEUE_FILE_NAME = ".pyfitit_jobs.sqlite"
+JOB_LOG_NAME = "job.log"
+JOB_STATES = ("pending", "running", "done", "failed")
+CACHED_MESSAGE = "cached"
+"""Message of jobs whose results were restored from the result cache"""
+
+
+@dataclass(frozen=True)
+class JobResult:
+    """Outcome of a single attempt at running a job"""
+
+    folder: str
+    state: str
+    attempt: int
+    elapsed: float
+    returncode: int
+    message: str = ""
+
+
+class JobQueue:
+    """Persistent queue of job folders backed by a SQLite database
+    Init:
+    path: database file, created if missing
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                folder TEXT PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                elapsed REAL,
+                returncode INTEGER,
+                message TEXT NOT NULL DEFAULT ''
+            )""")
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)"
+        )
+
+    def add_folders(self, folders: list[str]) -> int:
+        """Queue folders that are not queued yet, returns how many were added"""
+        with self._lock:
+            before = self._count()
+            # A single transaction instead of one per inserted folder
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO jobs (folder) VALUES (?)",
+                ((str(folder),) for folder in folders),
+            )
+            self._connection.execute("COMMIT")
+            return self._count() - before
+
+    def recover(self, retry_failed: bool = False):
+        """Requeue jobs left running by an interrupted run, and optionally failed ones"""
+        states = ("running", "failed") if retry_failed else ("running",)
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0"
+                f" WHERE state IN ({', '.join('?' * len(states))})",
+                states,
+            )
+
+    def claim(self) -> tuple[str, int]:
+        """Mark the next pending job as running
+        Returns its folder and attempt number, or None if no job is pending
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT folder, attempts FROM jobs WHERE state = 'pending' LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1"
+                " WHERE folder = ?",
+                (row[0],),
+            )
+            return row[0], row[1] + 1
+
+    def finish(self, result: JobResult, state: str):
+        """Store the outcome of an attempt, state being pending to retry it"""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET state = ?, elapsed = ?, returncode = ?, message = ?"
+                " WHERE folder = ?",
+                (
+                    state,
+                    result.elapsed,
+                    result.returncode,
+                    result.message,
+                    result.folder,
+                ),
+            )
+
+    def release(self, folder: str):
+        """Return a job interrupted on purpose to the queue without counting the attempt"""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET state = 'pending', attempts = attempts - 1"
+                " WHERE folder = ?",
+                (folder,),
+            )
+
+    def counts(self) -> dict[str, int]:
+        """Number of jobs in every state"""
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATES, 0)
+            counts.update(
+                self._connection.execute(
+                    "SELECT state, COUNT(*) FROM jobs GROUP BY state"
+                ).fetchall()
+            )
+            return counts
+
+    def timings(self) -> list[tuple[str, float]]:
+        """Folders and run times of the finished jobs that were actually run"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT folder, elapsed FROM jobs"
+                f" WHERE state = 'done' AND message != '{CACHED_MESSAGE}'"
+            ).fetchall()
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
+
+    def _count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def deck_folders(deck_dir: Path, input_name: str = "fdmfile.txt") -> list[str]:
+    """Return the sorted subfolders of a directory that hold an input file"""
+    with os.scandir(deck_dir) as entries:
+        return sorted(
+            entry.path
+            for entry in entries
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, input_name))
+        )
+
+
+# pylint: disable=too-many-instance-attributes
+class Scheduler:
+    """Runs the queued jobs with a bounded number of concurrent processes
+    Init:
+    queue: the job queue
+    command: executable and arguments, run inside every job folder
+    workers: number of concurrent jobs, one per core by default
+    timeout: seconds after which a job is killed, None for no limit
+    retries: number of extra attempts for failing jobs
+    pin_cores: whether to pin every concurrent job to its own core
+    cache: result cache restoring finished calculations and storing new ones
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        queue: JobQueue,
+        command: list[str],
+        workers: int = None,
+        timeout: float = None,
+        retries: int = 1,
+        pin_cores: bool = False,
+        cache: ResultCache = None,
+    ):
+        self.queue = queue
+        self.command = list(command)
+        self.cores = sorted(
+            os.sched_getaffinity(0)
+            if hasattr(os, "sched_getaffinity")
+            else range(os.cpu_count() or 1)
+        )
+        self.workers = workers or len(self.cores)
+        self.timeout = timeout
+        self.retries = retries
+        self.pin_cores = pin_cores and hasattr(os, "sched_setaffinity")
+        self.cache = cache
+        self.stop_event = threading.Event()
+        self._processes: dict[int, subprocess.Popen] = {}
+        self._processes_lock = threading.Lock()
+
+    def stop(self):
+        """Stop claiming jobs and kill the running ones, which stay queued"""
+        self.stop_event.set()
+        with self._processes_lock:
+            for process in self._processes.values():
+                process.kill()
+
+    def run(self, callback: Callable[[JobResult], None] = None) -> dict[str, int]:
+        """Run queued jobs until none is pending or stop() is called
+        Arguments:
+        callback: called from a worker thread after every attempt
+        Returns the number of jobs in every state afterwards
+        """
+        self.stop_event.clear()
+        self.queue.recover()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    executor.submit(self._slot, slot, callback)
+                    for slot in range(self.workers)
+                ]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    self.stop()
+                    raise
+        finally:
+            self.queue.recover()
+        return self.queue.counts()
+
+    def _slot(self, slot: int, callback):
+        while not self.stop_event.is_set():
+            claimed = self.queue.claim()
+            if claimed is None:
+                return
+            result = self._run_job(slot, *claimed)
+            if self.stop_event.is_set():
+                self.queue.release(result.folder)
+                return
+            if result.state == "done":
+                state = "done"
+            else:
+                state = "pending" if result.attempt <= self.retries else "failed"
+            self.queue.finish(result, state)
+            if callback is not None:
+                callback(result)
+
+    def _run_job(self, slot: int, folder: str, attempt: int) -> JobResult:
+        start = time.perf_counter()
+        key = read_cache_key(folder) if self.cache is not None else None
+        if os.path.exists(os.path.join(folder, CACHED_MARKER)) or (
+            key is not None and self._restore(key, folder)
+        ):
+            return JobResult(
+                folder,
+                "done",
+                attempt,
+                time.perf_counter() - start,
+                0,
+                CACHED_MESSAGE,
+            )
+        inputs = set(os.listdir(folder)) | {JOB_LOG_NAME}
+        result = self._run_process(slot, folder, attempt, start)
+        if key is not None and result.state == "done":
+            self.cache.store(key, folder, exclude=inputs)
+        return result
+
+    def _restore(self, key: str, folder: str) -> bool:
+        if not self.cache.restore(key, folder):
+            return False
+        with open(os.path.join(folder, CACHED_MARKER), "wb"):
+            pass
+        return True
+
+    def _run_process(
+        self, slot: int, folder: str, attempt: int, start: float
+    ) -> JobResult:
+        with open(os.path.join(folder, JOB_LOG_NAME), "ab") as log:
+            try:
+                process = subprocess.Popen(  # pylint: disable=consider-using-with
+                    self.command, cwd=folder, stdout=log, stderr=subprocess.STDOUT
+                )
+            except OSError as error:
+                return JobResult(folder, "failed", attempt, 0.0, -1, str(error))
+            with self._processes_lock:
+                self._processes[slot] = process
+            if self.pin_cores:
+                try:
+                    os.sched_setaffinity(
+                        process.pid, {self.cores[slot % len(self.cores)]}
+                    )
+                except OSError:
+                    pass
+            message = ""
+            try:
+                returncode = process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                returncode = process.wait()
+                message = f"killed after {self.timeout} s"
+            with self._processes_lock:
+                del self._processes[slot]
+        elapsed = time.perf_counter() - start
+        if returncode != 0 and not message:
+            message = f"exited with code {returncode}"
+        return JobResult(
+            folder,
+            "done" if not message else "failed",
+            attempt,
+            elapsed,
+            returncode,
+            message,
+        )
+
+
+def open_queue(deck_dir: Path) -> JobQueue:
+    """Open the queue of a deck directory and add folders not queued yet"""
+    queue = JobQueue(Path(deck_dir) / QUEUE_FILE_NAME)
+    queue.add_folders(deck_folders(deck_dir))
+    return queue
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-run command"""
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-run",
+        description="Run FDMNES, or another command, in every input folder",
+    )
+    parser.add_argument("deck_dir", type=Path, help="directory of input folders")
+    parser.add_argument(
+        "-c", "--command", default="fdmnes", help="command run in each folder"
+    )
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-t", "--timeout", type=float, default=None)
+    parser.add_argument("-r", "--retries", type=int, default=1)
+    parser.add_argument(
+        "--pin-cores", action="store_true", help="pin every job to its own core"
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="requeue failed jobs first"
+    )
+    parser.add_argument(
+        "--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="result cache"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="neither reuse nor cache results"
+    )
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args.deck_dir)
+    queue.recover(retry_failed=args.retry_failed)
+    scheduler = Scheduler(
+        queue,
+        shlex.split(args.command),
+        args.workers,
+        args.timeout,
+        args.retries,
+        args.pin_cores,
+        None if args.no_cache else ResultCache(args.cache_dir),
+    )
+
+    def report(result: JobResult):
+        print(
+            f"{result.state:6} {result.elapsed:8.2f} s  {result.folder}"
+            + (f"  ({result.message})" if result.message else ""),
+            flush=True,
+        )
+
+    try:
+        counts = scheduler.run(report)
+    except KeyboardInterrupt:
+        scheduler.stop()
+        counts = queue.counts()
+    queue.close()
+    print(", ".join(f"{count} {state}" for state, count in counts.items()))
+    if scheduler.cache is not None:
+        print(describe_stats(scheduler.cache.stats()))
+        scheduler.cache.close()
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
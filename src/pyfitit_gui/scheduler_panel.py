@@ -0,0 +1,273 @@
+"""Module with the window running FDMNES jobs and showing their progress
+
+The scheduler runs in a QThread. Every finished attempt is sent to the window
+through a queued signal, so the event loop keeps running while jobs do.
+"""
+
+import os
+import shlex
+
+from PyQt5.QtCore import QObject, Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QCheckBox,
+    QDoubleSpinBox,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QProgressBar,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from .result_cache import DEFAULT_CACHE_DIR, ResultCache, describe_stats
+from .scheduler import JobResult, Scheduler, open_queue
+
+JOB_TABLE_ROWS = 500
+"""Number of most recent attempts listed in the job table"""
+
+
+class SchedulerWorker(QObject):
+    """Runs a scheduler in the thread the object is moved to"""
+
+    job_finished = pyqtSignal(object)
+    run_finished = pyqtSignal(dict)
+    run_failed = pyqtSignal(str)
+
+    def __init__(self, scheduler: Scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def run(self):
+        """Run all queued jobs, reporting every attempt and the end of the run"""
+        try:
+            try:
+                counts = self.scheduler.run(self.job_finished.emit)
+            finally:
+                self.scheduler.queue.close()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # the thread is only quit by one of the two signals
+            self.run_failed.emit(str(error) or repr(error))
+            return
+        self.run_finished.emit(counts)
+
+
+# pylint: disable=too-many-instance-attributes
+class SchedulerPanel(QWidget):
+    """Window choosing a directory of input folders and running a command in each"""
+
+    def __init__(self, deck_dir: str = "", parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Run FDMNES")
+        self.thread = None
+        self.worker = None
+        self.counts = {}
+        self.cache = None
+        self.jobs_run = 0
+        self.total_elapsed = 0.0
+
+        layout = QVBoxLayout()
+        layout.addLayout(self._create_settings_form(deck_dir))
+
+        buttons = QHBoxLayout()
+        self.start_button = QPushButton("Start")
+        self.start_button.clicked.connect(self.start)
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        buttons.addWidget(self.start_button)
+        buttons.addWidget(self.stop_button)
+        layout.addLayout(buttons)
+
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        self.status_label = QLabel("Idle")
+        layout.addWidget(self.status_label)
+        cache_row = QHBoxLayout()
+        self.cache_label = QLabel()
+        clear_cache_button = QPushButton("Clear cache")
+        clear_cache_button.clicked.connect(self.clear_cache)
+        cache_row.addWidget(self.cache_label, 1)
+        cache_row.addWidget(clear_cache_button)
+        layout.addLayout(cache_row)
+        self.job_table = QTableWidget(0, 4)
+        self.job_table.setHorizontalHeaderLabels(["Folder", "State", "Attempt", "Time"])
+        self.job_table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.job_table)
+        self.setLayout(layout)
+        self.resize(640, 480)
+        self.update_cache_label()
+
+    def _create_settings_form(self, deck_dir: str) -> QFormLayout:
+        form = QFormLayout()
+        directory_row = QHBoxLayout()
+        self.deck_dir_label = QLabel(deck_dir or "No directory chosen!")
+        choose_button = QPushButton("Choose")
+        choose_button.clicked.connect(self.choose_deck_dir)
+        directory_row.addWidget(self.deck_dir_label, 1)
+        directory_row.addWidget(choose_button)
+        form.addRow("Input folders", directory_row)
+        self.command_input = QLineEdit("fdmnes")
+        self.command_input.setToolTip(
+            "<font>Command run inside every input folder.</font>"
+        )
+        form.addRow("Command", self.command_input)
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(1, 4096)
+        self.workers_input.setValue(os.cpu_count() or 1)
+        form.addRow("Concurrent jobs", self.workers_input)
+        self.timeout_input = QDoubleSpinBox()
+        self.timeout_input.setRange(0, 10**7)
+        self.timeout_input.setSuffix(" s")
+        self.timeout_input.setToolTip("<font>0 means no time limit.</font>")
+        form.addRow("Timeout", self.timeout_input)
+        self.retries_input = QSpinBox()
+        self.retries_input.setRange(0, 100)
+        self.retries_input.setValue(1)
+        form.addRow("Retries", self.retries_input)
+        self.pin_cores_input = QCheckBox()
+        self.pin_cores_input.setEnabled(hasattr(os, "sched_setaffinity"))
+        form.addRow("Pin jobs to cores", self.pin_cores_input)
+        self.use_cache_input = QCheckBox()
+        self.use_cache_input.setChecked(True)
+        self.use_cache_input.setToolTip(
+            f"<font>Reuse results of identical calculations kept in {DEFAULT_CACHE_DIR}"
+            " and add new ones.</font>"
+        )
+        form.addRow("Use result cache", self.use_cache_input)
+        return form
+
+    def choose_deck_dir(self):
+        """Callback choosing the directory holding the input folders"""
+        dirname = QFileDialog.getExistingDirectory(
+            self, "Choose the directory of input folders", "."
+        )
+        if dirname:
+            self.deck_dir_label.setText(dirname)
+
+    def start(self):
+        """Queue the input folders and start running them in a background thread"""
+        deck_dir = self.deck_dir_label.text()
+        command = shlex.split(self.command_input.text())
+        if not os.path.isdir(deck_dir) or not command:
+            self.status_label.setText("Choose a directory and a command first!")
+            return
+        queue = open_queue(deck_dir)
+        queue.recover(retry_failed=True)
+        self.counts = queue.counts()
+        self.jobs_run = 0
+        self.total_elapsed = 0.0
+        scheduler = Scheduler(
+            queue,
+            command,
+            self.workers_input.value(),
+            self.timeout_input.value() or None,
+            self.retries_input.value(),
+            self.pin_cores_input.isChecked(),
+            self.result_cache() if self.use_cache_input.isChecked() else None,
+        )
+        self.thread = QThread(self)
+        self.worker = SchedulerWorker(scheduler)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.job_finished.connect(self.job_finished)
+        self.worker.run_finished.connect(self.run_finished)
+        self.worker.run_finished.connect(self.thread.quit)
+        self.worker.run_failed.connect(self.run_failed)
+        self.worker.run_failed.connect(self.thread.quit)
+        self.progress_bar.setRange(0, sum(self.counts.values()))
+        self.progress_bar.setValue(self.counts["done"])
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.status_label.setText(f"Running {self.counts['pending']} jobs...")
+        self.thread.start()
+
+    def result_cache(self) -> ResultCache:
+        """Open the shared result cache on first use"""
+        if self.cache is None:
+            self.cache = ResultCache(DEFAULT_CACHE_DIR)
+        return self.cache
+
+    def update_cache_label(self):
+        """Show the size and hit rate of the result cache"""
+        try:
+            self.cache_label.setText(describe_stats(self.result_cache().stats()))
+        except OSError as error:
+            self.cache_label.setText(f"Result cache unavailable: {error}")
+
+    def clear_cache(self):
+        """Callback removing every cached result"""
+        self.result_cache().clear()
+        self.update_cache_label()
+
+    def stop(self):
+        """Stop the run, unfinished jobs stay queued for the next start"""
+        if self.worker is not None:
+            self.worker.scheduler.stop()
+            self.status_label.setText("Stopping...")
+
+    def job_finished(self, result: JobResult):
+        """Show a finished attempt and update the progress"""
+        if self.job_table.rowCount() >= JOB_TABLE_ROWS:
+            self.job_table.removeRow(JOB_TABLE_ROWS - 1)
+        self.job_table.insertRow(0)
+        for column, value in enumerate(
+            (
+                os.path.basename(result.folder),
+                result.message or result.state,
+                str(result.attempt),
+                f"{result.elapsed:.2f} s",
+            )
+        ):
+            self.job_table.setItem(0, column, QTableWidgetItem(value))
+        if result.state == "done":
+            self.counts["done"] += 1
+            self.counts["pending"] -= 1
+            self.jobs_run += 1
+            self.total_elapsed += result.elapsed
+            self.progress_bar.setValue(self.counts["done"])
+            remaining = self.counts["pending"]
+            mean = self.total_elapsed / self.jobs_run
+            self.status_label.setText(
+                f"{self.counts['done']} done, {remaining} left, {mean:.2f} s per job,"
+                f" about {mean * remaining / self.worker.scheduler.workers:.0f} s"
+                " remaining"
+            )
+        if self.worker.scheduler.cache is not None:
+            self.update_cache_label()
+
+    def run_finished(self, counts: dict):
+        """Show the final state of the queue"""
+        self.counts = counts
+        self.progress_bar.setValue(counts["done"])
+        self._run_ended(
+            ", ".join(f"{count} {state}" for state, count in counts.items())
+        )
+
+    def run_failed(self, message: str):
+        """Show the error that ended the run, unfinished jobs stay queued"""
+        self._run_ended(f"The run failed: {message}")
+
+    def _run_ended(self, status: str):
+        self.status_label.setText(status)
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.worker = None
+        self.update_cache_label()
+
+    # pylint: disable=invalid-name
+    def closeEvent(self, event):
+        """Stop running jobs before the window closes"""
+        self.stop()
+        if self.thread is not None:
+            self.thread.quit()
+            self.thread.wait()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        event.accept()
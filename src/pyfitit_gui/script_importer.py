@@ -0,0 +1,473 @@
+"""Module importing existing PyFitIt project scripts into the app
+
+Scripts are read with the `ast` module only, so neither pyfitit is imported
+nor any code of the script is run. The importer understands scripts shaped
+like the project template: deformations written as
+`m.part[i].shift(axis*params[...])` or `m.part[i].rotate(axis, center, params[...])`
+with `axis = normalize(m.atom[a]-m.atom[b])`, or the step table of the
+compiled moleculeConstructor, plus the `geometryParamRanges`, `intervals`,
+`FDMNES_calc` and `FDMNES_smooth` dictionaries of the project. Deformations
+inside any other loop cannot be read and are reported as warnings.
+
+Whole directories are imported in parallel with a process pool, see
+`import_directory` and the pyfitit-gui-import command.
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .project_io import PROJECT_SUFFIX, save_project
+from .project_model import ProjectModel
+from .rendering import COMPILED_STEP_FIELDS
+
+FDMNES_CALC_KEYS = {
+    "Energy range": "energy_range",
+    "Green": "Green",
+    "radius": "Radius",
+}
+FDMNES_SMOOTH_KEYS = {
+    "Gamma_hole": "GH",
+    "Ecent": "Ecent",
+    "Elarg": "Elarg",
+    "Gamma_max": "Gmax",
+    "Efermi": "Efermi",
+    "shift": "shift",
+    "norm": "norm",
+}
+"""Keys of the FDMNES dictionaries of a project and the settings they map to"""
+
+INTERVAL_KEYS = ("fit_geometry", "fit_norm", "fit_smooth", "plot")
+"""Interval names checked in order when looking for the project energy interval"""
+
+
+class _Unresolved(Exception):
+    """Raised when an expression cannot be evaluated without running the script"""
+
+
+class _JoinedPath(str):
+    """Path built by a join() call of the script, keeping the joined arguments"""
+
+    def __new__(cls, parts: list[str]):
+        path = super().__new__(cls, os.path.join(*parts))
+        path.parts = parts
+        return path
+
+
+def _folder_and_file(path: str) -> tuple[str, str]:
+    """Project folder and file of a path, as join(folder, file) of the template
+    writes them, with the file kept unchanged, e.g. absolute; other paths are split
+    """
+    if isinstance(path, _JoinedPath) and len(path.parts) == 2:
+        return path.parts[0], path.parts[1]
+    return os.path.split(str(path))
+
+
+def _evaluate(node: ast.AST, env: dict):
+    """Evaluate a literal expression, resolving names assigned earlier in the script"""
+    result = None
+    if isinstance(node, ast.Constant):
+        result = node.value
+    elif isinstance(node, ast.Name) and node.id in env:
+        result = env[node.id]
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand, env)
+        result = -value if isinstance(node.op, ast.USub) else value
+    elif isinstance(node, (ast.List, ast.Tuple)):
+        result = [_evaluate(element, env) for element in node.elts]
+    elif isinstance(node, ast.Dict):
+        result = {
+            _evaluate(key, env): _evaluate(value, env)
+            for key, value in zip(node.keys, node.values)
+        }
+    elif (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "join"
+    ):
+        result = _JoinedPath([str(_evaluate(arg, env)) for arg in node.args])
+    else:
+        raise _Unresolved(ast.dump(node))
+    return result
+
+
+def _atom_index(node: ast.AST, env: dict):
+    """Return i for an `m.atom[i]` expression"""
+    if (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Attribute)
+        and node.value.attr == "atom"
+    ):
+        return int(_evaluate(node.slice, env))
+    raise _Unresolved(ast.dump(node))
+
+
+def _axis_atoms(node: ast.AST, env: dict, axes: dict):
+    """Return the atom pair of `normalize(m.atom[a]-m.atom[b])` or of a name bound to it"""
+    if isinstance(node, ast.Name) and node.id in axes:
+        return axes[node.id]
+    is_normalize = (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "normalize"
+        and len(node.args) == 1
+    )
+    if (
+        is_normalize
+        and isinstance(node.args[0], ast.BinOp)
+        and isinstance(node.args[0].op, ast.Sub)
+    ):
+        return (
+            _atom_index(node.args[0].left, env),
+            _atom_index(node.args[0].right, env),
+        )
+    raise _Unresolved(ast.dump(node))
+
+
+def _deformation_name(node: ast.AST, env: dict) -> str:
+    """Return the name used in a `params[...]` expression"""
+    if (
+        isinstance(node, ast.Subscript)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "params"
+    ):
+        return str(_evaluate(node.slice, env))
+    raise _Unresolved(ast.dump(node))
+
+
+def _part_call(node: ast.AST, env: dict):
+    """Split an `m.part[i].method(...)` call into the part index, method and call"""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Subscript)
+        and isinstance(node.func.value.value, ast.Attribute)
+        and node.func.value.value.attr == "part"
+    ):
+        return int(_evaluate(node.func.value.slice, env)), node.func.attr
+    return None, None
+
+
+def _method_call(node: ast.AST, attribute: str):
+    """Return the call node if node is a call of `<anything>.attribute(...)`"""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == attribute
+    ):
+        return node
+    return None
+
+
+def _part_range(text: str) -> str:
+    """Return the single index range of one setParts argument
+    pyFitIt joins every comma separated range of an argument into one part,
+    while a part of the partition input is one range, so the ranges of an
+    argument have to follow each other
+    Raises ValueError if they leave a gap
+    """
+    ranges = []
+    for item in text.split(","):
+        first, _, last = item.strip().partition("-")
+        ranges.append((int(first), int(last or first)))
+    ranges.sort()
+    for (_, last), (first, _) in zip(ranges, ranges[1:]):
+        if first != last + 1:
+            raise ValueError(
+                f"part '{text}' is not one contiguous range of atoms,"
+                " which the partition input cannot hold"
+            )
+    first, last = ranges[0][0], ranges[-1][1]
+    return f"{first}-{last}" if last > first else str(first)
+
+
+class _ScriptVisitor:
+    """Walks the statements of a project script collecting its settings"""
+
+    def __init__(self):
+        self.env = {}
+        self.axes = {}
+        self.spec = {"deformations": []}
+        self.ranges = {}
+        self.warnings = []
+
+    def visit_body(self, body: list[ast.stmt]):
+        """Visit statements in order, descending into function bodies"""
+        for statement in body:
+            try:
+                self.visit_statement(statement)
+            except (_Unresolved, ValueError, TypeError) as error:
+                self.warnings.append(
+                    f"line {statement.lineno}: skipped unsupported statement ({error})"
+                )
+
+    def visit_statement(self, statement: ast.stmt):
+        """Dispatch a single statement"""
+        if isinstance(statement, ast.FunctionDef):
+            self.visit_arguments(statement.args)
+            self.visit_body(statement.body)
+        elif isinstance(statement, ast.If):
+            self.visit_body(statement.body)
+        elif isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                self.visit_assignment(target, statement.value)
+        elif isinstance(statement, ast.Expr):
+            self.visit_call(statement.value)
+        elif isinstance(statement, ast.For):
+            self.visit_loop(statement)
+
+    def visit_arguments(self, arguments: ast.arguments):
+        """Bind literal default values of function arguments, e.g. expFile"""
+        positional = arguments.posonlyargs + arguments.args
+        for argument, default in zip(
+            positional[len(positional) - len(arguments.defaults) :], arguments.defaults
+        ):
+            try:
+                self.env[argument.arg] = _evaluate(default, self.env)
+            except _Unresolved:
+                pass
+
+    def visit_assignment(self, target: ast.expr, value: ast.expr):
+        """Record assignments to names and to project attributes"""
+        if isinstance(target, ast.Name):
+            self.visit_name_assignment(target.id, value)
+        elif isinstance(target, ast.Attribute) and (
+            isinstance(target.value, ast.Name) and target.value.id == "project"
+        ):
+            self.visit_project_attribute(target.attr, value)
+
+    def visit_name_assignment(self, name: str, value: ast.expr):
+        """Bind a name to a literal, an axis or the molecule file"""
+        if name == "m" and isinstance(value, ast.Call) and value.args:
+            folder, filename = _folder_and_file(_evaluate(value.args[0], self.env))
+            self.spec["molecule_file"] = filename
+            if folder:
+                self.spec.setdefault("project_folder", folder)
+            return
+        try:
+            self.axes[name] = _axis_atoms(value, self.env, self.axes)
+            return
+        except _Unresolved:
+            pass
+        if isinstance(value, ast.Call) and not (
+            isinstance(value.func, ast.Name) and value.func.id == "join"
+        ):
+            return
+        self.env[name] = _evaluate(value, self.env)
+
+    def visit_project_attribute(self, attribute: str, value: ast.expr):
+        """Read the settings stored as attributes of the project"""
+        if attribute == "name":
+            self.spec["project_name"] = _evaluate(value, self.env)
+        elif attribute == "spectrum" and isinstance(value, ast.Call) and value.args:
+            folder, filename = _folder_and_file(_evaluate(value.args[0], self.env))
+            self.spec["spectrum_file"] = filename
+            if folder:
+                self.spec.setdefault("project_folder", folder)
+        elif attribute == "intervals":
+            intervals = _evaluate(value, self.env)
+            for key in INTERVAL_KEYS + tuple(intervals):
+                if key in intervals:
+                    self.spec["left_interval"], self.spec["right_interval"] = intervals[
+                        key
+                    ]
+                    break
+        elif attribute == "geometryParamRanges":
+            self.ranges = _evaluate(value, self.env)
+        elif attribute in ("FDMNES_calc", "FDMNES_smooth"):
+            keys = (
+                FDMNES_CALC_KEYS if attribute == "FDMNES_calc" else FDMNES_SMOOTH_KEYS
+            )
+            for key, item in _evaluate(value, self.env).items():
+                if key in keys:
+                    self.spec[keys[key]] = item
+
+    def visit_call(self, call: ast.expr):
+        """Read setParts and the shift/rotate deformations of the molecule"""
+        set_parts = _method_call(call, "setParts")
+        if set_parts is not None:
+            self.spec["parts"] = ",".join(
+                _part_range(str(_evaluate(arg, self.env))) for arg in set_parts.args
+            )
+            return
+        part, method = _part_call(call, self.env)
+        if method == "shift" and len(call.args) == 1:
+            product = call.args[0]
+            if not isinstance(product, ast.BinOp) or not isinstance(
+                product.op, ast.Mult
+            ):
+                raise _Unresolved(ast.dump(product))
+            axis, name = product.left, product.right
+            try:
+                name = _deformation_name(name, self.env)
+            except _Unresolved:
+                axis, name = name, _deformation_name(axis, self.env)
+            self.add_deformation(part, "shift", axis, name)
+        elif method == "rotate" and len(call.args) == 3:
+            atom_1, _ = _axis_atoms(call.args[0], self.env, self.axes)
+            if _atom_index(call.args[1], self.env) != atom_1:
+                self.warnings.append(
+                    f"line {call.lineno}: rotation center differs from the first "
+                    "axis atom and was replaced by it"
+                )
+            self.add_deformation(
+                part,
+                "rotation",
+                call.args[0],
+                _deformation_name(call.args[2], self.env),
+            )
+
+    def visit_loop(self, loop: ast.For):
+        """Read the step table of the compiled moleculeConstructor"""
+        target = loop.target
+        if (
+            isinstance(target, ast.Tuple)
+            and tuple(getattr(name, "id", None) for name in target.elts)
+            == COMPILED_STEP_FIELDS
+        ):
+            for step in _evaluate(loop.iter, self.env):
+                name, part, atom_1, _, atom_2, _, rotation = step
+                self.spec["deformations"].append(
+                    {
+                        "part": part,
+                        "atom_1": atom_1,
+                        "atom_2": atom_2,
+                        "def_type": "rotation" if rotation else "shift",
+                        "name": name,
+                    }
+                )
+            return
+        for node in ast.walk(loop):
+            if _part_call(node, self.env)[1] in ("shift", "rotate"):
+                raise ValueError("deformations inside loops cannot be read")
+
+    def add_deformation(self, part: int, def_type: str, axis: ast.expr, name: str):
+        """Store a deformation found in the molecule constructor"""
+        atom_1, atom_2 = _axis_atoms(axis, self.env, self.axes)
+        self.spec["deformations"].append(
+            {
+                "part": part,
+                "atom_1": atom_1,
+                "atom_2": atom_2,
+                "def_type": def_type,
+                "name": name,
+            }
+        )
+
+    def finish(self) -> dict:
+        """Attach the parameter ranges to the deformations and return the spec"""
+        for deformation in self.spec["deformations"]:
+            try:
+                deformation["range_left"], deformation["range_right"] = self.ranges[
+                    deformation["name"]
+                ]
+            except (KeyError, TypeError, ValueError):
+                self.warnings.append(
+                    f"deformation '{deformation['name']}' has no range in "
+                    "geometryParamRanges"
+                )
+                deformation["range_left"] = deformation["range_right"] = 0
+        return self.spec
+
+
+def parse_project_script(source: str) -> tuple[dict, list[str]]:
+    """Read a project script without running it
+    Returns a spec dictionary, as accepted by ProjectModel.from_spec,
+    and a list of warnings about the parts of the script that were skipped
+    Raises SyntaxError if the source is not valid Python
+    """
+    module = ast.parse(source)
+    visitor = _ScriptVisitor()
+    # module level constants may be defined below the functions using them
+    for statement in module.body:
+        if isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    try:
+                        visitor.env[target.id] = _evaluate(statement.value, visitor.env)
+                    except _Unresolved:
+                        pass
+    visitor.visit_body(module.body)
+    return visitor.finish(), visitor.warnings
+
+
+def import_script(path: Path) -> tuple[ProjectModel, list[str]]:
+    """Read a project script into a project model
+    Returns the model and every warning or validation problem found
+    """
+    with open(path, encoding="utf-8") as script:
+        spec, warnings = parse_project_script(script.read())
+    model, errors = ProjectModel.from_spec(spec)
+    return model, warnings + errors
+
+
+def _import_worker(path: str):
+    try:
+        with open(path, encoding="utf-8") as script:
+            spec, warnings = parse_project_script(script.read())
+    except (OSError, SyntaxError, ValueError) as error:
+        return path, None, [str(error)]
+    return path, spec, warnings
+
+
+def import_directory(directory: Path, workers: int = None):
+    """Parse every project script of a directory using a process pool
+    Yields the script path, its spec dictionary (None on failure) and its warnings
+    """
+    paths = sorted(str(path) for path in Path(directory).glob("*.py"))
+    if not paths:
+        return
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_import_worker, paths, chunksize=chunksize)
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-import command"""
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-import",
+        description="Convert PyFitIt project scripts into PyFitIt GUI projects",
+    )
+    parser.add_argument("directory", type=Path, help="directory with project scripts")
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=Path,
+        help="directory for the converted projects, defaults to the input directory",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of parser processes"
+    )
+    args = parser.parse_args(argv)
+
+    args.output_dir = args.output_dir or args.directory
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    imported = failed = with_errors = 0
+    for path, spec, warnings in import_directory(args.directory, args.workers):
+        for warning in warnings:
+            print(f"{path}: {warning}", file=sys.stderr)
+        if spec is None:
+            failed += 1
+            continue
+        model, errors = ProjectModel.from_spec(spec)
+        for error in errors:
+            print(f"{path}: {error}", file=sys.stderr)
+        with_errors += bool(errors)
+        save_project(model, args.output_dir / (Path(path).stem + PROJECT_SUFFIX))
+        imported += 1
+    elapsed = time.perf_counter() - start
+    print(
+        f"Imported {imported} script(s), {with_errors} with errors, {failed} failed,"
+        f" in {elapsed:.3f} s ({imported / elapsed:.1f} scripts/s)"
+    )
+    return 1 if failed or with_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
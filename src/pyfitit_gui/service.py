@@ -0,0 +1,492 @@
+"""Module with a long-running local service answering JSON-RPC calls on a Unix socket
+
+Workflow scripts that validate or render many projects one at a time would
+otherwise pay for a fresh interpreter and for reparsing the same molecule and
+spectrum files on every call. The service keeps them parsed in memory: the
+molecule cache of the molecule module and a cache of spectra, both checked
+against the modification time and size of their files on every use.
+
+The protocol is JSON-RPC 2.0 with one JSON document per line in both
+directions. A document may be a single request or a list of requests, and a
+connection may carry any number of documents. Requests without an id are
+notifications and get no answer. Methods:
+
+    ping                                    service version, pid and uptime
+    validate(project)                       list of problems of the project
+    render(project, compiled, spectrum_sidecar, write, output_dir, overwrite)
+    load_molecule(path, coordinates)        atom count, elements, comment
+    load_spectrum(path, arrays)             point count, energy range, layout
+    sample(project, count, method, seed, geometries, output)
+    stats                                   call counts, times and cache sizes
+    clear_cache                             forget the parsed files
+    shutdown                                stop the service
+
+`project` is either a path to a project saved by the app or a dictionary
+in the spec format of the batch module. Calls are handled one at a time, so
+a long call, e.g. sampling to a file, delays the calls of other clients.
+This module never imports PyQt5.
+"""
+
+import argparse
+import getpass
+import inspect
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import asdict
+from pathlib import Path
+
+from .batch import validate_project, write_project
+from .deformation_engine import deform, part_slices
+from .molecule import MOLECULE_CACHE_SIZE, cached_molecule_count, clear_molecule_cache
+from .molecule import load_molecule as _load_molecule
+from .molecule import parse_partition
+from .project_io import load_project
+from .rendering import render_project
+from .sampling import SAMPLING_METHODS, project_molecule, sample_params, write_samples
+from .spectrum import SpectrumData
+from .spectrum import load_spectrum as _load_spectrum
+
+SPECTRUM_CACHE_SIZE = 16
+"""Number of parsed spectra kept in memory"""
+
+MAX_INLINE_GEOMETRIES = 10000
+"""Largest number of sampled geometries returned in an answer instead of a file"""
+
+PROTOCOL_VERSION = 1
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+APPLICATION_ERROR = -32000
+
+
+def default_socket_path() -> str:
+    """Socket path of the service of the current user"""
+    folder = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(folder, f"pyfitit-gui-{getpass.getuser()}.sock")
+
+
+class ServiceError(RuntimeError):
+    """Error answered by the service
+    Init:
+    code: JSON-RPC error code
+    message: description of the error
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class Service:
+    """Handlers of the service methods and the caches they share"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.spectra: OrderedDict[str, tuple[int, int, SpectrumData]] = OrderedDict()
+        self.calls: dict[str, int] = defaultdict(int)
+        self.total_time: dict[str, float] = defaultdict(float)
+        self.stop_requested = threading.Event()
+        self.methods = {
+            "ping": self.ping,
+            "validate": self.validate,
+            "render": self.render,
+            "load_molecule": self.load_molecule,
+            "load_spectrum": self.load_spectrum,
+            "sample": self.sample,
+            "stats": self.stats,
+            "clear_cache": self.clear_cache,
+            "shutdown": self.shutdown,
+        }
+        self._lock = threading.Lock()
+
+    def handle(self, request) -> dict:
+        """Answer one decoded JSON-RPC request, None for a notification"""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Request must name a method!")
+        request_id = request.get("id")
+        handler = self.methods.get(request["method"])
+        if handler is None:
+            answer = _error(
+                request_id,
+                METHOD_NOT_FOUND,
+                f"Unknown method '{request['method']}'!",
+            )
+        else:
+            answer = self._call(request_id, request["method"], handler, request)
+        return answer if "id" in request else None
+
+    def _call(self, request_id, name: str, handler, request: dict) -> dict:
+        params = request.get("params", {})
+        try:
+            if isinstance(params, list):
+                bound = inspect.signature(handler).bind(*params)
+            elif isinstance(params, dict):
+                bound = inspect.signature(handler).bind(**params)
+            else:
+                raise TypeError("params must be a list or an object")
+        except TypeError as error:
+            return _error(request_id, INVALID_PARAMS, f"{name}: {error}!")
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                result = handler(*bound.args, **bound.kwargs)
+        except TypeError as error:
+            # parameters of the wrong type, e.g. a number where a path belongs
+            return _error(request_id, INVALID_PARAMS, f"{name}: {error}!")
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            # any failure is answered, an escaping one would end the connection
+            return _error(request_id, APPLICATION_ERROR, str(error) or repr(error))
+        finally:
+            self.calls[name] += 1
+            self.total_time[name] += time.perf_counter() - start
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def project(self, project):
+        """Project model of a saved project path or of a batch spec dictionary
+        Returns the model and the problems found while building it
+        """
+        if isinstance(project, dict):
+            return validate_project(project)
+        model = load_project(Path(project))
+        return model, model.validate()
+
+    def ping(self) -> dict:
+        """Version, process and uptime of the service"""
+        return {
+            "version": PROTOCOL_VERSION,
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+        }
+
+    def validate(self, project) -> list[str]:
+        """Every problem of the project, checked against its molecule when it loads"""
+        model, errors = self.project(project)
+        try:
+            model.atom_count = project_molecule(model).atom_count
+            model.part_count = len(parse_partition(model.settings["parts"]))
+        except (OSError, ValueError) as error:
+            errors.append(str(error))
+        else:
+            errors = list(dict.fromkeys(errors + model.validate()))
+        return errors
+
+    # pylint: disable=too-many-arguments
+    def render(
+        self,
+        project,
+        compiled: bool = False,
+        spectrum_sidecar: bool = False,
+        write: bool = False,
+        output_dir: str = None,
+        overwrite: bool = False,
+    ) -> dict:
+        """Render a project, returning its text or writing it like the batch module"""
+        model, errors = self.project(project)
+        if errors:
+            raise ValueError("; ".join(errors))
+        if write:
+            target, size = write_project(
+                model, output_dir, overwrite, compiled, spectrum_sidecar
+            )
+            return {"path": str(target), "bytes": size}
+        return {
+            "text": render_project(model.output_dictionary(compiled, spectrum_sidecar))
+        }
+
+    def load_molecule(self, path: str, coordinates: bool = False) -> dict:
+        """Atoms of a molecule file, with the coordinates on request"""
+        molecule = _load_molecule(path)
+        answer = {
+            "path": molecule.path,
+            "atom_count": molecule.atom_count,
+            "elements": molecule.elements.tolist(),
+            "comment": molecule.comment,
+        }
+        if coordinates:
+            answer["coordinates"] = molecule.coordinates.tolist()
+        return answer
+
+    def spectrum(self, path: str) -> SpectrumData:
+        """Parsed spectrum file, reused while the file is unchanged"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self.spectra.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            self.spectra.move_to_end(path)
+            return cached[2]
+        spectrum = _load_spectrum(path)
+        self.spectra[path] = (stat.st_mtime_ns, stat.st_size, spectrum)
+        self.spectra.move_to_end(path)
+        while len(self.spectra) > SPECTRUM_CACHE_SIZE:
+            self.spectra.popitem(last=False)
+        return spectrum
+
+    def load_spectrum(self, path: str, arrays: bool = False) -> dict:
+        """Size, energy range and layout of a spectrum file, with the data on request"""
+        spectrum = self.spectrum(path)
+        answer = {
+            "path": spectrum.path,
+            "points": len(spectrum.energy),
+            "energy_range": (
+                [float(spectrum.energy[0]), float(spectrum.energy[-1])]
+                if len(spectrum.energy)
+                else None
+            ),
+            "layout": asdict(spectrum.layout),
+        }
+        if arrays:
+            answer["energy"] = spectrum.energy.tolist()
+            answer["intensity"] = spectrum.intensity.tolist()
+        return answer
+
+    # pylint: disable=too-many-arguments
+    def sample(
+        self,
+        project,
+        count: int = 100,
+        method: str = "lhs",
+        seed: int = 0,
+        geometries: bool = False,
+        output: str = None,
+    ) -> dict:
+        """Sample the deformation ranges of a project
+        Returns the parameter values and, on request, the deformed geometries.
+        With an output path the geometries are written like pyfitit-gui-sample
+        does and only their number is returned
+        """
+        if method not in SAMPLING_METHODS:
+            raise ValueError(
+                f"Unknown sampling method '{method}', use one of {SAMPLING_METHODS}!"
+            )
+        model, _ = self.project(project)
+        deformations = list(model.deformations)
+        names = [deformation.name for deformation in deformations]
+        if output is not None:
+            molecule = project_molecule(model)
+            parts = part_slices(parse_partition(model.settings["parts"]))
+            written = write_samples(
+                molecule, parts, deformations, output, count, method, seed
+            )
+            return {"names": names, "written": written}
+        answer = {
+            "names": names,
+            "params": [
+                row
+                for block in sample_params(deformations, count, method, seed)
+                for row in block.tolist()
+            ],
+        }
+        if geometries:
+            if len(answer["params"]) > MAX_INLINE_GEOMETRIES:
+                raise ValueError(
+                    f"At most {MAX_INLINE_GEOMETRIES} geometries are returned inline,"
+                    " write more to an output file!"
+                )
+            molecule = project_molecule(model)
+            parts = part_slices(parse_partition(model.settings["parts"]))
+            answer["geometries"] = deform(
+                molecule.coordinates, parts, deformations, answer["params"]
+            ).tolist()
+        return answer
+
+    def stats(self) -> dict:
+        """Calls and time spent per method and the sizes of the caches"""
+        return {
+            "uptime": time.time() - self.started,
+            "calls": dict(self.calls),
+            "total_ms": {name: 1e3 * total for name, total in self.total_time.items()},
+            "cached_molecules": cached_molecule_count(),
+            "molecule_cache_size": MOLECULE_CACHE_SIZE,
+            "cached_spectra": len(self.spectra),
+            "spectrum_cache_size": SPECTRUM_CACHE_SIZE,
+        }
+
+    def clear_cache(self) -> dict:
+        """Forget all parsed molecules and spectra"""
+        clear_molecule_cache()
+        self.spectra.clear()
+        return {}
+
+    def shutdown(self) -> dict:
+        """Stop the service once the answer is sent"""
+        self.stop_requested.set()
+        return {}
+
+
+def _error(request_id, code: int, message: str) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def answer_line(service: Service, line: bytes) -> bytes:
+    """Answer one line of the protocol, None when nothing is to be sent back"""
+    try:
+        document = json.loads(line)
+    except (UnicodeDecodeError, json.JSONDecodeError) as error:
+        answer = _error(None, PARSE_ERROR, f"Invalid JSON: {error}!")
+    else:
+        if isinstance(document, list):
+            answers = [service.handle(request) for request in document]
+            answer = [answer for answer in answers if answer is not None] or None
+            if not document:
+                answer = _error(None, INVALID_REQUEST, "Empty batch!")
+        else:
+            answer = service.handle(document)
+    if answer is None:
+        return None
+    return json.dumps(answer, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            answer = answer_line(self.server.service, line)
+            if answer is not None:
+                self.wfile.write(answer)
+                self.wfile.flush()
+            if self.server.service.stop_requested.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class ServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server answering every connection in its own thread
+    Init:
+    path: path of the socket, a stale socket left by a crash is replaced
+    service: the service answering the calls, a new one by default
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str, service: Service = None):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not available on this system!")
+        self.service = service or Service()
+        if os.path.exists(path):
+            if _is_listening(path):
+                raise OSError(f"A service is already listening on {path}!")
+            os.unlink(path)
+        super().__init__(path, _RequestHandler)
+        os.chmod(path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _is_listening(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class ServiceClient:
+    """Connection to a running service, usable as a context manager
+    Init:
+    path: path of the socket of the service
+    timeout: seconds to wait for an answer, None to wait forever
+    """
+
+    def __init__(self, path: str = None, timeout: float = None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path or default_socket_path())
+        self.file = self.socket.makefile("rwb")
+        self._next_id = 0
+
+    def call(self, method: str, **params):
+        """Call a method and return its result
+        Raises ServiceError when the service answers with an error
+        """
+        self._next_id += 1
+        request = {"jsonrpc": "2.0", "id": self._next_id, "method": method}
+        if params:
+            request["params"] = params
+        self.file.write(json.dumps(request).encode("utf-8") + b"\n")
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ServiceError(APPLICATION_ERROR, "Service closed the connection!")
+        answer = json.loads(line)
+        if "error" in answer:
+            raise ServiceError(answer["error"]["code"], answer["error"]["message"])
+        return answer["result"]
+
+    def close(self):
+        """Close the connection"""
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def main(argv: list[str] = None):
+    """Entry point of the pyfitit-gui-service command"""
+    parser = argparse.ArgumentParser(
+        prog="pyfitit-gui-service",
+        description="Serve project validation, rendering, file loading and"
+        " sampling over JSON-RPC on a Unix socket",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        default=default_socket_path(),
+        help="path of the socket (default: %(default)s)",
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the service until it is shut down")
+    call_parser = commands.add_parser("call", help="call a method of a running service")
+    call_parser.add_argument("method")
+    call_parser.add_argument(
+        "params", nargs="?", default="{}", help="parameters as a JSON object"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "call":
+        try:
+            with ServiceClient(args.socket) as client:
+                result = client.call(args.method, **json.loads(args.params))
+        except (OSError, ServiceError, json.JSONDecodeError, TypeError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        print(json.dumps(result, indent=2))
+        return 0
+    try:
+        server = ServiceServer(args.socket)
+    except OSError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"Listening on {args.socket}", flush=True)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
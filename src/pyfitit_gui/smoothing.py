@@ -0,0 +1,218 @@
+"""Module applying the FDMNES arctangent broadening to calculated spectra
+
+FDMNES convolves a calculated spectrum with a Lorentzian whose width grows
+with energy along an arctangent:
+
+    Gamma(E) = Gamma_hole + Gamma_max * (1/2 + 1/pi * arctan(
+        pi/3 * Gamma_max/Elarg * (e - 1/e**2))),  e = (E - Efermi)/Ecent
+
+States below the Fermi level are occupied, so the spectrum is cut there and
+Gamma is Gamma_hole below it. The smoothed spectrum is then shifted by
+`shift` and divided by `norm`.
+
+A convolution with a varying width does not map to a single FFT. Instead the
+spectrum is resampled on a uniform grid and convolved, in Fourier space, with
+Lorentzians from a fixed logarithmic table of widths. Every energy then
+interpolates between the two table widths around its own Gamma. The Fourier
+transform of a Lorentzian is known in closed form, so the kernels cost one
+exponential per frequency and are cached, and one smoothing costs an FFT per
+table width that is actually used.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+SMOOTHING_PARAMS = {
+    "GH": "gamma_hole",
+    "Ecent": "ecent",
+    "Elarg": "elarg",
+    "Gmax": "gamma_max",
+    "Efermi": "efermi",
+    "shift": "shift",
+    "norm": "norm",
+}
+"""Project settings of the smoothing and the SmoothingParams fields they set"""
+
+WIDTH_TABLE_RATIO = 1.08
+"""Ratio of neighbouring widths of the kernel table, bounding the width error"""
+
+MAX_GRID_POINTS = 2**14
+"""Largest uniform grid a spectrum is resampled on, padding included"""
+
+
+@dataclass(frozen=True)
+class SmoothingParams:
+    """Parameters of the FDMNES arctangent smoothing, in eV except for norm"""
+
+    gamma_hole: float
+    ecent: float
+    elarg: float
+    gamma_max: float
+    efermi: float
+    shift: float = 0.0
+    norm: float = None
+
+    @classmethod
+    def from_settings(cls, settings: dict):
+        """Read the parameters from project settings
+        An empty norm stays None. Raises ValueError for any other empty or
+        invalid value
+        """
+        values = {}
+        for key, field in SMOOTHING_PARAMS.items():
+            text = str(settings[key]).strip()
+            if not text:
+                if key != "norm":
+                    raise ValueError(f"Input the smoothing parameter {key}!")
+                values[field] = None
+                continue
+            try:
+                values[field] = float(text)
+            except ValueError:
+                raise ValueError(
+                    f"Invalid smoothing parameter {key}: '{text}'!"
+                ) from None
+        return cls(**values)
+
+
+def arctan_widths(energy: np.ndarray, params: SmoothingParams) -> np.ndarray:
+    """Lorentzian full width at every energy, as used by FDMNES"""
+    widths = np.full(len(energy), params.gamma_hole, dtype=float)
+    above = energy > params.efermi
+    if params.gamma_max and params.ecent and params.elarg:
+        e = (energy[above] - params.efermi) / params.ecent
+        widths[above] += params.gamma_max * (
+            0.5
+            + np.arctan(np.pi / 3 * params.gamma_max / params.elarg * (e - 1 / e**2))
+            / np.pi
+        )
+    return widths
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class ArctanSmoother:
+    """Repeated smoothing of one calculated spectrum with changing parameters
+    Init:
+    energy: sorted energies of the calculated spectrum
+    intensity: its intensities
+    """
+
+    def __init__(self, energy: np.ndarray, intensity: np.ndarray):
+        self.energy = np.asarray(energy, dtype=float)
+        self.intensity = np.asarray(intensity, dtype=float)
+        span = self.energy[-1] - self.energy[0]
+        if len(self.energy) < 2 or span <= 0:
+            raise ValueError("A spectrum needs at least two distinct energies!")
+        step = max(np.diff(self.energy).min(), 3 * span / MAX_GRID_POINTS)
+        # Padding by the span on both sides keeps the wrap-around of the
+        # circular convolution, and its Lorentzian tails, away from the data
+        size = int(np.ceil(3 * span / step)) + 1
+        self.size = min(1 << (size - 1).bit_length(), MAX_GRID_POINTS)
+        self.step = 3 * span / (self.size - 1)
+        self.start = self.energy[0] - span
+        self.grid = self.start + self.step * np.arange(self.size)
+        # Averages over the grid cells, so that points of spectra denser than
+        # the grid are not dropped by the resampling
+        integral = np.concatenate(
+            (
+                [0.0],
+                np.cumsum(
+                    np.diff(self.energy)
+                    * (self.intensity[1:] + self.intensity[:-1])
+                    / 2
+                ),
+            )
+        )
+        edges = np.clip(
+            self.grid[:, None] + (-self.step / 2, self.step / 2),
+            self.energy[0],
+            self.energy[-1],
+        )
+        cell_integral = np.diff(np.interp(edges, self.energy, integral), axis=1)[:, 0]
+        cell_width = edges[:, 1] - edges[:, 0]
+        self._resampled = np.interp(self.grid, self.energy, self.intensity)
+        inside = cell_width > 0
+        self._resampled[inside] = cell_integral[inside] / cell_width[inside]
+        self.frequencies = np.fft.rfftfreq(self.size, self.step)
+        self.width_table = self.step * WIDTH_TABLE_RATIO ** np.arange(
+            int(np.log(span / self.step) / np.log(WIDTH_TABLE_RATIO)) + 2
+        )
+        self._kernels = {}
+        self._signal = (None, None)
+
+    def _kernel(self, index: int) -> np.ndarray:
+        if index not in self._kernels:
+            self._kernels[index] = np.exp(
+                -np.pi * self.width_table[index] * self.frequencies
+            )
+        return self._kernels[index]
+
+    def _signal_spectrum(self, efermi: float) -> np.ndarray:
+        if self._signal[0] != efermi:
+            signal = self._resampled.copy()
+            signal[self.grid < efermi] = 0.0
+            self._signal = (efermi, np.fft.rfft(signal))
+        return self._signal[1]
+
+    def _at_energies(self, convolved, rows, weight) -> np.ndarray:
+        # Energies of the spectrum lie between grid points, interpolate linearly
+        grid_position = (self.energy - self.start) / self.step
+        left = np.minimum(grid_position.astype(np.int64), self.size - 2)
+        fraction = grid_position - left
+        values = np.zeros(len(self.energy))
+        for row_offset, row_weight in ((0, 1 - weight), (1, weight)):
+            row = rows + row_offset
+            values += row_weight * (
+                (1 - fraction) * convolved[row, left]
+                + fraction * convolved[row, left + 1]
+            )
+        return values
+
+    def smooth(self, params: SmoothingParams) -> tuple[np.ndarray, np.ndarray]:
+        """Return the shifted energies and the smoothed, normalized intensities"""
+        widths = np.clip(
+            arctan_widths(self.energy, params),
+            self.width_table[0],
+            self.width_table[-1],
+        )
+        position = np.log(widths / self.width_table[0]) / np.log(WIDTH_TABLE_RATIO)
+        lower = np.minimum(position.astype(np.int64), len(self.width_table) - 2)
+        weight = position - lower
+        used = np.unique(np.concatenate((lower, lower + 1)))
+        signal = self._signal_spectrum(params.efermi)
+        convolved = np.fft.irfft(
+            signal * np.stack([self._kernel(index) for index in used]), self.size
+        )
+        values = self._at_energies(convolved, np.searchsorted(used, lower), weight)
+        if params.norm:
+            values /= params.norm
+        return self.energy + params.shift, values
+
+
+def fit_norm(
+    energy: np.ndarray,
+    intensity: np.ndarray,
+    reference_energy: np.ndarray,
+    reference_intensity: np.ndarray,
+    interval: tuple[float, float] = None,
+) -> float:
+    """Least squares norm matching a smoothed spectrum to a reference one
+    Arguments:
+    energy, intensity: the smoothed spectrum, not normalized yet
+    reference_energy, reference_intensity: the experimental spectrum
+    interval: energy interval compared, the common range by default
+    Returns the norm to divide the smoothed intensities by, None if the spectra
+    do not overlap
+    """
+    left = max(energy[0], reference_energy[0])
+    right = min(energy[-1], reference_energy[-1])
+    if interval is not None:
+        left, right = max(left, min(interval)), min(right, max(interval))
+    start, stop = np.searchsorted(reference_energy, (left, right), side="left")
+    if stop - start < 2:
+        return None
+    calculated = np.interp(reference_energy[start:stop], energy, intensity)
+    reference = reference_intensity[start:stop]
+    denominator = float(np.dot(calculated, reference))
+    return float(np.dot(calculated, calculated)) / denominator if denominator else None
@@ -0,0 +1,174 @@
+"""Module overlaying a smoothed calculated spectrum on the spectrum preview
+
+A spectrum calculated by FDMNES is loaded once and smoothed again whenever a
+smoothing parameter is typed. Recomputation is debounced with a single-shot
+timer, so fast typing only smooths the last value, and the smoother keeps its
+resampled spectrum and kernels between updates.
+"""
+
+import os
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QFileDialog, QHBoxLayout, QLabel, QPushButton, QWidget
+
+from .lazy import lazy_import
+
+smoothing = lazy_import(".smoothing", __package__)
+spectrum = lazy_import(".spectrum", __package__)
+surrogate_panel = lazy_import(".surrogate_panel", __package__)
+
+SMOOTHING_DEBOUNCE_MS = 15
+"""Delay after the last typed smoothing value before the preview is redrawn"""
+
+SMOOTHING_TOOLTIPS = {
+    "GH": """<font>Gamma_hole, the width of the core hole in eV. It is the
+    Lorentzian width below the Fermi level.</font>""",
+    "Ecent": """<font>Ecent, the energy above the Fermi level, in eV, at the
+    center of the arctangent increase of the width.</font>""",
+    "Elarg": """<font>Elarg, the energy range in eV over which the width
+    increases.</font>""",
+    "Gmax": """<font>Gamma_max, the width added far above the Fermi level, in
+    eV.</font>""",
+    "Efermi": """<font>Efermi, the Fermi level in eV. The calculated spectrum is
+    cut below it.</font>""",
+    "shift": """<font>Energy shift in eV added to the smoothed spectrum.</font>""",
+    "norm": """<font>The smoothed spectrum is divided by the norm. If left empty,
+    the preview fits it to the experimental spectrum within the interval.</font>""",
+}
+"""Tooltips of the smoothing inputs, by project setting"""
+
+
+class SmoothingPreview:
+    """Smoothed calculated spectrum drawn over the experimental one of a main window
+    Init:
+    window: the main window holding the spectrum plot and the smoothing inputs
+    input_names: names of the smoothing input widgets, by project setting
+    """
+
+    def __init__(self, window: QWidget, input_names: dict[str, str]):
+        self.window = window
+        self.input_names = input_names
+        self.smoother = None
+        self.calculation_path = ""
+        self.surrogate_panel = None
+        self.timer = QTimer(window)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SMOOTHING_DEBOUNCE_MS)
+        self.timer.timeout.connect(self.redraw)
+
+    def create_widgets(self, layout: QHBoxLayout):
+        """Add the calculation buttons and info label, and watch the inputs"""
+        load_button = QPushButton("Load calculation")
+        load_button.setToolTip(
+            """<font>Load a spectrum calculated by FDMNES to preview its smoothing
+            with the parameters above.</font>"""
+        )
+        load_button.clicked.connect(self.load_calculation_dialog)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear_calculation)
+        self.window.widgets["smoothing_info_label"] = QLabel("No calculation loaded")
+        self.window.widgets["smoothing_info_label"].setWordWrap(True)
+        surrogate_button = QPushButton("Surrogate")
+        surrogate_button.setToolTip(
+            """<font>Predict the spectrum for any deformation values from a
+            dataset of calculated samples, and drag the values to compare it
+            with the experimental spectrum within the interval.</font>"""
+        )
+        surrogate_button.clicked.connect(self.show_surrogate_panel)
+        layout.addWidget(load_button)
+        layout.addWidget(clear_button)
+        layout.addWidget(surrogate_button)
+        layout.addWidget(self.window.widgets["smoothing_info_label"], 1)
+        for widget_name in self.input_names.values():
+            self.window.widgets[widget_name].textChanged.connect(self.timer.start)
+
+    def show_surrogate_panel(self):
+        """Callback showing the window previewing the surrogate of a dataset"""
+        if self.surrogate_panel is None:
+            self.surrogate_panel = surrogate_panel.SurrogatePanel(self.window)
+        self.surrogate_panel.show()
+        self.surrogate_panel.raise_()
+
+    def redraw_surrogate(self):
+        """Redraw the surrogate preview soon, if it is shown"""
+        if self.surrogate_panel is not None and self.surrogate_panel.isVisible():
+            self.surrogate_panel.timer.start()
+
+    def load_calculation_dialog(self):
+        """Callback loading a calculated spectrum to smooth"""
+        path = QFileDialog.getOpenFileName(
+            self.window,
+            "Choose a calculated spectrum",
+            self.window.project.settings["project_folder"] or ".",
+            "Text files (*.txt *.dat);;All files (*)",
+        )[0]
+        if not path:
+            return
+        try:
+            calculation = spectrum.load_spectrum(path)
+            self.smoother = smoothing.ArctanSmoother(
+                calculation.energy, calculation.intensity
+            )
+        except (OSError, ValueError) as error:
+            self.window.save_and_exit_error_message(
+                f"Could not read the calculated spectrum: {error}"
+            )
+            return
+        self.calculation_path = path
+        self.redraw()
+
+    def clear_calculation(self):
+        """Callback removing the calculated spectrum from the preview"""
+        self.smoother = None
+        self.calculation_path = ""
+        self.redraw()
+
+    def redraw(self):
+        """Plot the experimental spectrum and the smoothed calculated one"""
+        self.redraw_surrogate()
+        experiment = self.window.spectrum
+        plot = self.window.widgets["spectrum_plot"]
+        curves = (
+            [] if experiment is None else [(experiment.energy, experiment.intensity)]
+        )
+        info_label = self.window.widgets["smoothing_info_label"]
+        if self.smoother is None:
+            info_label.setText("No calculation loaded")
+            plot.set_curves(curves)
+            return
+        info = f"Smoothed {os.path.basename(self.calculation_path)}"
+        try:
+            energy, intensity, norm_info = self.smooth(self.smoother)
+        except ValueError as error:
+            info_label.setText(f"{info}: {error}")
+            plot.set_curves(curves)
+            return
+        curves.append((energy, intensity))
+        info_label.setText(info + norm_info)
+        plot.set_curves(curves)
+
+    def smooth(self, smoother: "smoothing.ArctanSmoother") -> tuple:
+        """Smooth a calculated spectrum with the typed smoothing parameters
+        An empty norm is fitted to the experimental spectrum within the interval
+        Returns the energies, the intensities and a note on the fitted norm
+        Raises ValueError if a smoothing parameter is invalid
+        """
+        params = smoothing.SmoothingParams.from_settings(
+            {
+                key: self.window.widgets[widget_name].text()
+                for key, widget_name in self.input_names.items()
+            }
+        )
+        energy, intensity = smoother.smooth(params)
+        experiment = self.window.spectrum
+        if params.norm is None and experiment is not None:
+            norm = smoothing.fit_norm(
+                energy,
+                intensity,
+                experiment.energy,
+                experiment.intensity,
+                self.window.widgets["spectrum_plot"].interval,
+            )
+            if norm:
+                return energy, intensity / norm, f", fitted norm {norm:.6g}"
+        return energy, intensity, ""
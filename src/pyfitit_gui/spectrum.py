@@ -0,0 +1,262 @@
+"""Module loading experimental spectra and preparing them for plotting
+
+Spectra are column text files. The header rows, the column delimiter and
+the energy and intensity columns are detected from the first lines of the
+file. Only those two columns are then parsed by the block-wise C reader of
+NumPy, so files with millions of points load without a Python loop over lines.
+
+For display, spectra are reduced with min/max decimation to about as many
+points as there are pixels, and intervals are located by binary search.
+
+Generated projects can read a binary sidecar of the spectrum instead of
+parsing the text file on every run. The sidecar holds the columns the
+project reads, as a (2, point) .npy array, next to a JSON fingerprint of the
+text file. The project memory-maps the sidecar while the fingerprint still
+matches the text file and parses the text otherwise.
+"""
+
+import hashlib
+import json
+import os
+import re
+from contextlib import suppress
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+SNIFF_LINES = 64
+"""Number of lines inspected to detect the layout of a spectrum file"""
+
+SIDECAR_SUFFIX = ".npy"
+"""Suffix appended to the spectrum file name to get its binary sidecar"""
+
+FINGERPRINT_SUFFIX = ".json"
+"""Suffix appended to the sidecar name to get its fingerprint"""
+
+PROJECT_LAYOUT = {"skiprows": 1, "energy_column": 0, "intensity_column": 1}
+"""Arguments the generated project passes to readSpectrum"""
+
+_DELIMITERS = re.compile(rb"[,;\t]")
+
+
+@dataclass(frozen=True)
+class SpectrumLayout:
+    """Class describing where the data of a spectrum file is"""
+
+    skiprows: int
+    delimiter: str
+    column_count: int
+    energy_column: int
+    intensity_column: int
+
+
+@dataclass(frozen=True)
+class SpectrumData:
+    """Class holding an experimental spectrum sorted by energy"""
+
+    path: str
+    energy: np.ndarray
+    intensity: np.ndarray
+    layout: SpectrumLayout
+
+    def interval_indices(self, left: float, right: float) -> tuple[int, int]:
+        """Return the slice bounds of the points lying within [left, right]"""
+        return interval_indices(self.energy, left, right)
+
+
+def _numbers(line: bytes):
+    """Return the numbers of a data line or None if it is not one"""
+    fields = _DELIMITERS.sub(b" ", line).split()
+    if not fields:
+        return None
+    try:
+        return [float(field) for field in fields]
+    except ValueError:
+        return None
+
+
+def detect_layout(lines: list[bytes]) -> SpectrumLayout:
+    """Detect the header rows and the energy and intensity columns of a spectrum
+    Arguments:
+    lines: the first lines of the file
+    The energy column is the first column rising monotonically, the intensity
+    column is the first other column. Header names such as 'energy' or 'mu'
+    take precedence when present.
+    Raises ValueError if no numeric data is found
+    """
+    skiprows = 0
+    while skiprows < len(lines) and _numbers(lines[skiprows]) is None:
+        skiprows += 1
+    rows = [_numbers(line) for line in lines[skiprows:]]
+    rows = [row for row in rows if row is not None]
+    if not rows:
+        raise ValueError("No numeric data found in the spectrum file!")
+    column_count = len(rows[0])
+    if column_count < 2:
+        raise ValueError("A spectrum file needs at least two columns!")
+    table = np.array([row for row in rows if len(row) == column_count])
+
+    energy_column = intensity_column = None
+    if skiprows:
+        names = (
+            _DELIMITERS.sub(b" ", lines[skiprows - 1])
+            .decode("utf-8", "replace")
+            .lstrip("#")
+            .lower()
+            .split()
+        )
+        if len(names) == column_count:
+            for column, name in enumerate(names):
+                if energy_column is None and (
+                    name in ("e", "ev") or name.startswith("energ")
+                ):
+                    energy_column = column
+                elif intensity_column is None and name.startswith(
+                    ("mu", "int", "norm", "abs", "xanes", "xas")
+                ):
+                    intensity_column = column
+    if energy_column is None:
+        rising = np.all(np.diff(table, axis=0) > 0, axis=0)
+        energy_column = int(np.argmax(rising)) if rising.any() else 0
+    if intensity_column is None or intensity_column == energy_column:
+        intensity_column = 1 if energy_column == 0 else 0
+    delimiter = _DELIMITERS.search(lines[skiprows])
+    return SpectrumLayout(
+        skiprows,
+        delimiter.group().decode() if delimiter else None,
+        column_count,
+        energy_column,
+        intensity_column,
+    )
+
+
+def load_spectrum(path: str, layout: SpectrumLayout = None) -> SpectrumData:
+    """Load a spectrum file, detecting its layout unless one is given
+    Raises ValueError if the file is not a column text file
+    """
+    with open(path, "rb") as spectrum_file:
+        if layout is None:
+            head = [spectrum_file.readline() for _ in range(SNIFF_LINES)]
+            layout = detect_layout([line for line in head if line])
+            spectrum_file.seek(0)
+        table = np.loadtxt(
+            spectrum_file,
+            delimiter=layout.delimiter,
+            skiprows=layout.skiprows,
+            usecols=(layout.energy_column, layout.intensity_column),
+            comments="#",
+            ndmin=2,
+        )
+    energy = table[:, 0]
+    intensity = table[:, 1]
+    if len(energy) > 1 and not np.all(energy[1:] >= energy[:-1]):
+        order = np.argsort(energy, kind="stable")
+        energy, intensity = energy[order], intensity[order]
+    return SpectrumData(
+        path, np.ascontiguousarray(energy), np.ascontiguousarray(intensity), layout
+    )
+
+
+def file_digest(path: str) -> str:
+    """Hex digest of the contents of a file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def spectrum_fingerprint(path: str) -> dict:
+    """Size, modification time and digest identifying a spectrum file"""
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "blake2b": file_digest(path),
+    }
+
+
+def sidecar_is_fresh(path: str) -> bool:
+    """Whether the sidecar of a spectrum file still matches the file
+    A changed modification time alone, e.g. after copying, falls back to
+    comparing the digest
+    """
+    try:
+        with open(path + SIDECAR_SUFFIX + FINGERPRINT_SUFFIX, encoding="utf-8") as meta:
+            fingerprint = json.load(meta)
+        stat = os.stat(path)
+        return os.path.exists(path + SIDECAR_SUFFIX) and (
+            (fingerprint["size"], fingerprint["mtime_ns"])
+            == (stat.st_size, stat.st_mtime_ns)
+            or fingerprint["blake2b"] == file_digest(path)
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def write_spectrum_sidecar(path: str) -> str:
+    """Write the binary sidecar of a spectrum file read like the generated project
+    The columns and header row passed to readSpectrum are used, whatever the
+    detected layout, so the sidecar holds exactly the data of the text file.
+    Raises ValueError if the file holds no finite, increasing spectrum there
+    Returns the path of the sidecar
+    """
+    fingerprint = spectrum_fingerprint(path)
+    with open(path, "rb") as spectrum_file:
+        head = [spectrum_file.readline() for _ in range(SNIFF_LINES)]
+    layout = replace(detect_layout([line for line in head if line]), **PROJECT_LAYOUT)
+    table = np.loadtxt(
+        path,
+        delimiter=layout.delimiter,
+        skiprows=layout.skiprows,
+        usecols=(layout.energy_column, layout.intensity_column),
+        comments="#",
+        ndmin=2,
+    ).T
+    if table.shape[1] < 2:
+        raise ValueError("The spectrum needs at least two points!")
+    if not np.all(np.isfinite(table)):
+        raise ValueError("The spectrum contains values that are not numbers!")
+    if not np.all(np.diff(table[0]) > 0):
+        raise ValueError("The spectrum energies are not increasing!")
+    sidecar = path + SIDECAR_SUFFIX
+    with suppress(FileNotFoundError):
+        os.remove(sidecar + FINGERPRINT_SUFFIX)
+    partial = sidecar + ".partial"
+    with open(partial, "wb") as output:
+        np.save(output, np.ascontiguousarray(table))
+    os.replace(partial, sidecar)
+    with open(sidecar + FINGERPRINT_SUFFIX, "w", encoding="utf-8") as meta:
+        json.dump(fingerprint, meta)
+    return sidecar
+
+
+def interval_indices(energy: np.ndarray, left: float, right: float) -> tuple[int, int]:
+    """Return the slice bounds of the sorted energies lying within [left, right]"""
+    return (
+        int(np.searchsorted(energy, left, side="left")),
+        int(np.searchsorted(energy, right, side="right")),
+    )
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, buckets: int):
+    """Reduce a curve to the first, minimum and maximum point of equal-sized buckets
+    Keeps every peak and dip visible while drawing at most three points per bucket
+    """
+    if len(x) <= 3 * buckets or buckets < 1:
+        return x, y
+    bucket_size = len(x) // buckets
+    used = bucket_size * buckets
+    shaped = y[:used].reshape(buckets, bucket_size)
+    offsets = np.arange(buckets) * bucket_size
+    picks = np.stack(
+        (
+            offsets,
+            offsets + np.argmin(shaped, axis=1),
+            offsets + np.argmax(shaped, axis=1),
+        ),
+        axis=1,
+    )
+    picks.sort(axis=1)
+    indices = np.append(picks.ravel(), len(x) - 1)
+    return x[indices], y[indices]
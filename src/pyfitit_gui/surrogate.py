@@ -0,0 +1,123 @@
+"""Module predicting spectra between the samples of a dataset
+
+The surrogate interpolates the spectra of the nearest samples, weighted by
+their inverse squared distance. Distances are taken in the parameter space
+scaled to the unit cube by the deformation ranges, so an angle range in
+radians and a shift range in Angstrom count alike. A sample at the queried
+point is returned exactly.
+
+Samples are added in blocks as a dataset grows, into arrays whose capacity
+doubles, so adding is amortized constant time per sample. A query computes
+the distances to all samples with one matrix product and picks the nearest
+with a partial sort, which for a library of 100000 samples takes a few
+milliseconds.
+"""
+
+import numpy as np
+
+NEIGHBOURS = 8
+"""Number of nearest samples whose spectra are interpolated"""
+
+EXACT_DISTANCE = 1e-12
+"""Squared scaled distance below which a query is at a sample, above the
+rounding error of the distances computed from the norms"""
+
+
+# pylint: disable=too-many-instance-attributes
+class Surrogate:
+    """Inverse distance weighted nearest neighbour interpolation of spectra
+    Init:
+    ranges: (deformation, 2) ranges of the parameters
+    energy: energy grid of the spectra
+    neighbours: number of nearest samples interpolated
+    """
+
+    def __init__(
+        self, ranges: np.ndarray, energy: np.ndarray, neighbours: int = NEIGHBOURS
+    ):
+        ranges = np.asarray(ranges, dtype=np.float64).reshape(-1, 2)
+        self.low = ranges[:, 0]
+        width = ranges[:, 1] - ranges[:, 0]
+        self.scale = 1 / np.where(width > 0, width, 1.0)
+        self.energy = np.asarray(energy, dtype=np.float64)
+        self.neighbours = neighbours
+        self.count = 0
+        self._points = np.empty((0, len(ranges)))
+        self._norms = np.empty(0)
+        self._spectra = np.empty((0, len(self.energy)), dtype=np.float32)
+
+    @classmethod
+    def from_dataset(cls, dataset, neighbours: int = NEIGHBOURS):
+        """Surrogate of all samples of a dataset.Dataset"""
+        surrogate = cls(dataset.ranges, dataset.energy, neighbours)
+        surrogate.update(dataset)
+        return surrogate
+
+    def __len__(self):
+        return self.count
+
+    def add(self, params: np.ndarray, spectra: np.ndarray):
+        """Add samples given as (sample, deformation) params and their spectra"""
+        params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+        spectra = np.atleast_2d(np.asarray(spectra))
+        if params.shape[1:] != self._points.shape[1:] or spectra.shape != (
+            len(params),
+            len(self.energy),
+        ):
+            raise ValueError(
+                f"Samples need {self._points.shape[1]} parameters and"
+                f" {len(self.energy)} spectrum points!"
+            )
+        total = self.count + len(params)
+        if total > len(self._points):
+            capacity = max(total, 2 * len(self._points), 1024)
+            self._points = _grown(self._points, capacity, self.count)
+            self._norms = _grown(self._norms, capacity, self.count)
+            self._spectra = _grown(self._spectra, capacity, self.count)
+        points = (params - self.low) * self.scale
+        self._points[self.count : total] = points
+        self._norms[self.count : total] = np.einsum("ij,ij->i", points, points)
+        self._spectra[self.count : total] = spectra
+        self.count = total
+
+    def update(self, dataset) -> int:
+        """Add the samples appended to a dataset since the last update
+        Returns the number of added samples
+        """
+        added = len(dataset) - self.count
+        if added > 0:
+            self.add(dataset.params[self.count :], dataset.spectra[self.count :])
+        return max(added, 0)
+
+    def predict(self, params: np.ndarray) -> np.ndarray:
+        """Predicted (query, energy) spectra for (query, deformation) params"""
+        if not self.count:
+            raise ValueError("The surrogate holds no samples yet!")
+        queries = (np.atleast_2d(np.asarray(params, dtype=np.float64)) - self.low) * (
+            self.scale
+        )
+        points = self._points[: self.count]
+        distances = (
+            self._norms[: self.count]
+            - 2 * queries @ points.T
+            + np.einsum("ij,ij->i", queries, queries)[:, None]
+        )
+        count = min(self.neighbours, self.count)
+        nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+        nearest_distances = np.maximum(
+            np.take_along_axis(distances, nearest, axis=1), 0.0
+        )
+        exact = nearest_distances <= EXACT_DISTANCE
+        weights = np.where(
+            exact.any(axis=1, keepdims=True),
+            exact.astype(np.float64),
+            1 / np.maximum(nearest_distances, EXACT_DISTANCE),
+        )
+        weights /= weights.sum(axis=1, keepdims=True)
+        return np.einsum("qk,qke->qe", weights, self._spectra[nearest])
+
+
+def _grown(array: np.ndarray, capacity: int, count: int) -> np.ndarray:
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:count] = array[:count]
+    return grown
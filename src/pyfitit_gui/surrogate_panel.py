@@ -0,0 +1,212 @@
+"""Module with the window previewing spectra predicted between dataset samples
+
+A dataset written by pyfitit-gui-dataset is read into a surrogate, which
+predicts the calculated spectrum for any deformation values. Every slider
+move predicts one spectrum, smooths it with the parameters of the main
+window and draws it over the experimental spectrum within the energy
+interval. While the window is shown, the dataset is checked for new samples
+every few seconds, so the surrogate grows as calculations finish.
+"""
+
+import os
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QSlider,
+    QVBoxLayout,
+    QWidget,
+)
+
+from .lazy import lazy_import
+from .plot_widget import SpectrumPlot
+
+dataset = lazy_import(".dataset", __package__)
+np = lazy_import("numpy")
+smoothing = lazy_import(".smoothing", __package__)
+spectrum = lazy_import(".spectrum", __package__)
+surrogate = lazy_import(".surrogate", __package__)
+
+SLIDER_STEPS = 1000
+"""Number of steps of a slider between the ends of its deformation range"""
+
+DATASET_POLL_MS = 2000
+"""Interval at which the shown window checks the dataset for new samples"""
+
+
+# pylint: disable=too-many-instance-attributes
+class SurrogatePanel(QWidget):
+    """Window with a slider per deformation and the spectrum predicted for them
+    Init:
+    main_window: the main window holding the experimental spectrum, the
+    energy interval and the smoothing inputs
+    """
+
+    def __init__(self, main_window: QWidget):
+        super().__init__(main_window, Qt.Window)
+        self.setWindowTitle("Surrogate preview")
+        self.main_window = main_window
+        self.dataset_path = ""
+        self.surrogate = None
+        self.mismatch = ""
+        self.sliders: list[tuple[QSlider, QLabel, float, float]] = []
+
+        layout = QVBoxLayout()
+        path_row = QHBoxLayout()
+        self.path_input = QLineEdit()
+        self.path_input.setPlaceholderText("Dataset directory")
+        self.path_input.returnPressed.connect(
+            lambda: self.load_dataset(self.path_input.text())
+        )
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.choose_dataset_dialog)
+        path_row.addWidget(self.path_input, 1)
+        path_row.addWidget(browse_button)
+        layout.addLayout(path_row)
+        self.info_label = QLabel("No dataset loaded")
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+        self.slider_form = QFormLayout()
+        layout.addLayout(self.slider_form)
+        self.plot = SpectrumPlot()
+        layout.addWidget(self.plot, 1)
+        self.setLayout(layout)
+        self.resize(640, 480)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.redraw)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(DATASET_POLL_MS)
+        self.poll_timer.timeout.connect(self.poll_dataset)
+
+    # pylint: disable=invalid-name
+    def showEvent(self, event):
+        """Start following the dataset and redraw with the current settings"""
+        self.poll_timer.start()
+        self.timer.start()
+        super().showEvent(event)
+
+    # pylint: disable=invalid-name
+    def hideEvent(self, event):
+        """Stop following the dataset"""
+        self.poll_timer.stop()
+        super().hideEvent(event)
+
+    def choose_dataset_dialog(self):
+        """Callback choosing the dataset directory"""
+        path = QFileDialog.getExistingDirectory(
+            self,
+            "Choose a dataset directory",
+            self.main_window.project.settings["project_folder"] or ".",
+        )
+        if path:
+            self.path_input.setText(path)
+            self.load_dataset(path)
+
+    def load_dataset(self, path: str):
+        """Build the surrogate of a dataset and a slider for each of its parameters"""
+        try:
+            loaded = dataset.Dataset(path)
+            self.surrogate = surrogate.Surrogate.from_dataset(loaded)
+        except (OSError, ValueError, KeyError) as error:
+            self.surrogate = None
+            self.dataset_path = ""
+            self.info_label.setText(f"Could not read the dataset: {error}")
+            self.plot.set_curves([])
+            return
+        self.dataset_path = path
+        while self.slider_form.rowCount():
+            self.slider_form.removeRow(0)
+        self.sliders = []
+        for name, (left, right) in loaded.geometry_param_ranges().items():
+            slider = QSlider(Qt.Horizontal)
+            slider.setRange(0, SLIDER_STEPS)
+            slider.setValue(SLIDER_STEPS // 2)
+            value_label = QLabel()
+            value_label.setMinimumWidth(80)
+            row = QHBoxLayout()
+            row.addWidget(slider, 1)
+            row.addWidget(value_label)
+            self.slider_form.addRow(name, row)
+            self.sliders.append((slider, value_label, left, right))
+            slider.valueChanged.connect(self.redraw)
+        self.mismatch = ""
+        if self.main_window.project.deformations:
+            try:
+                dataset.check_deformations(
+                    loaded.header, self.main_window.project.deformations
+                )
+            except ValueError as error:
+                self.mismatch = f"\n{error}"
+        self.redraw()
+
+    def poll_dataset(self):
+        """Add the samples appended to the dataset since it was last read"""
+        if self.surrogate is None:
+            return
+        try:
+            if dataset.read_header(self.dataset_path)["count"] <= len(self.surrogate):
+                return
+            added = self.surrogate.update(dataset.Dataset(self.dataset_path))
+        except (OSError, ValueError, KeyError):
+            return
+        if added:
+            self.redraw()
+
+    def values(self) -> "np.ndarray":
+        """Deformation values set by the sliders"""
+        return np.array(
+            [
+                left + (right - left) * slider.value() / SLIDER_STEPS
+                for slider, _, left, right in self.sliders
+            ]
+        )
+
+    def redraw(self):
+        """Predict the spectrum for the slider values and plot it in the interval"""
+        experiment = self.main_window.spectrum
+        curves = (
+            [] if experiment is None else [(experiment.energy, experiment.intensity)]
+        )
+        if self.surrogate is None:
+            self.plot.set_curves(_cropped(curves, self._interval()))
+            return
+        values = self.values()
+        for (_, value_label, _, _), value in zip(self.sliders, values):
+            value_label.setText(f"{value:.4g}")
+        start = time.perf_counter()
+        predicted = self.surrogate.predict(values)[0]
+        try:
+            energy, intensity, info = self.main_window.smoothing_preview.smooth(
+                smoothing.ArctanSmoother(self.surrogate.energy, predicted)
+            )
+        except ValueError as error:
+            energy, intensity = self.surrogate.energy, predicted
+            info = f", not smoothed: {error}"
+        curves.append((energy, intensity))
+        self.plot.set_curves(_cropped(curves, self._interval()))
+        self.info_label.setText(
+            f"{os.path.basename(os.path.normpath(self.dataset_path))}:"
+            f" {len(self.surrogate)} samples, predicted and smoothed in"
+            f" {(time.perf_counter() - start) * 1e3:.1f} ms{info}{self.mismatch}"
+        )
+
+    def _interval(self) -> tuple[float, float]:
+        return self.main_window.widgets["spectrum_plot"].interval
+
+
+def _cropped(curves: list[tuple], interval: tuple[float, float]) -> list[tuple]:
+    if interval is None:
+        return curves
+    cropped = []
+    for energy, intensity in curves:
+        start, stop = spectrum.interval_indices(energy, *interval)
+        cropped.append((energy[start:stop], intensity[start:stop]))
+    return cropped
@@ -0,0 +1,211 @@
+"""Module with opt-in timing spans and counters exported as a Chrome trace
+
+Tracing is off by default and then costs nothing: spans are only placed
+around functions by instrument_class and instrument_functions, which are not
+called unless profiling is requested. While enabled, every span is kept as a
+complete event of the Chrome trace format, which chrome://tracing and
+https://ui.perfetto.dev display as a timeline. Every span name also counts
+its calls and total time, for a summary without opening the trace. Samples,
+e.g. of the event loop latency, become counter tracks.
+"""
+
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from contextlib import nullcontext
+from functools import wraps
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "start")
+
+    def __init__(self, tracer, name: str, category: str):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(
+            self.name, self.category, self.start, time.perf_counter_ns() - self.start
+        )
+        return False
+
+
+# pylint: disable=too-many-instance-attributes
+class Tracer:
+    """Collector of timing spans, call counters and samples
+    Init:
+    enabled: whether spans are recorded from the start
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.events: list[dict] = []
+        self.calls: dict[str, int] = defaultdict(int)
+        self.total_ns: dict[str, int] = defaultdict(int)
+        self.max_ns: dict[str, int] = defaultdict(int)
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def span(self, name: str, category: str = "callback"):
+        """Context manager timing a block, a shared no-op one while disabled"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, category)
+
+    def record(self, name: str, category: str, start_ns: int, duration_ns: int):
+        """Store a finished span"""
+        with self._lock:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start_ns - self._origin) / 1000,
+                    "dur": duration_ns / 1000,
+                    "pid": os.getpid(),
+                    "tid": threading.get_native_id(),
+                }
+            )
+            self.calls[name] += 1
+            self.total_ns[name] += duration_ns
+            self.max_ns[name] = max(self.max_ns[name], duration_ns)
+
+    def sample(self, name: str, value: float):
+        """Store one value of a counter track, e.g. a latency in milliseconds"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events.append(
+                {
+                    "name": name,
+                    "ph": "C",
+                    "ts": (time.perf_counter_ns() - self._origin) / 1000,
+                    "pid": os.getpid(),
+                    "args": {name: value},
+                }
+            )
+            self.samples[name].append(value)
+
+    def count(self, name: str, value: int = 1):
+        """Increase a call counter without timing anything"""
+        if self.enabled:
+            with self._lock:
+                self.calls[name] += value
+
+    def chrome_trace(self) -> dict:
+        """The recorded events in the Chrome trace event format"""
+        with self._lock:
+            return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path: str):
+        """Write the Chrome trace JSON file"""
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+    def summary(self, limit: int = 30) -> str:
+        """Calls, total and longest time of the slowest span names and sample stats"""
+        with self._lock:
+            names = sorted(self.calls, key=lambda name: -self.total_ns[name])
+            lines = [
+                f"{name:50} {self.calls[name]:7} calls"
+                f" {self.total_ns[name] / 1e6:10.1f} ms total"
+                f" {self.max_ns[name] / 1e6:8.1f} ms max"
+                for name in names[:limit]
+            ]
+            for name, values in self.samples.items():
+                ordered = sorted(values)
+                lines.append(
+                    f"{name:50} {len(values):7} samples"
+                    f" {ordered[len(ordered) // 2]:10.1f} median"
+                    f" {ordered[int(len(ordered) * 0.99)]:8.1f} p99"
+                    f" {ordered[-1]:8.1f} max"
+                )
+        return "\n".join(lines)
+
+
+TRACER = Tracer()
+"""Tracer of the application, enabled by the --profile flag"""
+
+
+def span(name: str, category: str = "callback"):
+    """Time a block with the application tracer"""
+    return TRACER.span(name, category)
+
+
+def traced(function: Callable, name: str, category: str = "callback") -> Callable:
+    """Wrap a function in a span
+    Surplus positional arguments are dropped like Qt does for slots, so a
+    wrapped callback still works when a signal passes more arguments than
+    the callback takes
+    """
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        parameters = [inspect.Parameter("args", inspect.Parameter.VAR_POSITIONAL)]
+    kinds = [parameter.kind for parameter in parameters]
+    positional = (
+        None
+        if inspect.Parameter.VAR_POSITIONAL in kinds
+        else sum(
+            kind
+            in (
+                inspect.Parameter.POSITIONAL_ONLY,
+                inspect.Parameter.POSITIONAL_OR_KEYWORD,
+            )
+            for kind in kinds
+        )
+    )
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with TRACER.span(name, category):
+            return function(*args[:positional], **kwargs)
+
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def instrument_class(cls: type, category: str = "callback", private: bool = False):
+    """Wrap the methods defined in a class in spans named Class.method
+    Arguments:
+    cls: class whose own methods are wrapped, inherited ones are left alone
+    category: category of the spans in the trace
+    private: whether methods starting with an underscore are wrapped too,
+    __init__ always is
+    """
+    for attribute, value in list(vars(cls).items()):
+        if not callable(value) or isinstance(value, (type, staticmethod, classmethod)):
+            continue
+        dunder = attribute.startswith("__") and attribute.endswith("__")
+        if getattr(value, "__traced__", False) or (
+            attribute != "__init__"
+            and (dunder or (attribute.startswith("_") and not private))
+        ):
+            continue
+        setattr(cls, attribute, traced(value, f"{cls.__name__}.{attribute}", category))
+
+
+def instrument_functions(owner, names: Iterable[str], category: str = "stage"):
+    """Wrap functions of a module or class, e.g. the stages a callback runs
+    Arguments:
+    owner: module or class holding the functions
+    names: attribute names of the functions
+    category: category of the spans in the trace
+    """
+    for attribute in names:
+        value = getattr(owner, attribute)
+        if not getattr(value, "__traced__", False):
+            setattr(owner, attribute, traced(value, attribute, category))
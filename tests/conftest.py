@@ -0,0 +1,32 @@
+"""Fixtures shared by the tests"""
+
+import os
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+XYZ = """\
+6
+
+Fe  0.000  0.000  0.000
+O   1.900  0.100  0.000
+C   2.800  0.900  0.300
+O   0.100  2.000  0.200
+C   0.500  2.900  1.000
+H   1.200  3.500  1.400
+"""
+
+
+@pytest.fixture(name="xyz_path")
+def fixture_xyz_path(tmp_path):
+    """Molecule file with six atoms, split into two parts of three by the tests"""
+    path = tmp_path / "molecule.xyz"
+    path.write_text(XYZ, encoding="utf-8")
+    return path
+
+
+@pytest.fixture(name="application", scope="session")
+def fixture_application():
+    """Qt application of the tests, on the offscreen platform unless one is set"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,78 @@
+"""Tests of the headless generator rendering projects from spec files"""
+
+import json
+
+from pyfitit_gui.batch import load_spec, main
+
+HEADER = (
+    "project_name,project_folder,molecule_file,spectrum_file,parts,left_interval,"
+    "right_interval,energy_range,Green,Radius,GH,Ecent,Elarg,Gmax,Efermi,shift,"
+    "norm,deformations"
+)
+
+DEFORMATIONS = json.dumps(
+    [
+        {
+            "part": 1,
+            "atom_1": 0,
+            "atom_2": 3,
+            "def_type": "shift",
+            "name": "r1",
+            "range_left": -0.2,
+            "range_right": 0.2,
+        }
+    ]
+).replace('"', '""')
+
+
+def write_csv_spec(path, names: list[str]):
+    """CSV spec of projects that only differ by their name"""
+    rows = [
+        f"{name},{path.parent},mol.xyz,exp.txt,0-2,8980,9100,-15 0.5 50,True,6,"
+        f'1.5,30,30,15,0,0,1,"{DEFORMATIONS}"'
+        for name in names
+    ]
+    path.write_text("\n".join([HEADER] + rows) + "\n", encoding="utf-8")
+    return path
+
+
+def test_json_and_csv_specs_render_the_same_projects(tmp_path, capsys):
+    """Both spec formats give the same files, which are only replaced on request"""
+    csv_spec = write_csv_spec(tmp_path / "spec.csv", ["scan_a", "scan_b"])
+    json_spec = tmp_path / "spec.json"
+    json_spec.write_text(json.dumps(load_spec(csv_spec)), encoding="utf-8")
+
+    assert main([str(csv_spec), "-o", str(tmp_path / "csv")]) == 0
+    assert main([str(json_spec), "-o", str(tmp_path / "json"), "-j", "2"]) == 0
+    assert "Rendered 2 project(s)" in capsys.readouterr().out
+    for name in ("scan_a", "scan_b"):
+        text = (tmp_path / "csv" / f"{name}.py").read_text(encoding="utf-8")
+        assert text == (tmp_path / "json" / f"{name}.py").read_text(encoding="utf-8")
+        assert f"project.name = '{name}'" in text
+        assert "'r1': [-0.2, 0.2]," in text
+
+    assert main([str(csv_spec), "-o", str(tmp_path / "csv")]) == 1
+    assert capsys.readouterr().err.count("Failed to save") == 2
+    assert main([str(csv_spec), "-o", str(tmp_path / "csv"), "--overwrite"]) == 0
+
+
+def test_invalid_spec_writes_nothing(tmp_path, capsys):
+    """Every problem of every project is reported and no file is written"""
+    projects = load_spec(write_csv_spec(tmp_path / "spec.csv", ["good", "bad"]))
+    del projects[1]["Radius"]
+    projects[1]["left_interval"] = "9200"
+    projects[1]["deformations"][0]["def_type"] = "twist"
+    spec = tmp_path / "spec.json"
+    spec.write_text(json.dumps({"projects": projects}), encoding="utf-8")
+
+    assert main([str(spec), "-o", str(tmp_path / "out")]) == 1
+    errors = capsys.readouterr().err.splitlines()
+    assert errors[-1] == "Spec contains 5 error(s), nothing written"
+    assert all(line.startswith("bad: ") for line in errors[:-1])
+    assert "missing field 'Radius'" in errors[0]
+    assert not (tmp_path / "out").exists()
+
+    spec.write_text(json.dumps(projects[0]), encoding="utf-8")
+    assert main([str(spec), "--check"]) == 0
+    assert capsys.readouterr().out == "Spec with 1 project(s) is valid\n"
+    assert not list(tmp_path.glob("*.py"))
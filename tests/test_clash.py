@@ -0,0 +1,65 @@
+"""Tests of the clash check run before saving a project"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.clash import CLASH_SAMPLES, check_clashes
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.geometry_tools import ClashWorker
+
+GRID = np.stack(np.meshgrid(*[np.arange(4) * 1.2] * 3), -1).reshape(-1, 3)
+
+COORDINATES = np.concatenate((GRID, GRID + [12, 0, 0]))
+
+PARTS = [slice(0, len(GRID)), slice(len(GRID), 2 * len(GRID))]
+
+
+def shifts(count: int, left: float = -0.1) -> list[Deformation]:
+    """Shifts of the second part along the axis between the parts"""
+    return [
+        Deformation(1, len(GRID), 0, "shift", f"shift_{number}", left, 0.1)
+        for number in range(count)
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_clashes_of_approaching_parts(workers):
+    """Shifting the parts onto each other is reported the same in and out of process"""
+    deformations = shifts(1, left=-9.0)
+    report = check_clashes(COORDINATES, PARTS, deformations, workers=workers)
+    assert report.geometries_checked == 2 + CLASH_SAMPLES
+    assert report.clashes
+    assert all(clash.params[0] < -5 for clash in report.clashes)
+
+
+def test_edge_limit_samples_the_corners():
+    """More corners than the limit are replaced by that many random corners"""
+    report = check_clashes(COORDINATES, PARTS, shifts(12), edge_limit=64, workers=1)
+    assert report.edges_sampled
+    assert report.geometries_checked == 64 + CLASH_SAMPLES
+    assert "random subset" in report.describe(shifts(12))
+
+
+def test_progress_stops_the_check():
+    """Returning False from the progress callback stops after the current block"""
+    done = []
+    report = check_clashes(
+        COORDINATES,
+        PARTS,
+        shifts(12),
+        workers=1,
+        progress=lambda checked: done.append(checked) or False,
+    )
+    assert report.stopped
+    assert done == [report.geometries_checked]
+    assert report.geometries_checked < 2**12 + CLASH_SAMPLES
+
+
+def test_worker_reports_any_error(application):
+    """The clash worker sends every error, so the dialog waiting for it returns"""
+    del application
+    results = []
+    worker = ClashWorker({"coordinates": COORDINATES, "parts": None})
+    worker.checked.connect(results.append)
+    worker.run()
+    assert isinstance(results[0], TypeError)
@@ -0,0 +1,119 @@
+"""Tests of the columnar dataset of sampled geometries and their spectra"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.dataset import COLUMNS, Dataset, DatasetWriter, build_dataset
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.fdmnes import FDMNES_OUTPUT_NAME, deck_folder_name
+from pyfitit_gui.project_model import ProjectModel
+from pyfitit_gui.sampling import NPY_HEADER_BYTES, params_path
+
+DEFORMATIONS = [
+    Deformation(1, 3, 0, "shift", "r1", -0.2, 0.2),
+    Deformation(1, 3, 1, "shift", "r2", -0.1, 0.3),
+]
+
+ELEMENTS = np.array(["Fe", "O", "C", "O", "C", "H"])
+
+ENERGY = np.linspace(7100, 7160, 7)
+
+ROW_VALUES = {"samples": 1, "params": 2, "geometries": 18, "spectra": len(ENERGY)}
+
+
+def rows(first: int, count: int) -> tuple:
+    """Rows of samples first to first + count, their values derived from the index"""
+    samples = np.arange(first, first + count)
+    params = samples[:, None] * [0.01, -0.01]
+    geometries = np.broadcast_to(samples[:, None, None], (count, 6, 3)) + 0.5
+    spectra = samples[:, None] + ENERGY / 1e4
+    return samples, params, geometries, spectra
+
+
+@pytest.fixture(name="dataset_path")
+def fixture_dataset_path(tmp_path):
+    """Dataset directory holding five samples appended in two blocks"""
+    path = tmp_path / "dataset"
+    with DatasetWriter.create(path, DEFORMATIONS, ELEMENTS, ENERGY) as writer:
+        writer.append(*rows(0, 2))
+        writer.append(*rows(2, 3))
+    return path
+
+
+def test_appended_rows_are_read_back(dataset_path):
+    """Reopened columns are memory-mapped and hold the rows of every append"""
+    dataset = Dataset(dataset_path)
+    samples, params, geometries, spectra = rows(0, 5)
+    assert len(dataset) == 5
+    assert dataset.names == ["r1", "r2"]
+    assert dataset.geometry_param_ranges() == {"r1": [-0.2, 0.2], "r2": [-0.1, 0.3]}
+    assert isinstance(dataset.spectra, np.memmap)
+    assert np.array_equal(dataset.samples, samples)
+    assert np.array_equal(dataset.param("r2"), params[:, 1])
+    assert np.array_equal(dataset.geometries[1:4], geometries[1:4].astype(np.float32))
+    assert np.array_equal(dataset.spectra[3], spectra[3].astype(np.float32))
+    assert np.array_equal(dataset.energy, ENERGY)
+    assert np.load(dataset_path / "geometries.npy").shape == (5, 6, 3)
+    with pytest.raises(ValueError, match="no parameter"):
+        dataset.param("r3")
+    with DatasetWriter(dataset_path) as writer, pytest.raises(
+        ValueError, match="shape"
+    ):
+        writer.append(*rows(5, 1)[:3], np.zeros((1, 3)))
+    with pytest.raises(ValueError, match="already holds"):
+        DatasetWriter.create(dataset_path, DEFORMATIONS, ELEMENTS, ENERGY)
+
+
+def test_rows_of_an_interrupted_append_are_cut_off(dataset_path):
+    """Rows written past the sample count of the header are dropped on reopening"""
+    for name in COLUMNS:
+        with (dataset_path / f"{name}.npy").open("ab") as column:
+            column.write(b"\x01" * 100)
+    with DatasetWriter(dataset_path) as writer:
+        assert writer.count == 5
+        for name, dtype in COLUMNS.items():
+            row_bytes = np.dtype(dtype).itemsize * ROW_VALUES[name]
+            size = (dataset_path / f"{name}.npy").stat().st_size
+            assert size == NPY_HEADER_BYTES + 5 * row_bytes
+        writer.append(*rows(5, 1))
+    dataset = Dataset(dataset_path)
+    assert np.array_equal(dataset.samples, np.arange(6))
+    assert np.array_equal(dataset.spectra[5], rows(5, 1)[3][0].astype(np.float32))
+
+
+def write_output(deck_dir, index: int):
+    """FDMNES output of a sample with its intensity offset by the index"""
+    folder = deck_dir / deck_folder_name(index)
+    folder.mkdir(parents=True)
+    table = np.column_stack((ENERGY, index + ENERGY / 1e4))
+    np.savetxt(folder / FDMNES_OUTPUT_NAME, table, header="Energy <xanes>")
+
+
+def test_build_skips_samples_already_in_the_dataset(tmp_path, xyz_path):
+    """Building again only appends the samples calculated since the last build"""
+    model = ProjectModel()
+    model.set_setting("project_folder", str(xyz_path.parent))
+    model.set_setting("molecule_file", xyz_path.name)
+    model.add_deformations(DEFORMATIONS)
+    stack_path = tmp_path / "samples.npy"
+    _, params, geometries, _ = rows(0, 4)
+    np.save(stack_path, geometries)
+    np.save(params_path(stack_path), params)
+    deck_dir = tmp_path / "decks"
+    for index in (0, 1, 3):
+        write_output(deck_dir, index)
+    (deck_dir / deck_folder_name(2)).mkdir()
+    path = tmp_path / "dataset"
+
+    assert build_dataset(model, stack_path, deck_dir, path) == (3, 0)
+    # a folder of a sample the stack does not hold is ignored
+    write_output(deck_dir, 5)
+    (deck_dir / deck_folder_name(2)).rmdir()
+    write_output(deck_dir, 2)
+    assert build_dataset(model, stack_path, deck_dir, path) == (1, 0)
+    assert build_dataset(model, stack_path, deck_dir, path) == (0, 0)
+    dataset = Dataset(path)
+    assert dataset.samples.tolist() == [0, 1, 3, 2]
+    assert np.allclose(dataset.spectra[:, 0], [0.71, 1.71, 3.71, 2.71])
+    assert np.allclose(dataset.params, params[[0, 1, 3, 2]])
+    assert dataset.elements.tolist() == ELEMENTS.tolist()
@@ -0,0 +1,68 @@
+"""Tests of the deformation engine against the pyFitIt molecule it mirrors"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.deformation_engine import deform, edge_geometries, part_slices
+
+pyfitit_molecule = pytest.importorskip("pyfitit.molecule")
+
+PARTS = ("0-2", "3-5")
+
+DEFORMATIONS = [
+    Deformation(0, 1, 0, "shift", "shift_1", -0.2, 0.3),
+    Deformation(1, 3, 0, "rotation", "rotation_1", -0.5, 0.4),
+    Deformation(1, 4, 3, "shift", "shift_2", -0.1, 0.25),
+    Deformation(0, 0, 2, "rotation", "rotation_2", -0.3, 0.6),
+]
+
+
+def pyfitit_geometry(xyz_path, values: list[float]) -> np.ndarray:
+    """Apply the deformations with pyFitIt like the generated moleculeConstructor"""
+    molecule = pyfitit_molecule.Molecule(str(xyz_path))
+    molecule.setParts(*PARTS)
+    for deformation, value in zip(DEFORMATIONS, values):
+        axis = pyfitit_molecule.normalize(
+            molecule.atom[deformation.atom_1] - molecule.atom[deformation.atom_2]
+        )
+        part = molecule.part[deformation.part]
+        if deformation.def_type == "rotation":
+            part.rotate(axis, molecule.atom[deformation.atom_1], value)
+        else:
+            part.shift(axis * value)
+    return molecule.atom
+
+
+def engine_inputs(xyz_path):
+    """Undeformed coordinates and part slices of the molecule file"""
+    molecule = pyfitit_molecule.Molecule(str(xyz_path))
+    molecule.setParts(*PARTS)
+    parts = part_slices([np.asarray(atoms) for atoms in molecule.partsData])
+    return np.asarray(molecule.atom, dtype=np.float64), parts
+
+
+def test_deform_matches_pyfitit(xyz_path):
+    """Rotations and shifts give the geometry of the pyFitIt calls"""
+    coordinates, parts = engine_inputs(xyz_path)
+    params = np.array([[0.3, -0.5, 0.25, 0.6], [-0.2, 0.4, -0.1, -0.3]])
+    geometries = deform(coordinates, parts, DEFORMATIONS, params)
+    for values, geometry in zip(params, geometries):
+        np.testing.assert_allclose(
+            geometry, pyfitit_geometry(xyz_path, list(values)), atol=1e-12
+        )
+
+
+def test_edge_geometries_match_pyfitit(xyz_path):
+    """Every corner geometry is the pyFitIt geometry of its parameters"""
+    coordinates, parts = engine_inputs(xyz_path)
+    corners = 0
+    for params, geometries in edge_geometries(
+        coordinates, parts, DEFORMATIONS, chunk_bytes=4 * coordinates.nbytes
+    ):
+        for values, geometry in zip(params, geometries):
+            np.testing.assert_allclose(
+                geometry, pyfitit_geometry(xyz_path, list(values)), atol=1e-12
+            )
+        corners += len(params)
+    assert corners == 2 ** len(DEFORMATIONS)
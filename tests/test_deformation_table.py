@@ -0,0 +1,96 @@
+"""Tests of the deformation table and its filter proxy, checked by Qt's model tester"""
+
+import pytest
+from PyQt5.QtCore import QtDebugMsg, qInstallMessageHandler
+from PyQt5.QtTest import QAbstractItemModelTester
+
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.deformation_table import (
+    DeformationFilterProxyModel,
+    DeformationTableModel,
+)
+from pyfitit_gui.project_model import ProjectModel
+
+
+def deformation(name: str, part: int = 0) -> Deformation:
+    """Shift deformation of a given name"""
+    return Deformation(part, 1, 0, "shift", name, -0.1, 0.1)
+
+
+@pytest.fixture(name="models")
+def fixture_models(application):
+    """Table model and filter proxy watched by the model tester"""
+    problems = []
+    previous = qInstallMessageHandler(
+        lambda kind, _, message: (
+            problems.append(message) if kind != QtDebugMsg else None
+        )
+    )
+    table = DeformationTableModel(ProjectModel())
+    table.append_deformations(
+        [deformation("alpha"), deformation("beta"), deformation("gamma")]
+    )
+    proxy = DeformationFilterProxyModel()
+    resetting = []
+    # connected first, so the proxy is seen before it handles the source change
+    for signal in (table.rowsInserted, table.rowsRemoved, table.modelReset):
+        signal.connect(
+            lambda *_: None if resetting else problems.append("proxy not resetting")
+        )
+    proxy.setSourceModel(table)
+    proxy.modelAboutToBeReset.connect(lambda: resetting.append(True))
+    proxy.modelReset.connect(resetting.clear)
+    row_counts = []
+    proxy.layoutAboutToBeChanged.connect(lambda: row_counts.append(proxy.rowCount()))
+    proxy.layoutChanged.connect(
+        lambda: (
+            None
+            if row_counts.pop() == proxy.rowCount()
+            else problems.append("row count changed with the layout")
+        )
+    )
+    tester = QAbstractItemModelTester(
+        proxy, QAbstractItemModelTester.FailureReportingMode.Warning
+    )
+    yield table, proxy
+    qInstallMessageHandler(previous)
+    del tester, application
+    assert not problems
+
+
+def names(proxy: DeformationFilterProxyModel) -> list[str]:
+    """Names of the displayed deformations in display order"""
+    return [proxy.index(row, 0).data() for row in range(proxy.rowCount())]
+
+
+def test_edit_leaving_the_filter_removes_the_row(models):
+    """Renaming a shown deformation out of the filter hides it"""
+    table, proxy = models
+    proxy.setFilterFixedString("a")
+    assert names(proxy) == ["alpha", "beta", "gamma"]
+    table.replace_deformation(1, deformation("delta"))
+    assert names(proxy) == ["alpha", "delta", "gamma"]
+    table.replace_deformation(1, deformation("omicron"))
+    assert names(proxy) == ["alpha", "gamma"]
+    table.replace_deformation(1, deformation("beta"))
+    assert names(proxy) == ["alpha", "beta", "gamma"]
+
+
+def test_edit_reorders_sorted_rows(models):
+    """An edit within the filter keeps the rows and moves the edited one"""
+    table, proxy = models
+    proxy.sort(0)
+    table.replace_deformation(0, deformation("zeta"))
+    assert names(proxy) == ["beta", "gamma", "zeta"]
+
+
+def test_rows_inserted_and_removed(models):
+    """Insertions and removals of the source reach the proxy"""
+    table, proxy = models
+    proxy.setFilterFixedString("ta")
+    table.append_deformations([deformation("theta"), deformation("iota")])
+    assert names(proxy) == ["beta", "theta", "iota"]
+    table.remove_deformations([1])
+    assert names(proxy) == ["theta", "iota"]
+    table.remove_deformations([0, 2])
+    assert names(proxy) == ["iota"]
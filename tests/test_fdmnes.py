@@ -0,0 +1,93 @@
+"""Tests of the FDMNES input folders written for sampled geometries"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui import fdmnes
+from pyfitit_gui.fdmnes import (
+    FDMNES_INPUT_NAME,
+    deck_folder_name,
+    finished_samples,
+    write_decks,
+)
+from pyfitit_gui.molecule import load_molecule
+from pyfitit_gui.result_cache import CACHE_KEY_FILE
+from pyfitit_gui.sampling import params_path
+
+SETTINGS = {"energy_range": "-15 0.5 60", "Radius": "5", "Green": "True"}
+
+SAMPLES = 24
+
+
+@pytest.fixture(name="stack")
+def fixture_stack(tmp_path, xyz_path):
+    """Stack of shifted copies of the test molecule with their parameters"""
+    molecule = load_molecule(str(xyz_path))
+    shifts = np.arange(SAMPLES, dtype=float)
+    geometries = molecule.coordinates + shifts[:, None, None] / 10
+    stack_path = tmp_path / "samples.npy"
+    np.save(stack_path, geometries)
+    np.save(params_path(stack_path), shifts[:, None])
+    return stack_path, molecule.elements
+
+
+def test_deck_format(stack, tmp_path):
+    """A deck holds the sample comment, the shared header and numbered atoms"""
+    stack_path, elements = stack
+    decks = tmp_path / "decks"
+    counts = write_decks(stack_path, elements, SETTINGS, decks, workers=1)
+    assert counts == (SAMPLES, 0, 0)
+    folder = decks / deck_folder_name(1)
+    assert (folder / "fdmfile.txt").read_text(encoding="ascii") == "1\nin.txt\n"
+    assert (folder / CACHE_KEY_FILE).read_text(encoding="ascii")
+    lines = (folder / FDMNES_INPUT_NAME).read_text(encoding="ascii").splitlines()
+    assert lines[:13] == [
+        "! sample 1 params 1",
+        "",
+        "Filout",
+        " out",
+        "",
+        "Range",
+        " -15 0.5 60",
+        "",
+        "Radius",
+        " 5",
+        "",
+        "Green",
+        "",
+    ]
+    assert lines[13:18] == ["Absorber", " 1", "", "Molecule", " 1 1 1 90 90 90"]
+    assert lines[18] == " 26 0.100000 0.100000 0.100000"
+    assert lines[23] == " 1 1.300000 3.600000 1.500000"
+    assert lines[24:] == ["", "End"]
+
+
+def test_interrupted_writer_resumes(stack, tmp_path, monkeypatch):
+    """Stopping the writer keeps the complete folders, a rerun writes the rest"""
+    stack_path, elements = stack
+    decks = tmp_path / "decks"
+    monkeypatch.setattr(fdmnes, "DECK_BATCH", 1)
+    seen = []
+    written, skipped, _ = write_decks(
+        stack_path,
+        elements,
+        SETTINGS,
+        decks,
+        workers=1,
+        progress=lambda done: seen.append(done) or False,
+    )
+    assert (written, skipped, seen) == (1, 0, [1])
+    # batches already handed to the worker are still written
+    first = finished_samples(decks)
+    assert {0} <= first < set(range(SAMPLES))
+    stale = decks / (deck_folder_name(SAMPLES - 1) + ".tmp")
+    stale.mkdir()
+    (stale / "partial.txt").write_text("", encoding="ascii")
+
+    written, skipped, _ = write_decks(stack_path, elements, SETTINGS, decks, workers=1)
+    assert (written, skipped) == (SAMPLES - len(first), len(first))
+    assert finished_samples(decks) == set(range(SAMPLES))
+    assert sorted(path.name for path in decks.iterdir()) == [
+        deck_folder_name(index) for index in range(SAMPLES)
+    ]
+    assert not (decks / deck_folder_name(SAMPLES - 1) / "partial.txt").exists()
@@ -0,0 +1,42 @@
+"""Tests of the panels the main window builds after its first paint"""
+
+import time
+
+import pytest
+
+from pyfitit_gui.main_window import MainWindow
+
+
+@pytest.fixture(name="window")
+def fixture_window(application):
+    """Main window that is not shown yet"""
+    window = MainWindow()
+    yield window
+    window.close()
+    window.deleteLater()
+    application.processEvents()
+
+
+def test_panels_are_built_after_the_first_paint(application, window):
+    """Showing the window records the first paint and then builds the panels"""
+    assert not window.panels.built
+    window.show()
+    deadline = time.monotonic() + 5
+    while not window.panels.built and time.monotonic() < deadline:
+        application.processEvents()
+    assert window.panels.built
+    assert window.panels.first_paint_ms > 0
+    assert window.deformation_list.model() is window.deformation_proxy
+
+
+def test_panels_used_before_the_first_paint_are_built(window):
+    """Panels and their widgets can be used before the window is painted"""
+    assert window.widgets["compiled_constructor"].text() == "Compiled"
+    assert not window.panels.built
+    assert window.widgets["smoothing_info_label"].text() == "No calculation loaded"
+    assert window.panels.built
+    assert window.deformation_table.rowCount() == 0
+    with pytest.raises(KeyError):
+        _ = window.widgets["no_such_widget"]
+    with pytest.raises(AttributeError):
+        _ = window.no_such_attribute
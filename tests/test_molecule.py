@@ -0,0 +1,45 @@
+"""Tests of the molecule file parser"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.molecule import load_molecule, parse_xyz
+
+
+def test_parse_xyz_reads_atoms():
+    """Elements and coordinates are read, extra columns and later lines ignored"""
+    molecule = parse_xyz(
+        b"2\r\nwater fragment\r\nO 0.0 0.1 -2e-1 0.5\r\nH 1 2 3 -0.5\r\nVEC1 1 0 0 0\r\n"
+    )
+    assert molecule.comment == "water fragment"
+    assert list(molecule.elements) == ["O", "H"]
+    np.testing.assert_array_equal(molecule.coordinates, [[0, 0.1, -0.2], [1, 2, 3]])
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        (b"2\ncomment\nC 0 0 0\nC 0 0\n", "every atom line"),
+        (b"2\ncomment\nC 0 0 0\nC 0 0 0 1\n", "every atom line"),
+        (b"2\ncomment\nC 0 0 0\nC 0 x 0\n", "every atom line"),
+        (b"3\ncomment\nC 0 0 0\nC 0 0 0\n", "fewer atoms"),
+        (b"1\ncomment\nC 0 0\n", "three coordinates"),
+        (b"x\ncomment\nC 0 0 0\n", "atom count"),
+        (b"1\n", "header"),
+        (b"1\ncomment\nCarbon123 0 0 0\n", "element labels"),
+    ],
+)
+def test_parse_xyz_rejects_malformed_lines(content, message):
+    """Every atom line is checked, not only the first one"""
+    with pytest.raises(ValueError, match=message):
+        parse_xyz(content, "molecule.xyz")
+
+
+def test_load_molecule_parses_the_mapped_file(tmp_path):
+    """A memory-mapped file gives the same molecule as its bytes"""
+    path = tmp_path / "molecule.xyz"
+    content = b"3\n\nFe 0 0 0\nO 1.9 0.1 0\nC 2.8 0.9 0.3"
+    path.write_bytes(content)
+    loaded, parsed = load_molecule(str(path)), parse_xyz(content)
+    assert list(loaded.elements) == list(parsed.elements)
+    np.testing.assert_array_equal(loaded.coordinates, parsed.coordinates)
@@ -0,0 +1,56 @@
+"""Tests of the project file and its journal"""
+
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.project_io import (
+    ProjectJournal,
+    journal_path,
+    load_project,
+    save_project,
+)
+from pyfitit_gui.project_model import ProjectModel
+
+
+def edited_project(path):
+    """Project saved with a journal of a few changes, returned with its journal"""
+    model = ProjectModel()
+    journal = ProjectJournal(model, path)
+    model.set_setting("project_name", "scan")
+    model.add_deformation(Deformation(0, 1, 0, "shift", "r1", -0.1, 0.1))
+    model.add_deformation(Deformation(0, 2, 0, "shift", "r2", -0.2, 0.2))
+    return model, journal
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    """Changes recorded after the last save are part of the loaded project"""
+    path = tmp_path / "scan.pfgui"
+    model, _ = edited_project(path)
+    loaded = load_project(path)
+    assert loaded.settings == model.settings
+    assert list(loaded.deformations) == list(model.deformations)
+
+
+def test_journal_left_by_a_crashed_compaction_is_skipped(tmp_path):
+    """Records already folded into the base file are not applied twice"""
+    path = tmp_path / "scan.pfgui"
+    model, journal = edited_project(path)
+    leftover = journal_path(path).read_bytes()
+    journal.compact()
+    journal_path(path).write_bytes(leftover)
+    loaded = load_project(path)
+    assert [deformation.name for deformation in loaded.deformations] == ["r1", "r2"]
+    model.remove_deformations([0])
+    journal.compact()
+    journal_path(path).write_bytes(leftover)
+    assert [deformation.name for deformation in load_project(path).deformations] == [
+        "r2"
+    ]
+
+
+def test_save_project_outdates_an_existing_journal(tmp_path):
+    """Saving another model over a project does not replay its old journal"""
+    path = tmp_path / "scan.pfgui"
+    edited_project(path)
+    leftover = journal_path(path).read_bytes()
+    save_project(ProjectModel(), path)
+    journal_path(path).write_bytes(leftover)
+    assert not load_project(path).deformations
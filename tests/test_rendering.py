@@ -0,0 +1,105 @@
+"""Tests of the generated project code run with pyFitIt"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.deformation_engine import part_slices
+from pyfitit_gui.molecule import parse_partition
+from pyfitit_gui.project_model import ProjectModel
+from pyfitit_gui.rendering import (
+    expand_compiled_deformations,
+    expand_deformations,
+    expand_parts,
+    render_project,
+)
+from pyfitit_gui.script_importer import parse_project_script
+
+pyfitit_molecule = pytest.importorskip("pyfitit.molecule")
+
+PARTITION = "0-2,3-5"
+
+DEFORMATIONS = [
+    Deformation(1, 3, 0, "rotation", "rotation_1", -0.5, 0.4),
+    Deformation(0, 1, 0, "shift", "shift_1", -0.2, 0.3),
+    Deformation(1, 5, 1, "rotation", "rotation_2", -0.7, 0.2),
+    Deformation(1, 4, 3, "shift", "shift_2", -0.1, 0.25),
+    Deformation(0, 0, 2, "rotation", "rotation_3", -0.3, 0.6),
+]
+
+SETTINGS = {
+    "project_name": "scan",
+    "project_folder": "/data/scan",
+    "molecule_file": "molecule.xyz",
+    "spectrum_file": "exp.txt",
+    "parts": PARTITION,
+    "left_interval": "8980",
+    "right_interval": "9100",
+    "energy_range": "-15 0.5 50",
+    "Green": True,
+    "Radius": "6",
+    "GH": "1.5",
+    "Ecent": "30",
+    "Elarg": "30",
+    "Gmax": "15",
+    "Efermi": "0",
+    "shift": "0",
+    "norm": "1",
+}
+
+
+@pytest.mark.parametrize("partition", ["0-2,3-5", "0,1-4,5", "0-5", "0-1,2-5,"])
+def test_rendered_parts_match_partition(xyz_path, partition):
+    """pyFitIt builds the parts of the partition input from the rendered call"""
+    molecule = pyfitit_molecule.Molecule(str(xyz_path))
+    # pylint: disable=eval-used
+    eval(f"molecule.setParts({expand_parts(partition)})", {"molecule": molecule})
+    expected = parse_partition(partition)
+    assert len(molecule.partsData) == len(expected)
+    for atoms, expected_atoms in zip(molecule.partsData, expected):
+        np.testing.assert_array_equal(atoms, expected_atoms)
+
+
+def run_deformation_block(block: str, xyz_path, params: dict) -> np.ndarray:
+    """Run a rendered deformation block on the molecule like moleculeConstructor"""
+    namespace = {"normalize": pyfitit_molecule.normalize}
+    # pylint: disable=exec-used
+    exec(f"def construct(m, params):\n{block}    return m\n", namespace)
+    molecule = pyfitit_molecule.Molecule(str(xyz_path))
+    # pylint: disable=eval-used
+    eval(f"molecule.setParts({expand_parts(PARTITION)})", {"molecule": molecule})
+    return namespace["construct"](molecule, params).atom
+
+
+def test_compiled_block_matches_sequential_calls(xyz_path):
+    """Both rendering modes build the same geometry with pyFitIt"""
+    compiled = expand_compiled_deformations(
+        DEFORMATIONS, part_slices(parse_partition(PARTITION))
+    )
+    assert "transforms" in compiled
+    for values in ([0.3, -0.5, 0.25, 0.6, 0.2], [-0.2, 0.4, -0.1, -0.3, -0.7]):
+        params = {
+            deformation.name: value for deformation, value in zip(DEFORMATIONS, values)
+        }
+        np.testing.assert_allclose(
+            run_deformation_block(compiled, xyz_path, params),
+            run_deformation_block(expand_deformations(DEFORMATIONS), xyz_path, params),
+            atol=1e-12,
+        )
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_rendered_project_imports_back(compiled):
+    """The importer reads the deformations of both rendering modes"""
+    model, errors = ProjectModel.from_spec(SETTINGS)
+    assert not errors
+    model.add_deformations(DEFORMATIONS)
+    spec, warnings = parse_project_script(
+        render_project(model.output_dictionary(compiled))
+    )
+    assert not warnings
+    assert spec["parts"] == PARTITION
+    imported, errors = ProjectModel.from_spec(spec)
+    assert not errors
+    assert list(imported.deformations) == DEFORMATIONS
+    assert imported.settings == model.settings
@@ -0,0 +1,50 @@
+"""Tests of the FDMNES result cache"""
+
+import shutil
+
+import pytest
+
+from pyfitit_gui.result_cache import ResultCache
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmp_path):
+    """Empty cache holding one stored result"""
+    cache = ResultCache(tmp_path / "cache")
+    calculation = tmp_path / "calculation"
+    calculation.mkdir()
+    (calculation / "out.txt").write_text("spectrum", encoding="ascii")
+    (calculation / "in.txt").write_text("deck", encoding="ascii")
+    cache.store("ab01", calculation, exclude={"in.txt"})
+    yield cache
+    cache.close()
+
+
+def test_restore_copies_the_results(cache, tmp_path):
+    """Writing to a restored file leaves the cached entry unchanged"""
+    folder = tmp_path / "restored"
+    folder.mkdir()
+    assert cache.restore("ab01", folder)
+    assert sorted(path.name for path in folder.iterdir()) == ["out.txt"]
+    with open(folder / "out.txt", "a", encoding="ascii") as output:
+        output.write(" changed")
+    second = tmp_path / "second"
+    second.mkdir()
+    assert cache.restore("ab01", second)
+    assert (second / "out.txt").read_text(encoding="ascii") == "spectrum"
+
+
+def test_missing_entry_directory_is_a_miss(cache, tmp_path):
+    """An index row without its directory is removed instead of counted as a hit"""
+    shutil.rmtree(cache.directory / "ab" / "ab01")
+    assert not cache.restore("ab01", tmp_path)
+    assert cache.stats()["entries"] == 0
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+
+
+def test_misses_are_counted_only_when_asked(cache, tmp_path):
+    """The deck writer looks keys up without counting the misses"""
+    assert not cache.restore("cd02", tmp_path, count_miss=False)
+    assert not cache.restore("cd02", tmp_path)
+    assert cache.restore("ab01", tmp_path, count_miss=False)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
@@ -0,0 +1,61 @@
+"""Tests of the sampling of the deformation ranges"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui import sampling
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.molecule import load_molecule
+
+DEFORMATIONS = [
+    Deformation(1, 3, 0, "shift", f"shift_{number}", -0.2, 0.3) for number in range(3)
+]
+
+
+@pytest.mark.parametrize("count", [4, 5, 1000])
+def test_latin_hypercube_strata(count):
+    """Every dimension has one sample per stratum, in independent orders"""
+    params = np.concatenate(
+        list(sampling.sample_params(DEFORMATIONS, count, "lhs", seed=3, block=7))
+    )
+    strata = np.floor((params + 0.2) / 0.5 * count).astype(int)
+    for column in strata.T:
+        assert sorted(column) == list(range(count))
+    if count > 5:
+        correlation = np.corrcoef(params.T)[np.triu_indices(len(DEFORMATIONS), 1)]
+        assert np.abs(correlation).max() < 0.1
+
+
+def test_latin_hypercube_dimensions_are_independent():
+    """Over many seeds, two dimensions pair their strata in every possible way"""
+    pairings = set()
+    for seed in range(200):
+        params = next(sampling.sample_params(DEFORMATIONS, 4, "lhs", seed))
+        strata = np.floor((params + 0.2) / 0.5 * 4).astype(int)
+        pairings.add(tuple(strata[np.argsort(strata[:, 0]), 1]))
+    assert len(pairings) == 24
+
+
+def test_write_samples_in_blocks_of_bytes(xyz_path, tmp_path, monkeypatch):
+    """Blocks shrink with the molecule size, the stack holds every sample"""
+    sizes = []
+    original = sampling.sample_params
+    monkeypatch.setattr(
+        sampling,
+        "sample_params",
+        lambda *args: sizes.append(args[-1]) or original(*args),
+    )
+    monkeypatch.setattr(sampling, "SAMPLE_BLOCK_BYTES", 6 * 3 * 8 * 16)
+    molecule = load_molecule(xyz_path)
+    path = tmp_path / "samples.npy"
+    written = sampling.write_samples(
+        molecule, [slice(0, 3), slice(3, 6)], DEFORMATIONS, path, 50, workers=2
+    )
+    assert written == 50 and sizes == [16]
+    geometries = np.load(path)
+    params = np.load(sampling.params_path(path))
+    assert geometries.shape == (50, 6, 3) and params.shape == (50, 3)
+    shift = geometries[:, 3:] - molecule.coordinates[3:].astype(np.float32)
+    assert np.allclose(
+        np.linalg.norm(shift, axis=2)[:, 0], np.abs(params.sum(1)), atol=1e-5
+    )
@@ -0,0 +1,96 @@
+"""Tests of the scheduler running a command in every input folder"""
+
+import sys
+import textwrap
+
+import pytest
+
+from pyfitit_gui.scheduler import JOB_LOG_NAME, Scheduler, open_queue
+from pyfitit_gui.scheduler_panel import SchedulerWorker
+
+STUB = textwrap.dedent("""\
+    import os
+    import sys
+    import time
+
+    with open("runs.txt", "a", encoding="ascii") as runs:
+        runs.write("run\\n")
+    name = os.path.basename(os.getcwd())
+    if name.endswith("fail"):
+        sys.exit(3)
+    if name.endswith("slow"):
+        time.sleep(30)
+    with open("out.txt", "w", encoding="ascii") as output:
+        output.write(name)
+    """)
+
+FOLDERS = ("a_ok", "b_fail", "c_slow", "d_ok")
+
+
+@pytest.fixture(name="deck_dir")
+def fixture_deck_dir(tmp_path):
+    """Deck directory whose folders succeed, fail or hang by their name"""
+    deck_dir = tmp_path / "decks"
+    for name in FOLDERS:
+        (deck_dir / name).mkdir(parents=True)
+        (deck_dir / name / "fdmfile.txt").write_text("1\n", encoding="ascii")
+    (tmp_path / "stub.py").write_text(STUB, encoding="ascii")
+    return deck_dir
+
+
+def scheduler_of(deck_dir) -> Scheduler:
+    """Scheduler running the stub one job at a time"""
+    command = [sys.executable, str(deck_dir.parent / "stub.py")]
+    return Scheduler(open_queue(deck_dir), command, workers=1, timeout=1, retries=1)
+
+
+def runs(folder) -> int:
+    """Number of times the stub ran in a folder"""
+    path = folder / "runs.txt"
+    return len(path.read_text(encoding="ascii").split()) if path.exists() else 0
+
+
+def test_interrupted_run_resumes_and_retries(deck_dir):
+    """A stopped run leaves its jobs queued for the next one, failures are retried"""
+    scheduler = scheduler_of(deck_dir)
+    first = scheduler.run(lambda result: scheduler.stop())
+    assert first == {"pending": 3, "running": 0, "done": 1, "failed": 0}
+    scheduler.queue.close()
+
+    scheduler = scheduler_of(deck_dir)
+    results = []
+    counts = scheduler.run(results.append)
+    assert counts == {"pending": 0, "running": 0, "done": 2, "failed": 2}
+    assert [runs(deck_dir / name) for name in FOLDERS] == [1, 2, 2, 1]
+    assert [result.message for result in results if result.state == "failed"] == [
+        "exited with code 3",
+        "exited with code 3",
+        "killed after 1 s",
+        "killed after 1 s",
+    ]
+    assert (deck_dir / "d_ok" / "out.txt").read_text(encoding="ascii") == "d_ok"
+    assert (deck_dir / "b_fail" / JOB_LOG_NAME).exists()
+    timings = dict(scheduler.queue.timings())
+    assert sorted(timings) == [str(deck_dir / "a_ok"), str(deck_dir / "d_ok")]
+    assert all(elapsed > 0 for elapsed in timings.values())
+    scheduler.queue.close()
+
+
+def test_worker_reports_a_failing_run(application, deck_dir, monkeypatch):
+    """An error of the scheduler ends the run with a signal and closes the queue"""
+    del application
+    scheduler = scheduler_of(deck_dir)
+
+    def broken_run(callback):
+        del callback
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(scheduler, "run", broken_run)
+    worker = SchedulerWorker(scheduler)
+    failures, counts = [], []
+    worker.run_failed.connect(failures.append)
+    worker.run_finished.connect(counts.append)
+    worker.run()
+    assert (failures, counts) == (["database is locked"], [])
+    with pytest.raises(Exception, match="closed"):
+        scheduler.queue.counts()
@@ -0,0 +1,80 @@
+"""Tests of the project script importer"""
+
+from pyfitit_gui.project_io import load_project
+from pyfitit_gui.script_importer import main, parse_project_script
+
+SCRIPT = """\
+def moleculeConstructor(project, params):
+    m = Molecule(join('/data', 'molecule.xyz'))
+    m.setParts({parts})
+    axis = normalize(m.atom[1]-m.atom[0])
+    m.part[0].shift(axis*params['r1'])
+    axis = normalize(m.atom[4]-m.atom[0])
+    m.part[1].rotate(axis, m.atom[4], params['phi'])
+    m.part[1].shift(normalize(m.atom[4]-m.atom[4])*params['bad'])
+    return m
+
+project = Project()
+project.geometryParamRanges = {{'r1': [-0.1, 0.1], 'phi': [-0.5, 0.5], 'bad': [0, 1]}}
+"""
+
+
+def test_every_set_parts_argument_is_one_part():
+    """Arguments are parts, ranges within an argument join into one part"""
+    for parts, expected in (
+        ("'0-2', '3-5'", "0-2,3-5"),
+        ("'0-2,3-5'", "0-5"),
+        ("'0', '1-2,3', '4'", "0,1-3,4"),
+    ):
+        spec, warnings = parse_project_script(SCRIPT.format(parts=parts))
+        assert spec["parts"] == expected
+        assert not warnings
+
+
+def test_parts_with_a_gap_are_reported():
+    """A part the partition input cannot hold is a warning, not a silent merge"""
+    spec, warnings = parse_project_script(SCRIPT.format(parts="'0-1,3-5', '2'"))
+    assert "parts" not in spec
+    assert any("contiguous" in warning for warning in warnings)
+
+
+def test_main_reports_invalid_deformations(tmp_path, capsys):
+    """Invalid deformations are printed and fail the run, the valid ones are kept"""
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    (scripts / "scan.py").write_text(SCRIPT.format(parts="'0-2', '3-5'"))
+    assert main([str(scripts), "-o", str(tmp_path / "out"), "-j", "1"]) == 1
+    assert "skipped deformation 'bad'" in capsys.readouterr().err
+    model = load_project(tmp_path / "out" / "scan.pfgui")
+    assert [deformation.name for deformation in model.deformations] == ["r1", "phi"]
+
+
+def test_paths_written_by_the_gui_are_kept():
+    """Absolute paths chosen in the file dialogs survive the import unchanged"""
+    script = (
+        SCRIPT.format(parts="'0-2', '3-5'")
+        .replace(
+            "join('/data', 'molecule.xyz')", "join('/data/proj', '/data/mols/m.xyz')"
+        )
+        .replace(
+            "project = Project()\n",
+            "def projectConstructor(expFile='/data/exp/exp.txt'):\n"
+            "    project = Project()\n"
+            "    file_path = join('/data/proj', '/data/exp/exp.txt')\n"
+            "    project.spectrum = readSpectrum(file_path, energyColumn = 0)\n",
+        )
+        .replace("\nproject.geometryParamRanges", "\n    project.geometryParamRanges")
+    )
+    spec, _ = parse_project_script(script)
+    assert spec["project_folder"] == "/data/proj"
+    assert spec["molecule_file"] == "/data/mols/m.xyz"
+    assert spec["spectrum_file"] == "/data/exp/exp.txt"
+
+
+def test_bare_paths_are_split_into_folder_and_file():
+    """A path given as one string provides the project folder and the file name"""
+    script = SCRIPT.format(parts="'0-2', '3-5'").replace(
+        "join('/data', 'molecule.xyz')", "'/data/mols/m.xyz'"
+    )
+    spec, _ = parse_project_script(script)
+    assert (spec["project_folder"], spec["molecule_file"]) == ("/data/mols", "m.xyz")
@@ -0,0 +1,128 @@
+"""Tests of the JSON-RPC service answering workflow scripts"""
+
+import json
+import threading
+
+import pytest
+
+from pyfitit_gui import molecule, service
+from pyfitit_gui.service import (
+    APPLICATION_ERROR,
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    METHOD_NOT_FOUND,
+    Service,
+    ServiceClient,
+    ServiceError,
+    ServiceServer,
+    answer_line,
+)
+
+
+def ask(daemon: Service, document):
+    """Decoded answer of the service to a request document, None without one"""
+    answer = answer_line(daemon, json.dumps(document).encode("utf-8"))
+    return None if answer is None else json.loads(answer)
+
+
+@pytest.fixture(name="daemon")
+def fixture_daemon():
+    """Service with empty caches"""
+    daemon = Service()
+    daemon.clear_cache()
+    yield daemon
+    daemon.clear_cache()
+
+
+def test_batch_answers_every_request_but_notifications(daemon):
+    """A batch is answered in order, without answers to its notifications"""
+    answers = ask(
+        daemon,
+        [
+            {"jsonrpc": "2.0", "id": 1, "method": "ping"},
+            {"jsonrpc": "2.0", "method": "clear_cache"},
+            {"jsonrpc": "2.0", "id": 2, "method": "no_such_method"},
+            {"jsonrpc": "2.0", "id": 3},
+        ],
+    )
+    assert [answer["id"] for answer in answers] == [1, 2, None]
+    assert answers[0]["result"]["version"] == service.PROTOCOL_VERSION
+    assert answers[1]["error"]["code"] == METHOD_NOT_FOUND
+    assert answers[2]["error"]["code"] == INVALID_REQUEST
+    assert daemon.calls["clear_cache"] == 1
+
+
+def test_notification_is_not_answered(daemon):
+    """Requests without an id are handled but never answered"""
+    assert ask(daemon, {"jsonrpc": "2.0", "method": "ping"}) is None
+    assert ask(daemon, [{"jsonrpc": "2.0", "method": "ping"}]) is None
+    assert daemon.calls["ping"] == 2
+
+
+@pytest.mark.parametrize(
+    "method, params, code",
+    [
+        ("validate", {"project": 5}, INVALID_PARAMS),
+        ("load_molecule", {"path": None}, INVALID_PARAMS),
+        ("load_molecule", {"file": "molecule.xyz"}, INVALID_PARAMS),
+        ("load_molecule", "molecule.xyz", INVALID_PARAMS),
+        ("load_spectrum", ["no_such_spectrum.txt"], APPLICATION_ERROR),
+        ("sample", {"project": {}, "method": "no_such_method"}, APPLICATION_ERROR),
+    ],
+)
+def test_bad_parameters_are_answered_with_an_error(daemon, method, params, code):
+    """Failing calls are answered with an error and the service keeps answering"""
+    answer = ask(
+        daemon, {"jsonrpc": "2.0", "id": 7, "method": method, "params": params}
+    )
+    assert answer["id"] == 7
+    assert answer["error"]["code"] == code
+    assert answer["error"]["message"]
+    assert "result" in ask(daemon, {"jsonrpc": "2.0", "id": 8, "method": "ping"})
+
+
+def test_repeat_loads_are_served_from_the_cache(daemon, monkeypatch, xyz_path):
+    """Loading an unchanged file again does not parse it again"""
+    spectrum_path = xyz_path.with_name("spectrum.txt")
+    spectrum_path.write_text("1 0.5\n2 0.7\n3 0.6\n", encoding="utf-8")
+    parsed = []
+    parse_xyz = molecule.parse_xyz
+    load_spectrum = service._load_spectrum  # pylint: disable=protected-access
+    monkeypatch.setattr(
+        molecule,
+        "parse_xyz",
+        lambda *args: parsed.append(args[1]) or parse_xyz(*args),
+    )
+    monkeypatch.setattr(
+        service,
+        "_load_spectrum",
+        lambda path: parsed.append(path) or load_spectrum(path),
+    )
+    for _ in range(2):
+        atoms = daemon.load_molecule(str(xyz_path))
+        points = daemon.load_spectrum(str(spectrum_path))
+    assert atoms["atom_count"] == 6
+    assert points["points"] == 3
+    assert len(parsed) == 2
+    stats = daemon.stats()
+    assert (stats["cached_molecules"], stats["cached_spectra"]) == (1, 1)
+
+
+def test_server_answers_clients_until_shut_down(tmp_path, xyz_path):
+    """Clients of a served socket get answers and errors, then shut it down"""
+    path = str(tmp_path / "service.sock")
+    server = ServiceServer(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with ServiceClient(path, timeout=10) as client:
+            assert client.call("load_molecule", path=str(xyz_path))["atom_count"] == 6
+            with pytest.raises(ServiceError) as error:
+                client.call("validate", project=5)
+            assert error.value.code == INVALID_PARAMS
+            assert client.call("stats")["calls"]["load_molecule"] == 1
+            assert client.call("shutdown") == {}
+        thread.join(10)
+        assert not thread.is_alive()
+    finally:
+        server.server_close()
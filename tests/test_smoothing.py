@@ -0,0 +1,65 @@
+"""Tests of the FDMNES arctangent smoothing of calculated spectra"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.smoothing import (
+    ArctanSmoother,
+    SmoothingParams,
+    arctan_widths,
+    fit_norm,
+)
+
+ENERGY = np.linspace(7100, 7160, 121)
+
+INTENSITY = (
+    np.exp(-(((ENERGY - 7120) / 2) ** 2))
+    + 0.5 * (1 + np.tanh((ENERGY - 7115) / 1.5))
+    + 0.3 * np.exp(-(((ENERGY - 7140) / 4) ** 2))
+)
+
+
+def direct_smoothing(params: SmoothingParams) -> np.ndarray:
+    """Lorentzian of its own width integrated around every energy, the spectrum
+    being cut below the Fermi level and extended by its end values"""
+    span = ENERGY[-1] - ENERGY[0]
+    fine = np.linspace(ENERGY[0] - span, ENERGY[-1] + span, 18001)
+    signal = np.where(fine >= params.efermi, np.interp(fine, ENERGY, INTENSITY), 0)
+    return np.array(
+        [
+            np.trapezoid(
+                signal * width / 2 / np.pi / ((energy - fine) ** 2 + width**2 / 4),
+                fine,
+            )
+            for energy, width in zip(ENERGY, arctan_widths(ENERGY, params))
+        ]
+    )
+
+
+@pytest.mark.parametrize("efermi", [7090.0, 7112.0])
+def test_fft_smoothing_matches_the_direct_convolution(efermi):
+    """The width table and the FFT stay within 2 % of the direct convolution"""
+    params = SmoothingParams(1.0, 20.0, 15.0, 10.0, efermi, shift=0.5)
+    energy, values = ArctanSmoother(ENERGY, INTENSITY).smooth(params)
+    direct = direct_smoothing(params)
+    assert np.allclose(energy, ENERGY + 0.5)
+    assert np.abs(values - direct).max() < 0.02 * direct.max()
+
+
+def test_fit_norm_recovers_the_scale_of_the_reference():
+    """The fitted norm divides the smoothed spectrum onto the reference"""
+    params = SmoothingParams(1.0, 20.0, 15.0, 10.0, 7112.0)
+    smoother = ArctanSmoother(ENERGY, INTENSITY)
+    energy, values = smoother.smooth(params)
+    reference_energy = np.linspace(7105, 7170, 200)
+    reference = np.interp(reference_energy, energy, values) / 2.5
+    assert fit_norm(energy, values, reference_energy, reference) == pytest.approx(2.5)
+    reference[reference_energy > 7140] = 0
+    assert fit_norm(
+        energy, values, reference_energy, reference, (7100, 7140)
+    ) == pytest.approx(2.5)
+    assert fit_norm(energy, values, reference_energy + 100, reference) is None
+    _, normalized = smoother.smooth(
+        SmoothingParams(1.0, 20.0, 15.0, 10.0, 7112.0, norm=2.5)
+    )
+    assert np.allclose(normalized, values / 2.5)
@@ -0,0 +1,64 @@
+"""Tests of the surrogate interpolating the spectra of a dataset"""
+
+import numpy as np
+import pytest
+
+from pyfitit_gui.dataset import Dataset, DatasetWriter
+from pyfitit_gui.datatypes import Deformation
+from pyfitit_gui.surrogate import Surrogate
+
+RANGES = np.array([[-0.2, 0.3], [0.0, 3.14], [1.0, 2.0]])
+
+ENERGY = np.linspace(0, 10, 11)
+
+
+def samples(count: int, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """Random params within the ranges and unrelated random spectra"""
+    rng = np.random.default_rng(seed)
+    params = rng.uniform(RANGES[:, 0], RANGES[:, 1], (count, len(RANGES)))
+    return params, rng.random((count, len(ENERGY))).astype(np.float32)
+
+
+def test_samples_are_returned_exactly():
+    """Querying the params of a sample gives its spectrum, not a blend"""
+    params, spectra = samples(3000)
+    surrogate = Surrogate(RANGES, ENERGY)
+    surrogate.add(params[:1000], spectra[:1000])
+    surrogate.add(params[1000:], spectra[1000:])
+    assert len(surrogate) == 3000
+    assert np.array_equal(surrogate.predict(params[::7]), spectra[::7])
+
+
+def test_predictions_between_samples_are_weighted_by_distance():
+    """Between two samples the nearer one weighs more, the range scales distances"""
+    surrogate = Surrogate([[0, 1], [0, 100]], ENERGY[:2], neighbours=2)
+    surrogate.add([[0, 0], [1, 0]], [[0, 0], [1, 2]])
+    assert np.allclose(surrogate.predict([[0.5, 0]]), [[0.5, 1]])
+    weights = 1 / np.array([0.25**2 + 0.1**2, 0.75**2 + 0.1**2])
+    expected = weights[1] / weights.sum() * np.array([1, 2])
+    assert np.allclose(surrogate.predict([[0.25, 10]]), [expected])
+    with pytest.raises(ValueError, match="parameters"):
+        surrogate.add([[0, 0, 0]], [[0, 0]])
+    with pytest.raises(ValueError, match="no samples"):
+        Surrogate(RANGES, ENERGY).predict(RANGES[:, 0])
+
+
+def test_update_only_adds_appended_rows(tmp_path):
+    """Updating from a grown dataset adds its new rows once"""
+    deformations = [
+        Deformation(0, 1, axis, "shift", f"r{axis}", left, right)
+        for axis, (left, right) in enumerate(RANGES)
+    ]
+    params, spectra = samples(30)
+    path = tmp_path / "dataset"
+    with DatasetWriter.create(path, deformations, ["Fe"], ENERGY) as writer:
+        writer.append(np.arange(10), params[:10], np.zeros((10, 1, 3)), spectra[:10])
+        surrogate = Surrogate.from_dataset(Dataset(path))
+        writer.append(
+            np.arange(10, 30), params[10:], np.zeros((20, 1, 3)), spectra[10:]
+        )
+    assert len(surrogate) == 10
+    assert surrogate.update(Dataset(path)) == 20
+    assert surrogate.update(Dataset(path)) == 0
+    assert len(surrogate) == 30
+    assert np.array_equal(surrogate.predict(params), spectra)